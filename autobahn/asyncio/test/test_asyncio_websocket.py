@@ -0,0 +1,127 @@
+###############################################################################
+#
+# The MIT License (MIT)
+#
+# Copyright (c) Tavendo GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+###############################################################################
+
+import pytest
+import os
+
+if not os.environ.get('USE_ASYNCIO', False):
+    raise pytest.skip("Only for asyncio")
+
+from unittest import TestCase
+try:
+    from unittest.mock import Mock
+except ImportError:
+    from mock import Mock
+
+from autobahn.asyncio.websocket import WebSocketServerProtocol, \
+    WebSocketServerFactory, _BufferedProtocol
+
+
+HANDSHAKE_REQUEST = (
+    b'GET / HTTP/1.1\r\n'
+    b'Host: localhost:80\r\n'
+    b'Upgrade: WebSocket\r\n'
+    b'Connection: Upgrade\r\n'
+    b'Sec-WebSocket-Key: 6Jid6RgXpH0RVegaNSs/4g==\r\n'
+    b'Sec-WebSocket-Version: 13\r\n'
+    b'\r\n'
+)
+
+# masked client frame (with an all-zero mask) carrying text message "hello"
+HELLO_FRAME = b'\x81\x85\x00\x00\x00\x00hello'
+
+
+class TestDirectProcessing(TestCase):
+
+    def _connect(self, protocol=WebSocketServerProtocol, options=None, **kwargs):
+        factory = WebSocketServerFactory(**kwargs)
+        factory.protocol = protocol
+        factory.setProtocolOptions(openHandshakeTimeout=0, **(options or {}))
+        proto = factory()
+        proto.onMessage = Mock()
+        transport = Mock()
+        transport.get_extra_info.return_value = ('127.0.0.1', 65534)
+        proto.connection_made(transport)
+        return proto
+
+    def test_direct(self):
+        proto = self._connect(directProcessing=True)
+        proto.data_received(HANDSHAKE_REQUEST)
+        self.assertEqual(proto.state, proto.STATE_OPEN)
+
+        proto.data_received(HELLO_FRAME)
+        proto.onMessage.assert_called_once_with(b'hello', False)
+
+    def test_queued(self):
+        proto = self._connect()
+        proto.data_received(HANDSHAKE_REQUEST)
+        self.assertEqual(proto.state, proto.STATE_CONNECTING)
+
+    def test_buffered(self):
+        if _BufferedProtocol is None:
+            raise pytest.skip("asyncio.BufferedProtocol not available")
+
+        class BufferedServerProtocol(WebSocketServerProtocol, _BufferedProtocol):
+            pass
+
+        proto = self._connect(BufferedServerProtocol)
+        for data in [HANDSHAKE_REQUEST, HELLO_FRAME[:3], HELLO_FRAME[3:]]:
+            buf = proto.get_buffer(-1)
+            buf[:len(data)] = data
+            proto.buffer_updated(len(data))
+            if data == HELLO_FRAME[:3]:
+                # data is read into the receive buffer itself
+                self.assertEqual(proto._rx_buffer, bytearray(HELLO_FRAME[:3]))
+
+        self.assertEqual(proto.state, proto.STATE_OPEN)
+        proto.onMessage.assert_called_once_with(b'hello', False)
+
+        # on EOF, the transport doesn't call buffer_updated()
+        proto.get_buffer(-1)
+        proto.eof_received()
+        self.assertEqual(len(proto._rx_buffer), 0)
+
+    def test_compression_executor(self):
+        proto = self._connect()
+        factory = proto.factory
+        proto._deferToCompressionThread(len, b'data')
+        self.assertIsNotNone(factory._compressionExecutor)
+
+        # shut down with the last connection which used it
+        proto.connection_lost(None)
+        self.assertIsNone(factory._compressionExecutor)
+
+    def test_write_flow_control(self):
+        proto = self._connect(options=dict(writeHighWatermark=1000, writeLowWatermark=100))
+        proto.transport.set_write_buffer_limits.assert_called_once_with(high=1000, low=100)
+        proto.data_received(HANDSHAKE_REQUEST)
+        proto.onWritePaused = Mock()
+        proto.onWriteResumed = Mock()
+
+        proto.pause_writing()
+        self.assertTrue(proto.onWritePaused.called)
+        proto.resume_writing()
+        self.assertTrue(proto.onWriteResumed.called)
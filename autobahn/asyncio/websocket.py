@@ -47,6 +47,13 @@ except ImportError:
 
 from autobahn.websocket.types import ConnectionDeny
 
+# asyncio.async() was renamed to asyncio.ensure_future() in Python 3.4.4,
+# and is a syntax error on Python 3.7+
+ensure_future = getattr(asyncio, 'ensure_future', None) or getattr(asyncio, 'async')
+
+# asyncio.BufferedProtocol is only available on Python 3.7+
+_BufferedProtocol = getattr(asyncio, 'BufferedProtocol', None)
+
 
 __all__ = (
     'WebSocketAdapterProtocol',
@@ -74,13 +81,36 @@ def yields(value):
 class WebSocketAdapterProtocol(asyncio.Protocol):
     """
     Adapter class for asyncio-based WebSocket client and server protocols.
+
+    By default, incoming data is queued and processed from a future's done
+    callback. With ``directProcessing`` set on the factory, incoming data is
+    processed right away in :meth:`data_received`.
+
+    Protocols which (also) derive from ``asyncio.BufferedProtocol`` (Python 3.7+)
+    receive data directly into the receive buffer of the WebSocket protocol
+    (see :meth:`get_buffer`), without copying, and always process it right away.
     """
 
+    _RECEIVE_BUFFER_SIZE = 65536
+    """
+    Number of octets to read at once with ``asyncio.BufferedProtocol``.
+    """
+
+    # the thread pool of the factory was used (see perMessageCompressionOffloadSize)
+    _usesCompressionExecutor = False
+
     def connection_made(self, transport):
         self.transport = transport
 
-        self.receive_queue = deque()
-        self._consume()
+        self._receive_buffer = None
+        if _BufferedProtocol is not None and isinstance(self, _BufferedProtocol):
+            self._directProcessing = True
+        else:
+            self._directProcessing = getattr(self.factory, 'directProcessing', False)
+
+        if not self._directProcessing:
+            self.receive_queue = deque()
+            self._consume()
 
         try:
             peer = transport.get_extra_info('peername')
@@ -95,9 +125,33 @@ class WebSocketAdapterProtocol(asyncio.Protocol):
 
         self._connectionMade()
 
+        if self.writeHighWatermark > 0:
+            transport.set_write_buffer_limits(high=self.writeHighWatermark, low=self.writeLowWatermark)
+
     def connection_lost(self, exc):
+        self._releaseReceiveBuffer()
         self._connectionLost(exc)
         self.transport = None
+        if self._usesCompressionExecutor:
+            self._usesCompressionExecutor = False
+            self.factory._releaseCompressionExecutor()
+
+    def eof_received(self):
+        self._releaseReceiveBuffer()
+
+    def pause_writing(self):
+        """
+        Implements ``asyncio.Protocol.pause_writing``: the transport buffered
+        more than ``writeHighWatermark`` octets.
+        """
+        self._pauseWriting()
+
+    def resume_writing(self):
+        """
+        Implements ``asyncio.Protocol.resume_writing``: the octets buffered in
+        the transport dropped to ``writeLowWatermark``.
+        """
+        self._resumeWriting()
 
     def _consume(self):
         self.waiter = Future()
@@ -112,68 +166,129 @@ class WebSocketAdapterProtocol(asyncio.Protocol):
         self.waiter.add_done_callback(process)
 
     def data_received(self, data):
+        if self._directProcessing:
+            self._dataReceived(data)
+            return
         self.receive_queue.append(data)
         if not self.waiter.done():
             self.waiter.set_result(None)
 
+    def get_buffer(self, sizehint):
+        """
+        Implements ``asyncio.BufferedProtocol.get_buffer``: the transport reads
+        directly into (the end of) the receive buffer of the WebSocket protocol.
+        """
+        self._receive_buffer = self._getReceiveBuffer(self._RECEIVE_BUFFER_SIZE)
+        return self._receive_buffer
+
+    def buffer_updated(self, nbytes):
+        """
+        Implements ``asyncio.BufferedProtocol.buffer_updated``: process the
+        octets read into the receive buffer.
+        """
+        # the transport still references the buffer: release it, so that the
+        # receive buffer can be resized again
+        self._receive_buffer.release()
+        self._receive_buffer = None
+        self._receiveBufferUpdated(nbytes)
+
+    def _releaseReceiveBuffer(self):
+        # the transport did not read into the buffer returned by get_buffer()
+        # (on EOF or errors)
+        if self._receive_buffer is not None:
+            self.buffer_updated(0)
+
     # noinspection PyUnusedLocal
     def _closeConnection(self, abort=False):
         self.transport.close()
 
+    def _writeSequence(self, data):
+        self.transport.writelines(data)
+
+    def _getWriteBufferSize(self):
+        return self.transport.get_write_buffer_size()
+
     def _onOpen(self):
         res = self.onOpen()
         if yields(res):
-            asyncio.async(res)
+            ensure_future(res)
 
     def _onMessageBegin(self, isBinary):
         res = self.onMessageBegin(isBinary)
         if yields(res):
-            asyncio.async(res)
+            ensure_future(res)
 
     def _onMessageFrameBegin(self, length):
         res = self.onMessageFrameBegin(length)
         if yields(res):
-            asyncio.async(res)
+            ensure_future(res)
 
     def _onMessageFrameData(self, payload):
         res = self.onMessageFrameData(payload)
         if yields(res):
-            asyncio.async(res)
+            ensure_future(res)
 
     def _onMessageFrameEnd(self):
         res = self.onMessageFrameEnd()
         if yields(res):
-            asyncio.async(res)
+            ensure_future(res)
 
     def _onMessageFrame(self, payload):
         res = self.onMessageFrame(payload)
         if yields(res):
-            asyncio.async(res)
+            ensure_future(res)
 
     def _onMessageEnd(self):
         res = self.onMessageEnd()
         if yields(res):
-            asyncio.async(res)
+            ensure_future(res)
 
     def _onMessage(self, payload, isBinary):
         res = self.onMessage(payload, isBinary)
         if yields(res):
-            asyncio.async(res)
+            self._messageHandlerStarted(ensure_future(res))
+
+    def _onTextMessage(self, payload):
+        res = self.onTextMessage(payload)
+        if yields(res):
+            self._messageHandlerStarted(ensure_future(res))
 
     def _onPing(self, payload):
         res = self.onPing(payload)
         if yields(res):
-            asyncio.async(res)
+            ensure_future(res)
 
     def _onPong(self, payload):
         res = self.onPong(payload)
         if yields(res):
-            asyncio.async(res)
+            ensure_future(res)
 
     def _onClose(self, wasClean, code, reason):
         res = self.onClose(wasClean, code, reason)
         if yields(res):
-            asyncio.async(res)
+            ensure_future(res)
+
+    def _onWritePaused(self):
+        res = self.onWritePaused()
+        if yields(res):
+            ensure_future(res)
+
+    def _onWriteResumed(self):
+        res = self.onWriteResumed()
+        if yields(res):
+            ensure_future(res)
+
+    def _pauseTransportReading(self):
+        self.transport.pause_reading()
+
+    def _resumeTransportReading(self):
+        self.transport.resume_reading()
+
+    def _deferToCompressionThread(self, f, *args):
+        if not self._usesCompressionExecutor:
+            self._usesCompressionExecutor = True
+            self.factory._compressionExecutorUsers += 1
+        return self.factory.loop.run_in_executor(self.factory._getCompressionExecutor(), f, *args)
 
     def get_channel_id(self):
         """
@@ -183,7 +298,17 @@ class WebSocketAdapterProtocol(asyncio.Protocol):
         raise Exception("transport channel binding not implemented for asyncio")
 
     def registerProducer(self, producer, streaming):
-        raise Exception("not implemented")
+        """
+        Register a producer with this protocol. A push producer (``streaming == True``)
+        is paused and resumed (``pauseProducing()``/``resumeProducing()``) according
+        to ``writeHighWatermark`` and ``writeLowWatermark``.
+        """
+        self._producer = producer
+        self._producerStreaming = streaming
+
+    def unregisterProducer(self):
+        self._producer = None
+        self._producerStreaming = False
 
 
 class WebSocketServerProtocol(WebSocketAdapterProtocol, protocol.WebSocketServerProtocol):
@@ -199,7 +324,7 @@ class WebSocketServerProtocol(WebSocketAdapterProtocol, protocol.WebSocketServer
         try:
             res = self.onConnect(request)
             if yields(res):
-                asyncio.async(res)
+                ensure_future(res)
         except ConnectionDeny as e:
             self.failHandshake(e.reason, e.code)
         except Exception as e:
@@ -216,7 +341,7 @@ class WebSocketClientProtocol(WebSocketAdapterProtocol, protocol.WebSocketClient
     def _onConnect(self, response):
         res = self.onConnect(response)
         if yields(res):
-            asyncio.async(res)
+            ensure_future(res)
 
     def startTLS(self):
         raise Exception("WSS over explicit proxies not implemented")
@@ -228,6 +353,27 @@ class WebSocketAdapterFactory(object):
     """
     log = txaio.make_logger()
 
+    _compressionExecutor = None
+    _compressionExecutorUsers = 0
+
+    def _getCompressionExecutor(self):
+        """
+        Get the thread pool used to compress/decompress large messages (see
+        ``perMessageCompressionOffloadSize``). The pool is created when first needed,
+        and shut down when no connection which used it is left.
+        """
+        if self._compressionExecutor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            self._compressionExecutor = ThreadPoolExecutor(max_workers=self.perMessageCompressionOffloadThreads)
+        return self._compressionExecutor
+
+    def _releaseCompressionExecutor(self):
+        self._compressionExecutorUsers -= 1
+        if self._compressionExecutorUsers == 0 and self._compressionExecutor is not None:
+            # work still queued is done, but the threads exit then
+            self._compressionExecutor.shutdown(wait=False)
+            self._compressionExecutor = None
+
     def __call__(self):
         proto = self.protocol()
         proto.factory = self
@@ -244,10 +390,13 @@ class WebSocketServerFactory(WebSocketAdapterFactory, protocol.WebSocketServerFa
         In addition to all arguments to the constructor of
         :class:`autobahn.websocket.protocol.WebSocketServerFactory`,
         you can supply a ``loop`` keyword argument to specify the
-        asyncio event loop to be used.
+        asyncio event loop to be used, and a ``directProcessing``
+        keyword argument to process incoming data right away in
+        ``data_received`` (instead of in a later loop iteration).
         """
         loop = kwargs.pop('loop', None)
         self.loop = loop or asyncio.get_event_loop()
+        self.directProcessing = kwargs.pop('directProcessing', False)
 
         protocol.WebSocketServerFactory.__init__(self, *args, **kwargs)
 
@@ -262,10 +411,13 @@ class WebSocketClientFactory(WebSocketAdapterFactory, protocol.WebSocketClientFa
         In addition to all arguments to the constructor of
         :class:`autobahn.websocket.protocol.WebSocketClientFactory`,
         you can supply a ``loop`` keyword argument to specify the
-        asyncio event loop to be used.
+        asyncio event loop to be used, and a ``directProcessing``
+        keyword argument to process incoming data right away in
+        ``data_received`` (instead of in a later loop iteration).
         """
         loop = kwargs.pop('loop', None)
         self.loop = loop or asyncio.get_event_loop()
+        self.directProcessing = kwargs.pop('directProcessing', False)
 
         protocol.WebSocketClientFactory.__init__(self, *args, **kwargs)
 
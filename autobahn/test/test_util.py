@@ -28,7 +28,7 @@ from __future__ import absolute_import
 
 import unittest2 as unittest
 
-from autobahn.util import IdGenerator
+from autobahn.util import IdGenerator, _LRUCache
 
 
 class TestIdGenerator(unittest.TestCase):
@@ -46,3 +46,16 @@ class TestIdGenerator(unittest.TestCase):
         self.assertEqual(v, 2 ** 53)
         v = next(g)
         self.assertEqual(v, 1)
+
+
+class TestLRUCache(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        c = _LRUCache(2)
+        c['a'] = 1
+        c['b'] = 2
+        self.assertEqual(c.get('a'), 1)
+        c['c'] = 3
+        self.assertEqual(len(c), 2)
+        self.assertEqual(c.get('b'), None)
+        self.assertEqual(c.get('a'), 1)
+        self.assertEqual(c.get('c'), 3)
@@ -30,11 +30,14 @@ from base64 import b64encode, b64decode
 
 from zope.interface import implementer
 
+import six
 import txaio
 txaio.use_twisted()
 
 import twisted.internet.protocol
-from twisted.internet.defer import maybeDeferred
+from twisted.internet.defer import maybeDeferred, Deferred
+from twisted.internet.threads import deferToThreadPool
+from twisted.python.failure import Failure
 from twisted.internet.interfaces import ITransport
 from twisted.internet.error import ConnectionDone, ConnectionAborted, \
     ConnectionLost
@@ -84,6 +87,16 @@ class WebSocketAdapterProtocol(twisted.internet.protocol.Protocol):
 
     log = txaio.make_logger()
 
+    # the protocol is registered as a streaming producer with the transport,
+    # which pauses and resumes writing (see writeHighWatermark)
+    _transportProducer = False
+
+    # the transport paused the protocol, since it buffered more than its
+    # bufferSize octets. it resumes the protocol when its buffer was written
+    # out, so the octets buffered are at most those written since.
+    _transportWritePaused = False
+    _writtenOctetsFlushed = 0
+
     def connectionMade(self):
         # the peer we are connected to
         try:
@@ -95,6 +108,9 @@ class WebSocketAdapterProtocol(twisted.internet.protocol.Protocol):
         self._connectionMade()
         self.log.debug('Connection made to {peer}', peer=self.peer)
 
+        if self._needsTransportProducer():
+            self._registerTransportProducer()
+
         # Set "Nagle"
         try:
             self.transport.setTcpNoDelay(self.tcpNoDelay)
@@ -132,6 +148,9 @@ class WebSocketAdapterProtocol(twisted.internet.protocol.Protocol):
         self._dataReceived(data)
 
     def _closeConnection(self, abort=False):
+        # a transport with a paused producer registered does not close
+        # after writing out its buffer
+        self._unregisterTransportProducer()
         if abort and hasattr(self.transport, 'abortConnection'):
             self.transport.abortConnection()
         else:
@@ -160,7 +179,22 @@ class WebSocketAdapterProtocol(twisted.internet.protocol.Protocol):
         self.onMessageEnd()
 
     def _onMessage(self, payload, isBinary):
-        self.onMessage(payload, isBinary)
+        res = self.onMessage(payload, isBinary)
+        if isinstance(res, Deferred):
+            self._messageHandlerStarted(res)
+
+    def _onTextMessage(self, payload):
+        res = self.onTextMessage(payload)
+        if isinstance(res, Deferred):
+            self._messageHandlerStarted(res)
+
+    def _writeSequence(self, data):
+        self.transport.writeSequence(data)
+
+    def _getWriteBufferSize(self):
+        if self._transportWritePaused:
+            return self._writtenOctets - self._writtenOctetsFlushed
+        return 0
 
     def _onPing(self, payload):
         self.onPing(payload)
@@ -171,17 +205,102 @@ class WebSocketAdapterProtocol(twisted.internet.protocol.Protocol):
     def _onClose(self, wasClean, code, reason):
         self.onClose(wasClean, code, reason)
 
+    def _onWritePaused(self):
+        self.onWritePaused()
+
+    def _onWriteResumed(self):
+        self.onWriteResumed()
+
+    def _pauseTransportReading(self):
+        self.transport.pauseProducing()
+
+    def _resumeTransportReading(self):
+        self.transport.resumeProducing()
+
+    def _deferToCompressionThread(self, f, *args):
+        return deferToThreadPool(self.factory.reactor, self.factory._getCompressionThreadPool(), f, *args)
+
+    def _needsTransportProducer(self):
+        if self.state == protocol.WebSocketProtocol.STATE_CLOSED:
+            return False
+        return self.writeHighWatermark > 0 or getattr(self.factory, 'broadcastMaxBufferSize', 0) > 0
+
+    def _registerTransportProducer(self):
+        self._transportWritePaused = False
+        self._writtenOctetsFlushed = self._writtenOctets
+        self.transport.registerProducer(self, True)
+        self._transportProducer = True
+
+    def _unregisterTransportProducer(self):
+        if self._transportProducer:
+            self._transportProducer = False
+            self._transportWritePaused = False
+            self.transport.unregisterProducer()
+
+    def pauseProducing(self):
+        """
+        Implements ``twisted.internet.interfaces.IPushProducer.pauseProducing``:
+        the transport buffered more than its ``bufferSize`` octets (called on
+        every write while it does).
+        """
+        self._transportWritePaused = True
+        if self._getWriteBufferSize() > self.writeHighWatermark:
+            self._pauseWriting()
+
+    def resumeProducing(self):
+        """
+        Implements ``twisted.internet.interfaces.IPushProducer.resumeProducing``:
+        the transport wrote out its buffer.
+        """
+        self._transportWritePaused = False
+        self._writtenOctetsFlushed = self._writtenOctets
+        self._resumeWriting()
+
+    def stopProducing(self):
+        """
+        Implements ``twisted.internet.interfaces.IPushProducer.stopProducing``:
+        the transport was disconnected.
+        """
+        self._transportProducer = False
+        self._transportWritePaused = False
+        if self._producer is not None:
+            self._producer.stopProducing()
+
     def registerProducer(self, producer, streaming):
         """
         Register a Twisted producer with this protocol.
 
+        With ``writeHighWatermark`` set, a push producer is paused while the
+        octets buffered for sending exceed ``writeHighWatermark`` (with
+        ``writeHighWatermarkPolicy == "block"``). Otherwise, and for pull
+        producers, the producer is registered with the transport (and the
+        octets buffered for sending are not tracked meanwhile).
+
         :param producer: A Twisted push or pull producer.
         :type producer: object
         :param streaming: Producer type.
         :type streaming: bool
         """
+        self._producer = producer
+        self._producerStreaming = streaming
+        if self._transportProducer:
+            if streaming:
+                return
+            self._unregisterTransportProducer()
         self.transport.registerProducer(producer, streaming)
 
+    def unregisterProducer(self):
+        """
+        Unregister a producer previously registered with :meth:`registerProducer`.
+        """
+        self._producer = None
+        self._producerStreaming = False
+        if self._transportProducer:
+            return
+        self.transport.unregisterProducer()
+        if self._needsTransportProducer():
+            self._registerTransportProducer()
+
 
 class WebSocketServerProtocol(WebSocketAdapterProtocol, protocol.WebSocketServerProtocol):
     """
@@ -191,18 +310,30 @@ class WebSocketServerProtocol(WebSocketAdapterProtocol, protocol.WebSocketServer
     def _onConnect(self, request):
         # onConnect() will return the selected subprotocol or None
         # or a pair (protocol, headers) or raise an HttpException
-        res = maybeDeferred(self.onConnect, request)
-
+        try:
+            res = self.onConnect(request)
+        except Exception:
+            return self._onConnectError(Failure())
+
+        if res is None or isinstance(res, (six.string_types, tuple)):
+            # onConnect() returned right away: complete the handshake without
+            # going through a Deferred
+            try:
+                self.succeedHandshake(res)
+            except Exception:
+                self._onConnectError(Failure())
+            return
+
+        res = maybeDeferred(lambda: res)
         res.addCallback(self.succeedHandshake)
+        res.addErrback(self._onConnectError)
 
-        def forwardError(failure):
-            if failure.check(ConnectionDeny):
-                return self.failHandshake(failure.value.reason, failure.value.code)
-            else:
-                self.log.debug("Unexpected exception in onConnect ['{failure.value}']", failure=failure)
-                return self.failHandshake("Internal server error: {}".format(failure.value), ConnectionDeny.INTERNAL_SERVER_ERROR)
-
-        res.addErrback(forwardError)
+    def _onConnectError(self, failure):
+        if failure.check(ConnectionDeny):
+            return self.failHandshake(failure.value.reason, failure.value.code)
+        else:
+            self.log.debug("Unexpected exception in onConnect ['{failure.value}']", failure=failure)
+            return self.failHandshake("Internal server error: {}".format(failure.value), ConnectionDeny.INTERNAL_SERVER_ERROR)
 
     def get_channel_id(self, channel_id_type=u'tls-unique'):
         """
@@ -235,6 +366,22 @@ class WebSocketAdapterFactory(object):
     Adapter class for Twisted-based WebSocket client and server factories.
     """
 
+    _compressionThreadPool = None
+
+    def _getCompressionThreadPool(self):
+        """
+        Get the thread pool used to compress/decompress large messages (see
+        ``perMessageCompressionOffloadSize``). The pool is created when first needed,
+        and stopped when the reactor shuts down.
+        """
+        if self._compressionThreadPool is None:
+            from twisted.python.threadpool import ThreadPool
+            pool = ThreadPool(0, self.perMessageCompressionOffloadThreads, name='autobahn-compression')
+            pool.start()
+            self.reactor.addSystemEventTrigger('during', 'shutdown', pool.stop)
+            self._compressionThreadPool = pool
+        return self._compressionThreadPool
+
 
 class WebSocketServerFactory(WebSocketAdapterFactory, protocol.WebSocketServerFactory, twisted.internet.protocol.ServerFactory):
     """
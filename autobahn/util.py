@@ -38,6 +38,7 @@ import binascii
 from datetime import datetime, timedelta
 from pprint import pformat
 from array import array
+from collections import OrderedDict
 
 import six
 
@@ -773,3 +774,36 @@ class _LazyHexFormatter(object):
 
     def __str__(self):
         return binascii.hexlify(self.obj).decode('ascii')
+
+
+class _LRUCache(object):
+    """
+    A mapping holding (at most) the ``size`` most recently used entries.
+
+    FOR INTERNAL USE ONLY!
+    """
+    __slots__ = ('_size', '_data')
+
+    def __init__(self, size):
+        self._size = size
+        self._data = OrderedDict()
+
+    def get(self, key, default=None):
+        try:
+            value = self._data.pop(key)
+        except KeyError:
+            return default
+        self._data[key] = value
+        return value
+
+    def __setitem__(self, key, value):
+        self._data.pop(key, None)
+        self._data[key] = value
+        if len(self._data) > self._size:
+            self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+    def clear(self):
+        self._data.clear()
@@ -196,13 +196,15 @@ finally:
             """
             Implements :func:`autobahn.wamp.interfaces.IObjectSerializer.unserialize`
             """
+            if not isinstance(payload, six.text_type):
+                payload = payload.decode('utf8')
             if self._batched:
-                chunks = payload.split(b'\30')[:-1]
+                chunks = payload.split(u'\30')[:-1]
             else:
                 chunks = [payload]
             if len(chunks) == 0:
                 raise Exception("batch format error")
-            return [_loads(data.decode('utf8')) for data in chunks]
+            return [_loads(data) for data in chunks]
 
 
 IObjectSerializer.register(JsonObjectSerializer)
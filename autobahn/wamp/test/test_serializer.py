@@ -119,6 +119,19 @@ class TestSerializer(unittest.TestCase):
                 self.assertEqual([msg], msg2)
         print("")
 
+    def test_roundtrip_text(self):
+        """
+        The JSON serializer also accepts decoded text, as delivered with the
+        ``utf8decodeIncoming`` WebSocket option.
+        """
+        msgs = generate_test_messages()
+
+        for ser in [serializer.JsonSerializer(), serializer.JsonSerializer(batched=True)]:
+            for msg in msgs:
+                payload, binary = ser.serialize(msg)
+                msg2 = ser.unserialize(payload.decode('utf8'), binary)
+                self.assertEqual([msg], msg2)
+
     def test_caching(self):
         for msg in generate_test_messages():
             # message serialization cache is initially empty
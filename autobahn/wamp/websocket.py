@@ -104,6 +104,13 @@ class WampWebSocketProtocol(object):
             reason = u'WAMP Internal Error ({0})'.format(e)
             self._bailout(protocol.WebSocketProtocol.CLOSE_STATUS_CODE_INTERNAL_ERROR, reason=reason)
 
+    def onTextMessage(self, payload):
+        """
+        Callback from :func:`autobahn.websocket.protocol.WebSocketProtocol.onTextMessage`
+        """
+        # the JSON serializer consumes decoded text directly
+        self.onMessage(payload, False)
+
     def send(self, msg):
         """
         Implements :func:`autobahn.wamp.interfaces.ITransport.send`
@@ -61,3 +61,24 @@ class PerMessageCompress(object):
     """
     Base class for WebSocket compression negotiated parameters.
     """
+
+    def getCompressionCacheKey(self):
+        """
+        Get a key identifying the parameters outgoing messages are compressed
+        with, when every message is compressed independently of previous ones
+        (that is, without context takeover). Compressed messages can then be
+        reused on all connections with the same key (see
+        :class:`autobahn.websocket.protocol.PreparedMessage`).
+
+        :returns: A hashable key, or `None` when compressed messages can't be reused.
+        """
+        return None
+
+    def getMemoryUsage(self):
+        """
+        Estimate the memory (in octets) held by the compression state of this
+        connection between messages.
+
+        :returns: int -- The estimated memory, or `0` when unknown.
+        """
+        return 0
@@ -410,6 +410,13 @@ class PerMessageBzip2(PerMessageCompress, PerMessageBzip2Mixin):
     def __repr__(self):
         return "PerMessageBzip2(isServer = %s, server_max_compress_level = %s, client_max_compress_level = %s)" % (self._isServer, self.server_max_compress_level, self.client_max_compress_level)
 
+    def getCompressionCacheKey(self):
+        # every message is compressed with a new compressor
+        if self._isServer:
+            return self.EXTENSION_NAME, self.server_max_compress_level
+        else:
+            return self.EXTENSION_NAME, self.client_max_compress_level
+
     def startCompressMessage(self):
         if self._isServer:
             if self._compressor is None:
@@ -434,7 +441,8 @@ class PerMessageBzip2(PerMessageCompress, PerMessageBzip2Mixin):
         if self._decompressor is None:
             self._decompressor = bz2.BZ2Decompressor()
 
-    def decompressMessageData(self, data):
+    def decompressMessageData(self, data, max_length=0):
+        # max_length is not supported: the caller checks the length afterwards
         return self._decompressor.decompress(data)
 
     def endDecompressMessage(self):
@@ -313,9 +313,11 @@ class PerMessageDeflateOfferAccept(PerMessageCompressOfferAccept, PerMessageDefl
         :returns: str -- PMCE configuration string.
         """
         pmceString = self.EXTENSION_NAME
-        if self.offer.requestNoContextTakeover:
+        if self.offer.requestNoContextTakeover or self.noContextTakeover:
             pmceString += "; server_no_context_takeover"
-        if self.offer.requestMaxWindowBits != 0:
+        if self.windowBits is not None:
+            pmceString += "; server_max_window_bits=%d" % self.windowBits
+        elif self.offer.requestMaxWindowBits != 0:
             pmceString += "; server_max_window_bits=%d" % self.offer.requestMaxWindowBits
         if self.requestNoContextTakeover:
             pmceString += "; client_no_context_takeover"
@@ -523,12 +525,75 @@ class PerMessageDeflateResponseAccept(PerMessageCompressResponseAccept, PerMessa
 
 
 # noinspection PyArgumentList
+class _CompressorPool(object):
+    """
+    Process-wide pool of reusable zlib compression objects, keyed by
+    compression parameters.
+
+    This is used for compressing messages without context takeover: a compression
+    object finishing a message with ``Z_FULL_FLUSH`` has its state reset (the
+    output following the flush does not refer to any data before), and can be
+    reused for compressing the next message - on any connection. This avoids
+    allocating (and freeing) a compression object for every message sent, and
+    idle connections don't hold a compression object.
+    """
+
+    MAX_POOLED = 64
+    """
+    Maximum number of compression objects kept per set of parameters.
+    """
+
+    def __init__(self):
+        self._pool = {}
+
+    def acquire(self, key):
+        """
+        Get a compression object for the given parameters.
+
+        :param key: The compression parameters ``(level, window_bits, mem_level, strategy)``.
+        :type key: tuple
+        """
+        objs = self._pool.get(key)
+        if objs:
+            try:
+                return objs.pop()
+            except IndexError:
+                # another thread took the last one
+                pass
+        level, window_bits, mem_level, strategy = key
+        return zlib.compressobj(level, zlib.DEFLATED, -window_bits, mem_level, strategy)
+
+    def release(self, key, compressor):
+        """
+        Return a compression object, which must have been flushed with
+        ``Z_FULL_FLUSH``, to the pool.
+        """
+        objs = self._pool.setdefault(key, [])
+        if len(objs) < self.MAX_POOLED:
+            objs.append(compressor)
+
+
+_compressor_pool = _CompressorPool()
+
+
 class PerMessageDeflate(PerMessageCompress, PerMessageDeflateMixin):
     """
     `permessage-deflate` WebSocket extension processor.
     """
     DEFAULT_WINDOW_BITS = zlib.MAX_WBITS
     DEFAULT_MEM_LEVEL = 8
+    DEFAULT_COMPRESS_LEVEL = zlib.Z_DEFAULT_COMPRESSION
+    DEFAULT_COMPRESS_STRATEGY = zlib.Z_DEFAULT_STRATEGY
+
+    COMPRESS_LEVEL_PERMISSIBLE_VALUES = [-1, 0, 1, 2, 3, 4, 5, 6, 7, 8, 9]
+    """
+   Permissible value for compression level (`-1` selects the zlib default).
+   """
+
+    COMPRESS_STRATEGY_PERMISSIBLE_VALUES = [zlib.Z_DEFAULT_STRATEGY, zlib.Z_FILTERED, zlib.Z_HUFFMAN_ONLY]
+    """
+   Permissible value for compression strategy.
+   """
 
     @classmethod
     def createFromResponseAccept(cls, isServer, accept):
@@ -558,7 +623,9 @@ class PerMessageDeflate(PerMessageCompress, PerMessageDeflateMixin):
                  client_no_context_takeover,
                  server_max_window_bits,
                  client_max_window_bits,
-                 mem_level):
+                 mem_level,
+                 compress_level=None,
+                 compress_strategy=None):
         self._isServer = isServer
 
         self.server_no_context_takeover = server_no_context_takeover
@@ -569,6 +636,9 @@ class PerMessageDeflate(PerMessageCompress, PerMessageDeflateMixin):
 
         self.mem_level = mem_level if mem_level else self.DEFAULT_MEM_LEVEL
 
+        self.compress_level = compress_level if compress_level is not None else self.DEFAULT_COMPRESS_LEVEL
+        self.compress_strategy = compress_strategy if compress_strategy is not None else self.DEFAULT_COMPRESS_STRATEGY
+
         self._compressor = None
         self._decompressor = None
 
@@ -579,27 +649,79 @@ class PerMessageDeflate(PerMessageCompress, PerMessageDeflateMixin):
                 'client_no_context_takeover': self.client_no_context_takeover,
                 'server_max_window_bits': self.server_max_window_bits,
                 'client_max_window_bits': self.client_max_window_bits,
-                'mem_level': self.mem_level}
+                'mem_level': self.mem_level,
+                'compress_level': self.compress_level,
+                'compress_strategy': self.compress_strategy}
 
     def __repr__(self):
-        return "PerMessageDeflate(isServer = %s, server_no_context_takeover = %s, client_no_context_takeover = %s, server_max_window_bits = %s, client_max_window_bits = %s, mem_level = %s)" % (self._isServer, self.server_no_context_takeover, self.client_no_context_takeover, self.server_max_window_bits, self.client_max_window_bits, self.mem_level)
+        return "PerMessageDeflate(isServer = %s, server_no_context_takeover = %s, client_no_context_takeover = %s, server_max_window_bits = %s, client_max_window_bits = %s, mem_level = %s, compress_level = %s, compress_strategy = %s)" % (self._isServer, self.server_no_context_takeover, self.client_no_context_takeover, self.server_max_window_bits, self.client_max_window_bits, self.mem_level, self.compress_level, self.compress_strategy)
+
+    def getCompressionCacheKey(self):
+        if self._isServer:
+            if self.server_no_context_takeover:
+                return self.EXTENSION_NAME, self.server_max_window_bits, self.mem_level, self.compress_level, self.compress_strategy
+        else:
+            if self.client_no_context_takeover:
+                return self.EXTENSION_NAME, self.client_max_window_bits, self.mem_level, self.compress_level, self.compress_strategy
+        return None
+
+    def getMemoryUsage(self):
+        """
+        Estimate the memory held by the compressor and decompressor of this
+        connection between messages (see zlib's ``zconf.h``). Without context
+        takeover, the compressor/decompressor is not held between messages.
+        """
+        if self._isServer:
+            compress = not self.server_no_context_takeover, self.server_max_window_bits
+            decompress = not self.client_no_context_takeover, self.client_max_window_bits
+        else:
+            compress = not self.client_no_context_takeover, self.client_max_window_bits
+            decompress = not self.server_no_context_takeover, self.server_max_window_bits
+        usage = 0
+        if compress[0]:
+            usage += (1 << (compress[1] + 2)) + (1 << (self.mem_level + 9))
+        if decompress[0]:
+            usage += (1 << decompress[1]) + 7168
+        return usage
+
+    def _compressorKey(self):
+        """
+        Returns the parameters for compressing without context takeover (for
+        the compressor pool), or `None` when compressing with context takeover.
+        """
+        if self._isServer:
+            if self.server_no_context_takeover:
+                return self.compress_level, self.server_max_window_bits, self.mem_level, self.compress_strategy
+        else:
+            if self.client_no_context_takeover:
+                return self.compress_level, self.client_max_window_bits, self.mem_level, self.compress_strategy
+        return None
 
     def startCompressMessage(self):
         # compressobj([level[, method[, wbits[, memlevel[, strategy]]]]])
         # http://bugs.python.org/issue19278
         # http://hg.python.org/cpython/rev/c54c8e71b79a
-        if self._isServer:
-            if self._compressor is None or self.server_no_context_takeover:
-                self._compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -self.server_max_window_bits, self.mem_level)
-        else:
-            if self._compressor is None or self.client_no_context_takeover:
-                self._compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -self.client_max_window_bits, self.mem_level)
+        key = self._compressorKey()
+        if key is not None:
+            self._compressor = _compressor_pool.acquire(key)
+        elif self._compressor is None:
+            if self._isServer:
+                self._compressor = zlib.compressobj(self.compress_level, zlib.DEFLATED, -self.server_max_window_bits, self.mem_level, self.compress_strategy)
+            else:
+                self._compressor = zlib.compressobj(self.compress_level, zlib.DEFLATED, -self.client_max_window_bits, self.mem_level, self.compress_strategy)
 
     def compressMessageData(self, data):
         return self._compressor.compress(data)
 
     def endCompressMessage(self):
-        data = self._compressor.flush(zlib.Z_SYNC_FLUSH)
+        key = self._compressorKey()
+        if key is not None:
+            # a full flush resets the compressor, which can then be reused
+            data = self._compressor.flush(zlib.Z_FULL_FLUSH)
+            _compressor_pool.release(key, self._compressor)
+            self._compressor = None
+        else:
+            data = self._compressor.flush(zlib.Z_SYNC_FLUSH)
         return data[:-4]
 
     def startDecompressMessage(self):
@@ -610,10 +732,25 @@ class PerMessageDeflate(PerMessageCompress, PerMessageDeflateMixin):
             if self._decompressor is None or self.server_no_context_takeover:
                 self._decompressor = zlib.decompressobj(-self.server_max_window_bits)
 
-    def decompressMessageData(self, data):
+    def decompressMessageData(self, data, max_length=0):
+        """
+        Decompress message data.
+
+        :param max_length: When non-zero, return at most this many octets. The
+            remainder of the message can't be decompressed then.
+        :type max_length: int
+        """
+        if max_length:
+            return self._decompressor.decompress(data, max_length)
         return self._decompressor.decompress(data)
 
     def endDecompressMessage(self):
         # Eat stripped LEN and NLEN field of a non-compressed block added
         # for Z_SYNC_FLUSH.
         self._decompressor.decompress(b'\x00\x00\xff\xff')
+
+        # without context takeover, don't hold on to the decompressor (and
+        # its window) between messages
+        if (self._isServer and self.client_no_context_takeover) or \
+           (not self._isServer and self.server_no_context_takeover):
+            self._decompressor = None
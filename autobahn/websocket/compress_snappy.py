@@ -394,6 +394,15 @@ class PerMessageSnappy(PerMessageCompress, PerMessageSnappyMixin):
     def __repr__(self):
         return "PerMessageSnappy(isServer = %s, server_no_context_takeover = %s, client_no_context_takeover = %s)" % (self._isServer, self.server_no_context_takeover, self.client_no_context_takeover)
 
+    def getCompressionCacheKey(self):
+        if self._isServer:
+            if self.server_no_context_takeover:
+                return (self.EXTENSION_NAME,)
+        else:
+            if self.client_no_context_takeover:
+                return (self.EXTENSION_NAME,)
+        return None
+
     def startCompressMessage(self):
         if self._isServer:
             if self._compressor is None or self.server_no_context_takeover:
@@ -416,7 +425,8 @@ class PerMessageSnappy(PerMessageCompress, PerMessageSnappyMixin):
             if self._decompressor is None or self.server_no_context_takeover:
                 self._decompressor = snappy.StreamDecompressor()
 
-    def decompressMessageData(self, data):
+    def decompressMessageData(self, data, max_length=0):
+        # max_length is not supported: the caller checks the length afterwards
         return self._decompressor.decompress(data)
 
     def endDecompressMessage(self):
@@ -258,8 +258,9 @@ class IWebSocketChannelStreamingApi(IWebSocketChannelFrameApi):
         Callback fired when receiving data within a previously begun message frame.
         A default implementation will buffer data for frame.
 
-        :param payload: Partial payload for message frame.
-        :type payload: bytes
+        :param payload: Partial payload for message frame. With the ``frameDataMemoryview``
+            option, this is a ``memoryview`` which is only valid during the call.
+        :type payload: bytes or memoryview
         """
 
     @abc.abstractmethod
@@ -27,6 +27,7 @@
 from __future__ import absolute_import
 
 import binascii
+import codecs
 import hashlib
 import base64
 import struct
@@ -35,10 +36,13 @@ import os
 import pickle
 import copy
 import json
+import math
+import time
 import six
 
 from pprint import pformat
 from collections import deque
+from contextlib import contextmanager
 
 from autobahn import __version__
 
@@ -48,11 +52,12 @@ from autobahn.websocket.interfaces import IWebSocketChannel, \
 
 from autobahn.websocket.types import ConnectionRequest, ConnectionResponse
 
-from autobahn.util import Stopwatch, newid, wildcards2patterns, encode_truncate
-from autobahn.util import _LazyHexFormatter
+from autobahn.util import Stopwatch, newid, wildcards2patterns, encode_truncate, rtime
+from autobahn.util import _LazyHexFormatter, _LRUCache
 from autobahn.websocket.utf8validator import Utf8Validator
 from autobahn.websocket.xormasker import XorMaskerNull, createXorMasker
-from autobahn.websocket.compress import PERMESSAGE_COMPRESSION_EXTENSION
+from autobahn.websocket.compress import PERMESSAGE_COMPRESSION_EXTENSION, PerMessageDeflate, \
+    PerMessageDeflateOfferAccept
 from autobahn.websocket.util import parse_url
 
 from six.moves import urllib
@@ -63,6 +68,24 @@ if six.PY3:
     # noinspection PyShadowingBuiltins
     xrange = range
 
+# incremental UTF-8 decoder used for delivering decoded text messages
+_Utf8IncrementalDecoder = codecs.getincrementaldecoder('utf-8')
+
+# the UTF-8 codec of Python 2 accepts encoded surrogates, and hence is
+# not sufficient to validate text message payloads on its own
+_UTF8_DECODER_VALIDATES = six.PY3
+
+# the pure Python XOR maskers and UTF-8 validator process any buffer (like a
+# memoryview), while the wsaccel ones might only accept bytes
+_MASKER_ACCEPTS_BUFFERS = createXorMasker.__module__ == 'autobahn.websocket.xormasker'
+_UTF8_VALIDATOR_ACCEPTS_BUFFERS = Utf8Validator.__module__ == 'autobahn.websocket.utf8validator'
+
+# memoryviews can be released explicitly on Python 3 only
+_MEMORYVIEW_RELEASE = hasattr(memoryview, 'release')
+
+# CPU clock used to account the time spent compressing/decompressing
+_cputime = getattr(time, 'thread_time', None) or getattr(time, 'process_time', None) or time.clock
+
 __all__ = ("ConnectionRequest",
            "ConnectionResponse",
            "Timings",
@@ -151,8 +174,63 @@ def _is_same_origin(websocket_origin, host_scheme, host_port, host_policy):
     return False
 
 
+_NO_DEFAULT = object()
+
+# octets to reserve space in the receive buffer with (see _getReceiveBuffer())
+_ZEROS = memoryview(bytes(65536))
+
+# protocol class -> configuration attributes set on (user defined) protocol classes
+_configOverrides = {}
+
+
+class _LazyConfigFormatter(object):
+    """
+    Formats the configuration of a protocol instance for log.debug(), only
+    when debug logging is active.
+    """
+    __slots__ = ('proto', 'overrides')
+
+    def __init__(self, proto, overrides):
+        self.proto = proto
+        self.overrides = overrides
+
+    def __str__(self):
+        attrs = []
+        for configAttr in self.proto.CONFIG_ATTRS:
+            if configAttr in self.overrides or configAttr in self.proto.__dict__ and \
+               getattr(self.proto.factory, configAttr) is not getattr(self.proto, configAttr):
+                source = self.proto.__class__.__name__
+            else:
+                source = self.proto.factory.__class__.__name__
+            attrs.append((configAttr, getattr(self.proto, configAttr), source))
+        return pformat(attrs)
+
+
 class TrafficStats(object):
 
+    __slots__ = (
+        'outgoingOctetsWireLevel',
+        'outgoingOctetsWebSocketLevel',
+        'outgoingOctetsAppLevel',
+        'outgoingWebSocketFrames',
+        'outgoingWebSocketMessages',
+        'incomingOctetsWireLevel',
+        'incomingOctetsWebSocketLevel',
+        'incomingOctetsAppLevel',
+        'incomingWebSocketFrames',
+        'incomingWebSocketMessages',
+        'preopenOutgoingOctetsWireLevel',
+        'preopenIncomingOctetsWireLevel',
+        'outgoingWritesSaved',
+        'outgoingWebSocketMessagesDropped',
+        'outgoingWebSocketMessagesUncompressed',
+        'outgoingCompressionTime',
+        'incomingDecompressionTime',
+        'outgoingCompressionOffloaded',
+        'incomingDecompressionOffloaded',
+        'incomingReadingPaused',
+    )
+
     def __init__(self):
         self.reset()
 
@@ -177,6 +255,31 @@ class TrafficStats(object):
         self.preopenOutgoingOctetsWireLevel = 0
         self.preopenIncomingOctetsWireLevel = 0
 
+        # transport writes saved by coalescing writes while corked
+        # (see WebSocketProtocol.cork)
+        self.outgoingWritesSaved = 0
+
+        # data messages dropped since the outgoing buffer exceeded the
+        # high watermark (see writeHighWatermarkPolicy)
+        self.outgoingWebSocketMessagesDropped = 0
+
+        # data messages sent uncompressed although compression is in use (see
+        # perMessageCompressionMinSize and perMessageCompressionAdaptive)
+        self.outgoingWebSocketMessagesUncompressed = 0
+
+        # CPU time (in seconds) spent compressing/decompressing
+        self.outgoingCompressionTime = 0.
+        self.incomingDecompressionTime = 0.
+
+        # messages compressed/frames decompressed in the thread pool (see
+        # perMessageCompressionOffloadSize)
+        self.outgoingCompressionOffloaded = 0
+        self.incomingDecompressionOffloaded = 0
+
+        # times reading from the transport was paused, since too many message
+        # handlers were in flight (see maxPendingMessages)
+        self.incomingReadingPaused = 0
+
     def __json__(self):
 
         # compression ratio = compressed size / uncompressed size
@@ -209,6 +312,11 @@ class TrafficStats(object):
                 'outgoingWebSocketFrames': self.outgoingWebSocketFrames,
                 'outgoingWebSocketMessages': self.outgoingWebSocketMessages,
                 'preopenOutgoingOctetsWireLevel': self.preopenOutgoingOctetsWireLevel,
+                'outgoingWritesSaved': self.outgoingWritesSaved,
+                'outgoingWebSocketMessagesDropped': self.outgoingWebSocketMessagesDropped,
+                'outgoingWebSocketMessagesUncompressed': self.outgoingWebSocketMessagesUncompressed,
+                'outgoingCompressionTime': self.outgoingCompressionTime,
+                'outgoingCompressionOffloaded': self.outgoingCompressionOffloaded,
 
                 'incomingOctetsWireLevel': self.incomingOctetsWireLevel,
                 'incomingOctetsWebSocketLevel': self.incomingOctetsWebSocketLevel,
@@ -217,6 +325,9 @@ class TrafficStats(object):
                 'incomingWebSocketOverhead': incomingWebSocketOverhead,
                 'incomingWebSocketFrames': self.incomingWebSocketFrames,
                 'incomingWebSocketMessages': self.incomingWebSocketMessages,
+                'incomingDecompressionTime': self.incomingDecompressionTime,
+                'incomingDecompressionOffloaded': self.incomingDecompressionOffloaded,
+                'incomingReadingPaused': self.incomingReadingPaused,
                 'preopenIncomingOctetsWireLevel': self.preopenIncomingOctetsWireLevel}
 
     def __str__(self):
@@ -230,6 +341,8 @@ class FrameHeader(object):
     FOR INTERNAL USE ONLY!
     """
 
+    __slots__ = ('opcode', 'fin', 'rsv', 'length', 'mask')
+
     def __init__(self, opcode, fin, rsv, length, mask):
         """
         Constructor.
@@ -278,15 +391,15 @@ def parseHttpHeader(data):
     http_headers = {}
     http_headers_cnt = {}
     for h in raw[1:]:
-        i = h.find(":")
-        if i > 0:
+        key, sep, value = h.partition(":")
+        if sep and key:
             # HTTP header keys are case-insensitive
-            key = h[:i].strip().lower()
-            value = h[i + 1:].strip()
+            key = key.strip().lower()
+            value = value.strip()
 
             # handle HTTP headers split across multiple lines
             if key in http_headers:
-                http_headers[key] += ", %s" % value
+                http_headers[key] += ", " + value
                 http_headers_cnt[key] += 1
             else:
                 http_headers[key] = value
@@ -297,12 +410,36 @@ def parseHttpHeader(data):
     return http_status_line, http_headers, http_headers_cnt
 
 
+def _formatHttpHeaders(headers):
+    """
+    Format a mapping of HTTP header names to a value, or an iterable of values,
+    as HTTP header lines.
+
+    FOR INTERNAL USE ONLY!
+    """
+    lines = []
+    for uh in headers.items():
+        if isinstance(uh[1], six.string_types):
+            header_values = [uh[1]]
+        else:
+            try:
+                header_values = iter(uh[1])
+            except TypeError:
+                header_values = [uh[1]]
+
+        for header_value in header_values:
+            lines.append("%s: %s\x0d\x0a" % (uh[0], header_value))
+    return "".join(lines)
+
+
 class Timings(object):
     """
     Helper class to track timings by key. This class also supports item access,
     iteration and conversion to string.
     """
 
+    __slots__ = ('_stopwatch', '_timings')
+
     def __init__(self):
         self._stopwatch = Stopwatch()
         self._timings = {}
@@ -359,6 +496,108 @@ class Timings(object):
         return pformat(self._timings)
 
 
+class _AdaptiveCompression(object):
+    """
+    Helper class to track the compression ratio of outgoing data messages (of
+    one message type) over a sliding window, and to decide whether compressing
+    pays off.
+
+    When the compressed size of the messages in the window exceeds the given
+    ratio of their uncompressed size, compression is disabled. After the given
+    number of messages was sent uncompressed, compression is probed again for
+    another window of messages.
+    """
+
+    def __init__(self, window, ratio, probeInterval):
+        self.window = window
+        self.ratio = ratio
+        self.probeInterval = probeInterval
+        self.enabled = True
+        self._samples = deque()
+        self._uncompressed = 0
+        self._compressed = 0
+        self._skipped = 0
+
+    def shouldCompress(self):
+        """
+        Returns ``True`` iff the next message should be compressed.
+        """
+        if self.enabled:
+            return True
+        self._skipped += 1
+        if self._skipped > self.probeInterval:
+            self.enabled = True
+            return True
+        return False
+
+    def track(self, uncompressedLen, compressedLen):
+        """
+        Track the sizes of a message that was compressed.
+        """
+        self._samples.append((uncompressedLen, compressedLen))
+        self._uncompressed += uncompressedLen
+        self._compressed += compressedLen
+        if len(self._samples) > self.window:
+            u, c = self._samples.popleft()
+            self._uncompressed -= u
+            self._compressed -= c
+
+        if len(self._samples) == self.window and self._compressed > self.ratio * self._uncompressed:
+            self.enabled = False
+            self._skipped = 0
+            self._samples.clear()
+            self._uncompressed = 0
+            self._compressed = 0
+
+
+# clock for token buckets, which must not jump with the wallclock
+_monotonic = getattr(time, 'monotonic', time.time)
+
+
+class _TokenBucket(object):
+    """
+    Token bucket for rate limiting: ``rate`` tokens per second are added, up
+    to ``burst`` tokens. Tokens taken beyond the ones available are owed, so
+    that the next token becomes available later.
+    """
+
+    __slots__ = ('rate', 'burst', 'tokens', 'stamp')
+
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.stamp = now
+
+    def refill(self, now):
+        if now > self.stamp:
+            self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+            self.stamp = now
+
+    def wait(self, now):
+        """
+        Returns the seconds until a token is available (``0`` when available now).
+        """
+        self.refill(now)
+        if self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+
+def _peer_host(peer):
+    """
+    The source host of a peer string as returned by ``peer2str``, e.g.
+    ``u'tcp4:127.0.0.1'`` for ``u'tcp4:127.0.0.1:54321'``. Peers of other
+    transports are returned unchanged.
+    """
+    if peer.startswith(u'tcp'):
+        return peer.rsplit(u':', 1)[0]
+    return peer
+
+
 class WebSocketProtocol(object):
     """
     Protocol base class for WebSocket.
@@ -412,6 +651,19 @@ class WebSocketProtocol(object):
     For synched/chopped writes, this is the reactor reentry delay in seconds.
     """
 
+    _RECEIVE_BACKLOG_BUDGETS = 4
+    """
+    While processing of received octets is deferred to the next event loop iteration
+    (see ``receiveBudget``), reading from the transport is paused when more than this
+    many receive budgets are buffered.
+    """
+
+    _SCATTER_WRITE_THRESHOLD = 1024
+    """
+    Frames with at least this many payload octets are written as a sequence of
+    frame header and payload, instead of copying the payload into one string.
+    """
+
     MESSAGE_TYPE_TEXT = 1
     """
     WebSocket text message type (UTF-8 payload).
@@ -437,6 +689,17 @@ class WebSocketProtocol(object):
     SEND_STATE_INSIDE_MESSAGE = 2
     SEND_STATE_INSIDE_MESSAGE_FRAME = 3
 
+    # Send queue lanes (see getSendQueueDepth)
+    SEND_LANE_CONTROL = u'control'
+    SEND_LANE_HIGH = u'high'
+    SEND_LANE_NORMAL = u'normal'
+
+    # Where the octets of a send queue entry end: within a frame,
+    # at the end of a frame, or at the end of a message
+    _SEND_BOUNDARY_NONE = 0
+    _SEND_BOUNDARY_FRAME = 1
+    _SEND_BOUNDARY_MESSAGE = 2
+
     # WebSocket protocol close codes
     # See:https://www.iana.org/assignments/websocket/websocket.xml#close-code-number-rules
     #
@@ -505,6 +768,7 @@ class WebSocketProtocol(object):
                            'logFrames',
                            'trackTimings',
                            'utf8validateIncoming',
+                           'utf8decodeIncoming',
                            'applyMask',
                            'maxFramePayloadSize',
                            'maxMessagePayloadSize',
@@ -516,7 +780,23 @@ class WebSocketProtocol(object):
                            'tcpNoDelay',
                            'autoPingInterval',
                            'autoPingTimeout',
-                           'autoPingSize']
+                           'autoPingSize',
+                           'writeHighWatermark',
+                           'writeLowWatermark',
+                           'writeHighWatermarkPolicy',
+                           'perMessageCompressionMinSize',
+                           'perMessageDeflateLevel',
+                           'perMessageDeflateStrategy',
+                           'perMessageCompressionAdaptive',
+                           'perMessageCompressionAdaptiveWindow',
+                           'perMessageCompressionAdaptiveRatio',
+                           'perMessageCompressionAdaptiveProbeInterval',
+                           'perMessageCompressionOffloadSize',
+                           'idleHibernationTimeout',
+                           'frameDataMemoryview',
+                           'receiveBudget',
+                           'maxPendingMessages',
+                           'messageDataBytearray']
     """
     Configuration attributes common to servers and clients.
     """
@@ -552,6 +832,196 @@ class WebSocketProtocol(object):
         chunk_size=1000,
     )
 
+    # Defaults of configuration attributes. The factories reset their options
+    # to these (see resetProtocolOptions), and options with these values are
+    # not copied from the factory to every protocol instance (see _connectionMade).
+    #
+    logOctets = False
+    logFrames = False
+    trackTimings = False
+    utf8validateIncoming = True
+    utf8decodeIncoming = False
+    applyMask = True
+    maxFramePayloadSize = 0
+    maxMessagePayloadSize = 0
+    autoFragmentSize = 0
+    failByDrop = True
+    echoCloseCodeReason = False
+    openHandshakeTimeout = 5
+    closeHandshakeTimeout = 1
+    tcpNoDelay = True
+    autoPingInterval = 0
+    autoPingTimeout = 0
+    autoPingSize = 4
+    writeHighWatermark = 0
+    writeLowWatermark = 0
+    writeHighWatermarkPolicy = u'block'
+    perMessageCompressionMinSize = 0
+    perMessageDeflateLevel = PerMessageDeflate.DEFAULT_COMPRESS_LEVEL
+    perMessageDeflateStrategy = PerMessageDeflate.DEFAULT_COMPRESS_STRATEGY
+    perMessageCompressionAdaptive = False
+    perMessageCompressionAdaptiveWindow = 16
+    perMessageCompressionAdaptiveRatio = 0.95
+    perMessageCompressionAdaptiveProbeInterval = 256
+    perMessageCompressionOffloadSize = 0
+    idleHibernationTimeout = 0
+    frameDataMemoryview = False
+    receiveBudget = 0
+    maxPendingMessages = 0
+    messageDataBytearray = False
+
+    # Per-connection state. The initial values are class attributes, so that
+    # protocol instances only carry the state that actually changed.
+    #
+
+    # permessage-compress extension
+    _perMessageCompress = None
+
+    # payload of the current frame is delivered as memoryview (see frameDataMemoryview)
+    _frameDataView = False
+
+    # frame payload is appended directly to the message data, instead of
+    # being collected per frame first (see onMessageBegin)
+    _messageDataInPlace = False
+
+    # detailed timings (created when trackTimings is enabled)
+    trackedTimings = None
+
+    # for chopped/synched sends, we need to queue to maintain
+    # ordering when recalling the reactor to actually "force"
+    # the octets to wire (see test/trickling in the repo). The
+    # queue is created when first needed. Pings and pongs, as well
+    # as high priority messages, are queued in separate lanes, and
+    # jump ahead of send_queue at frame resp. message boundaries.
+    send_queue = None
+    triggered = False
+    _sendQueueControl = None
+    _sendQueueHigh = None
+    _sendHighPriority = False
+    _sendFrameLane = None
+
+    # the data lane the octets last written belong to, when not at the
+    # end of a message, and whether those octets ended a frame
+    _sendActiveLane = None
+    _sendAtFrameBoundary = True
+
+    # read position in the receive buffer
+    _rx_pos = 0
+
+    # memoryviews into the receive buffer were delivered (see frameDataMemoryview)
+    _rx_viewed = False
+
+    # octets reserved at the end of the receive buffer for the network
+    # framework to read into (see _getReceiveBuffer())
+    _rx_reserved = 0
+
+    # while corked, direct writes are buffered here (see cork())
+    _corkDepth = 0
+    _corkedData = None
+    _corkedWrites = 0
+
+    # outgoing flow control (see writeHighWatermark)
+    _writePaused = False
+    _writtenOctets = 0
+    _drainWaiters = None
+    _producer = None
+    _producerStreaming = False
+
+    # adaptive compression state per message type (isBinary)
+    _adaptiveCompression = None
+
+    # (de)compression of large messages in the thread pool (see
+    # perMessageCompressionOffloadSize)
+    _compressPending = False
+    _compressQueue = None
+    _offloadedFrameData = None
+    _receivePaused = False
+
+    # processing of buffered octets was deferred to the next event loop
+    # iteration (see receiveBudget), and too many octets were buffered meanwhile
+    _receiveYielded = False
+    _receiveResumeCall = None
+    _receiveBacklogPaused = False
+
+    # message handlers in flight, and reading paused because of these (see
+    # maxPendingMessages)
+    _pendingMessages = 0
+    _readingPaused = False
+
+    # reading from the transport is paused (see _updateTransportReading())
+    _transportReadingPaused = False
+
+    # idle connection hibernation (see idleHibernationTimeout)
+    _hibernated = False
+    _hibernationCall = None
+    _hibernationActivity = None
+
+    # incremental UTF8 validator and decoder (created when first needed)
+    utf8validator = None
+    utf8decoder = None
+    message_text = None
+
+    # track when frame/message payload sizes (incoming) were exceeded
+    wasMaxFramePayloadSizeExceeded = False
+    wasMaxMessagePayloadSizeExceeded = False
+
+    # the following vars are related to connection close handling/tracking
+
+    # True, iff I have initiated closing HS (that is, did send close first)
+    closedByMe = False
+
+    # True, iff I have failed the WS connection (i.e. due to protocol error)
+    # Failing can be either by initiating close HS or brutal drop (this is
+    # controlled by failByDrop option)
+    failedByMe = False
+
+    # True, iff I dropped the TCP connection (called transport.loseConnection())
+    droppedByMe = False
+
+    # True, iff full WebSocket closing handshake was performed (close frame sent
+    # and received) _and_ the server dropped the TCP (which is its responsibility)
+    wasClean = False
+
+    # When wasClean = False, the reason (what happened)
+    wasNotCleanReason = None
+
+    # When we are a client, and we expected the server to drop the TCP, but that
+    # didn't happen in time, this gets True
+    wasServerConnectionDropTimeout = False
+
+    # When the initial WebSocket opening handshake times out, this gets True
+    wasOpenHandshakeTimeout = False
+
+    # When we initiated a closing handshake, but the peer did not respond in
+    # time, this gets True
+    wasCloseHandshakeTimeout = False
+
+    # True, iff I dropped the TCP connection because we fully served the
+    # Flash Socket Policy File after a policy file request.
+    wasServingFlashSocketPolicyFile = False
+
+    # The close code I sent in close frame (if any)
+    localCloseCode = None
+
+    # The close reason I sent in close frame (if any)
+    localCloseReason = None
+
+    # The close code the peer sent me in close frame (if any)
+    remoteCloseCode = None
+
+    # The close reason the peer sent me in close frame (if any)
+    remoteCloseReason = None
+
+    # timers, which might get set up later, and remembered here to get canceled
+    # when appropriate
+    serverConnectionDropTimeoutCall = None
+    openHandshakeTimeoutCall = None
+    closeHandshakeTimeoutCall = None
+
+    autoPingTimeoutCall = None
+    autoPingPending = None
+    autoPingPendingCall = None
+
     def __init__(self):
         #: a Future/Deferred that fires when we hit STATE_CLOSED
         self.is_closed = txaio.create_future()
@@ -567,8 +1037,15 @@ class WebSocketProtocol(object):
         Implements :func:`autobahn.websocket.interfaces.IWebSocketChannel.onMessageBegin`
         """
         self.message_is_binary = isBinary
-        self.message_data = []
+        # the message is reassembled in a bytearray only when handed out as
+        # one (see messageDataBytearray): otherwise, the chunks are joined once
+        self.message_data = bytearray() if self.messageDataBytearray else []
         self.message_data_total_length = 0
+        # unless onMessageFrame is overridden, frame payload is appended right
+        # to the message data instead of being collected per frame first
+        self._messageDataInPlace = not self.logFrames and \
+            'onMessageFrame' not in self.__dict__ and \
+            six.get_unbound_function(self.__class__.onMessageFrame) is _onMessageFrameDefault
 
     def onMessageFrameBegin(self, length):
         """
@@ -604,7 +1081,15 @@ class WebSocketProtocol(object):
                         WebSocketProtocol.CLOSE_STATUS_CODE_MESSAGE_TOO_BIG,
                         u'message exceeds payload limit of {} octets'.format(self.maxMessagePayloadSize)
                     )
-                self.message_data.append(payload)
+                self._appendMessageData(payload)
+            elif self._messageDataInPlace:
+                # text decoded while receiving (see utf8decodeIncoming) is
+                # delivered instead of the octets, which needn't be kept
+                if self.message_text is None:
+                    self._appendMessageData(payload)
+            elif self._frameDataView:
+                # the memoryview is only valid during this call
+                self.frame_data.append(payload.tobytes())
             else:
                 self.frame_data.append(payload)
 
@@ -621,20 +1106,43 @@ class WebSocketProtocol(object):
         """
         Implements :func:`autobahn.websocket.interfaces.IWebSocketChannel.onMessageFrame`
         """
-        if not self.failedByMe:
-            self.message_data.extend(payload)
+        if not self.failedByMe and self.message_text is None:
+            for chunk in payload:
+                self._appendMessageData(chunk)
+
+    def _appendMessageData(self, payload):
+        """
+        Append a chunk of message payload to the message data.
+        """
+        if self.messageDataBytearray:
+            # grown in place (with amortized over-allocation by bytearray)
+            self.message_data += payload
+        elif type(payload) == memoryview:
+            # views into the receive buffer are only valid during this call
+            self.message_data.append(payload.tobytes())
+        else:
+            self.message_data.append(payload)
 
     def onMessageEnd(self):
         """
         Implements :func:`autobahn.websocket.interfaces.IWebSocketChannel.onMessageEnd`
         """
         if not self.failedByMe:
-            payload = b''.join(self.message_data)
-            if self.trackedTimings:
-                self.trackedTimings.track("onMessage")
-            self._onMessage(payload, self.message_is_binary)
+            if self.message_text is not None:
+                payload = u''.join(self.message_text)
+                if self.trackedTimings:
+                    self.trackedTimings.track("onMessage")
+                self._onTextMessage(payload)
+            else:
+                payload = self.message_data
+                if not self.messageDataBytearray:
+                    payload = payload[0] if len(payload) == 1 else b''.join(payload)
+                if self.trackedTimings:
+                    self.trackedTimings.track("onMessage")
+                self._onMessage(payload, self.message_is_binary)
 
         self.message_data = None
+        self.message_text = None
 
     def onMessage(self, payload, isBinary):
         """
@@ -646,6 +1154,87 @@ class WebSocketProtocol(object):
             isBinary=isBinary,
         )
 
+    def onTextMessage(self, payload):
+        """
+        Callback fired when a complete text message was received, and the
+        protocol option ``utf8decodeIncoming`` is enabled.
+
+        The default implementation encodes the text again, and forwards to
+        :meth:`onMessage`. Override this to consume the decoded text directly.
+
+        :param payload: The text message payload.
+        :type payload: unicode
+        """
+        self._onMessage(payload.encode('utf8'), False)
+
+    def _messageHandlerStarted(self, d):
+        """
+        Track a message handler which returned a Deferred/Future, and pause
+        reading from the transport while ``maxPendingMessages`` handlers are
+        in flight.
+        """
+        if not self.maxPendingMessages:
+            return
+
+        def done(res):
+            self._pendingMessages -= 1
+            if self._readingPaused and self._pendingMessages < self.maxPendingMessages:
+                self._resumeReading()
+            return res
+
+        self._pendingMessages += 1
+        txaio.add_callbacks(d, done, done)
+
+        # the handler might have completed already
+        if self._pendingMessages >= self.maxPendingMessages and not self._readingPaused:
+            self._pauseReading()
+
+    def _pauseReading(self):
+        """
+        Too many message handlers are in flight: stop processing buffered frames,
+        and stop reading from the transport, so that TCP flow control reaches the peer.
+        """
+        self._readingPaused = True
+        self.trafficStats.incomingReadingPaused += 1
+        self._updateTransportReading()
+
+    def _resumeReading(self):
+        """
+        Message handlers completed: resume reading from the transport, and process
+        the frames buffered in the meantime on the next event loop iteration.
+        """
+        self._readingPaused = False
+        if self.state == WebSocketProtocol.STATE_CLOSED:
+            return
+        self._updateTransportReading()
+        if self._rx_pos < len(self._rx_buffer):
+            self._yieldReceive()
+
+    def _updateTransportReading(self):
+        """
+        Pause reading from the transport while processing of received octets is held
+        up for any reason, and resume reading when no longer.
+        """
+        paused = self._readingPaused or self._receiveBacklogPaused or self._receivePaused
+        if paused != self._transportReadingPaused and self.state != WebSocketProtocol.STATE_CLOSED:
+            self._transportReadingPaused = paused
+            if paused:
+                self._pauseTransportReading()
+            else:
+                self._resumeTransportReading()
+
+    def _pauseTransportReading(self):
+        """
+        Stop reading from the transport. The networking framework specific
+        subclasses override this.
+        """
+
+    def _resumeTransportReading(self):
+        """
+        Resume reading from the transport. The networking framework specific
+        subclasses override this.
+        """
+
     def onPing(self, payload):
         """
         Implements :func:`autobahn.websocket.interfaces.IWebSocketChannel.onPing`
@@ -666,6 +1255,20 @@ class WebSocketProtocol(object):
             payload_len=(len(payload) if payload else 0),
         )
 
+    def onWritePaused(self):
+        """
+        Callback fired when the octets buffered for sending exceeded
+        ``writeHighWatermark``.
+        """
+        self.log.debug("WebSocketProtocol.onWritePaused()")
+
+    def onWriteResumed(self):
+        """
+        Callback fired when the octets buffered for sending dropped to
+        ``writeLowWatermark`` after writing was paused.
+        """
+        self.log.debug("WebSocketProtocol.onWriteResumed()")
+
     def onClose(self, wasClean, code, reason):
         """
         Implements :func:`autobahn.websocket.interfaces.IWebSocketChannel.onClose`
@@ -951,26 +1554,24 @@ class WebSocketProtocol(object):
         and handed over to a Protocol instance (an instance of this class).
         """
         # copy default options from factory (so we are not affected by changed on
-        # those), but only copy if not already set on protocol instance (allow
-        # to set configuration individually)
+        # those), but only copy if not already set on protocol instance or class
+        # (allow to set configuration individually). Options with the default value
+        # are not copied, but read from the class attribute.
         #
-        configAttrLog = []
+        overrides = self._getConfigOverrides()
         for configAttr in self.CONFIG_ATTRS:
-            if not hasattr(self, configAttr):
-                setattr(self, configAttr, getattr(self.factory, configAttr))
-                configAttrSource = self.factory.__class__.__name__
-            else:
-                configAttrSource = self.__class__.__name__
-            configAttrLog.append((configAttr, getattr(self, configAttr), configAttrSource))
+            if configAttr in overrides or configAttr in self.__dict__:
+                continue
+            value = getattr(self.factory, configAttr)
+            default = getattr(self.__class__, configAttr, _NO_DEFAULT)
+            if value is not default and (type(value) is not type(default) or value != default):
+                setattr(self, configAttr, value)
 
-        self.log.debug("\n{attrs}", attrs=pformat(configAttrLog))
-
-        # permessage-compress extension
-        self._perMessageCompress = None
+        self.log.debug("\n{attrs}", attrs=_LazyConfigFormatter(self, overrides))
 
         # Time tracking
-        self.trackedTimings = None
-        self.setTrackTimings(self.trackTimings)
+        if self.trackTimings:
+            self.trackedTimings = Timings()
 
         # Traffic stats
         self.trafficStats = TrafficStats()
@@ -981,78 +1582,13 @@ class WebSocketProtocol(object):
         else:
             self.state = WebSocketProtocol.STATE_CONNECTING
         self.send_state = WebSocketProtocol.SEND_STATE_GROUND
-        self.data = b''
-
-        # for chopped/synched sends, we need to queue to maintain
-        # ordering when recalling the reactor to actually "force"
-        # the octets to wire (see test/trickling in the repo)
-        self.send_queue = deque()
-        self.triggered = False
-
-        # incremental UTF8 validator
-        self.utf8validator = Utf8Validator()
-
-        # track when frame/message payload sizes (incoming) were exceeded
-        self.wasMaxFramePayloadSizeExceeded = False
-        self.wasMaxMessagePayloadSizeExceeded = False
-
-        # the following vars are related to connection close handling/tracking
-
-        # True, iff I have initiated closing HS (that is, did send close first)
-        self.closedByMe = False
-
-        # True, iff I have failed the WS connection (i.e. due to protocol error)
-        # Failing can be either by initiating close HS or brutal drop (this is
-        # controlled by failByDrop option)
-        self.failedByMe = False
-
-        # True, iff I dropped the TCP connection (called transport.loseConnection())
-        self.droppedByMe = False
-
-        # True, iff full WebSocket closing handshake was performed (close frame sent
-        # and received) _and_ the server dropped the TCP (which is its responsibility)
-        self.wasClean = False
-
-        # When self.wasClean = False, the reason (what happened)
-        self.wasNotCleanReason = None
-
-        # When we are a client, and we expected the server to drop the TCP, but that
-        # didn't happen in time, this gets True
-        self.wasServerConnectionDropTimeout = False
-
-        # When the initial WebSocket opening handshake times out, this gets True
-        self.wasOpenHandshakeTimeout = False
 
-        # When we initiated a closing handshake, but the peer did not respond in
-        # time, this gets True
-        self.wasCloseHandshakeTimeout = False
+        # incoming octets are buffered in a bytearray, and consumed by
+        # advancing a read position (instead of re-slicing the buffer)
+        self._rx_buffer = bytearray()
 
-        # True, iff I dropped the TCP connection because we fully served the
-        # Flash Socket Policy File after a policy file request.
-        self.wasServingFlashSocketPolicyFile = False
-
-        # The close code I sent in close frame (if any)
-        self.localCloseCode = None
-
-        # The close reason I sent in close frame (if any)
-        self.localCloseReason = None
-
-        # The close code the peer sent me in close frame (if any)
-        self.remoteCloseCode = None
-
-        # The close reason the peer sent me in close frame (if any)
-        self.remoteCloseReason = None
-
-        # timers, which might get set up later, and remembered here to get canceled
-        # when appropriate
-        if not self.factory.isServer:
-            self.serverConnectionDropTimeoutCall = None
-        self.openHandshakeTimeoutCall = None
-        self.closeHandshakeTimeoutCall = None
-
-        self.autoPingTimeoutCall = None
-        self.autoPingPending = None
-        self.autoPingPendingCall = None
+        # all other state starts out with the defaults set on the class (see
+        # "Per-connection state" above)
 
         # set opening handshake timeout handler
         if self.openHandshakeTimeout > 0:
@@ -1061,6 +1597,26 @@ class WebSocketProtocol(object):
                 self.onOpenHandshakeTimeout,
             )
 
+    @classmethod
+    def _getConfigOverrides(cls):
+        """
+        Get the configuration attributes set on (user defined) protocol classes,
+        which take precedence over the options of the factory.
+
+        :returns: frozenset -- The attribute names.
+        """
+        overrides = _configOverrides.get(cls)
+        if overrides is None:
+            overrides = set()
+            for klass in cls.__mro__:
+                if klass.__module__ == __name__:
+                    # the defaults set in this module
+                    break
+                overrides.update(a for a in cls.CONFIG_ATTRS if a in vars(klass))
+            overrides = frozenset(overrides)
+            _configOverrides[cls] = overrides
+        return overrides
+
     def _connectionLost(self, reason):
         """
         This is called by network framework when a transport connection was
@@ -1087,6 +1643,27 @@ class WebSocketProtocol(object):
             self.autoPingTimeoutCall.cancel()
             self.autoPingTimeoutCall = None
 
+        # cleanup idle hibernation timer
+        #
+        if self._hibernationCall:
+            self._hibernationCall.cancel()
+            self._hibernationCall = None
+
+        # cancel processing deferred to the next event loop iteration
+        #
+        if self._receiveResumeCall:
+            self._receiveResumeCall.cancel()
+            self._receiveResumeCall = None
+
+        # cleanup outgoing flow control
+        #
+        self._writePaused = False
+        self._resolveDrainWaiters()
+
+        # drop messages waiting for a message compressed in the thread pool
+        #
+        self._compressQueue = None
+
         # check required here because in some scenarios dropConnection
         # will already have resolved the Future/Deferred.
         if self.state != WebSocketProtocol.STATE_CLOSED:
@@ -1170,16 +1747,61 @@ class WebSocketProtocol(object):
         This is called by network framework upon receiving data on transport
         connection.
         """
-        if self.state == WebSocketProtocol.STATE_OPEN:
-            self.trafficStats.incomingOctetsWireLevel += len(data)
-        elif self.state == WebSocketProtocol.STATE_CONNECTING or self.state == WebSocketProtocol.STATE_PROXY_CONNECTING:
-            self.trafficStats.preopenIncomingOctetsWireLevel += len(data)
+        if self._hibernated:
+            self._wakeUp()
 
+        self._trackIncomingOctets(len(data))
         if self.logOctets:
             self.logRxOctets(data)
-        self.data += data
+        try:
+            self._rx_buffer += data
+        except BufferError:
+            # a memoryview into the receive buffer was held on to beyond
+            # onMessageFrameData (see frameDataMemoryview)
+            self._rx_buffer = self._rx_buffer + data
         self.consumeData()
 
+    def _getReceiveBuffer(self, size):
+        """
+        Reserve ``size`` octets at the end of the receive buffer, for the network
+        framework to read incoming data into directly (instead of handing the data
+        to :meth:`_dataReceived`, which copies it into the receive buffer).
+
+        The network framework must release the returned memoryview, and then call
+        :meth:`_receiveBufferUpdated` with the number of octets read.
+        """
+        if self._hibernated:
+            self._wakeUp()
+
+        reserve = _ZEROS[:size] if size <= len(_ZEROS) else bytes(size)
+        try:
+            self._rx_buffer += reserve
+        except BufferError:
+            # see _dataReceived()
+            self._rx_buffer = self._rx_buffer + reserve
+        self._rx_reserved = size
+        return memoryview(self._rx_buffer)[len(self._rx_buffer) - size:]
+
+    def _receiveBufferUpdated(self, nbytes):
+        """
+        The network framework read ``nbytes`` octets into the buffer returned by
+        :meth:`_getReceiveBuffer`.
+        """
+        end = len(self._rx_buffer) - self._rx_reserved + nbytes
+        del self._rx_buffer[end:]
+        self._rx_reserved = 0
+
+        self._trackIncomingOctets(nbytes)
+        if self.logOctets:
+            self.logRxOctets(bytes(self._rx_buffer[end - nbytes:end]))
+        self.consumeData()
+
+    def _trackIncomingOctets(self, length):
+        if self.state == WebSocketProtocol.STATE_OPEN:
+            self.trafficStats.incomingOctetsWireLevel += length
+        elif self.state == WebSocketProtocol.STATE_CONNECTING or self.state == WebSocketProtocol.STATE_PROXY_CONNECTING:
+            self.trafficStats.preopenIncomingOctetsWireLevel += length
+
     def consumeData(self):
         """
         Consume buffered (incoming) data.
@@ -1188,10 +1810,42 @@ class WebSocketProtocol(object):
         #
         if self.state == WebSocketProtocol.STATE_OPEN or self.state == WebSocketProtocol.STATE_CLOSING:
 
+            # processing continues on the next event loop iteration ..
+            #
+            if self._receiveYielded:
+                # .. but don't buffer more than a few receive budgets meanwhile
+                if not self._receiveBacklogPaused and \
+                   len(self._rx_buffer) - self._rx_pos > self._RECEIVE_BACKLOG_BUDGETS * self.receiveBudget:
+                    self._receiveBacklogPaused = True
+                    self._updateTransportReading()
+                return
+
             # process until no more buffered data left or WS was closed
             #
-            while self.processData() and self.state != WebSocketProtocol.STATE_CLOSED:
-                pass
+            if self.receiveBudget:
+                # .. or the receive budget for this event loop iteration is used up
+                # (checked in between frames)
+                limit = self._rx_pos + self.receiveBudget
+                while not self._receivePaused and not self._readingPaused and self.processData() and self.state != WebSocketProtocol.STATE_CLOSED:
+                    if self._rx_pos >= limit and self.current_frame is None:
+                        if self._rx_pos < len(self._rx_buffer):
+                            self._yieldReceive()
+                        break
+            else:
+                while not self._receivePaused and not self._readingPaused and self.processData() and self.state != WebSocketProtocol.STATE_CLOSED:
+                    pass
+
+            # drop consumed octets from the receive buffer (when processing continues
+            # on the next event loop iteration, only once at least half of the buffer
+            # was consumed, so a large backlog is not moved over and over)
+            #
+            if not self._receiveYielded or self._rx_pos * 2 >= len(self._rx_buffer):
+                self._compactReceiveBuffer()
+
+            if self._receiveBacklogPaused and \
+               len(self._rx_buffer) - self._rx_pos <= self._RECEIVE_BACKLOG_BUDGETS * self.receiveBudget:
+                self._receiveBacklogPaused = False
+                self._updateTransportReading()
 
         # need to establish proxy connection
         #
@@ -1222,6 +1876,123 @@ class WebSocketProtocol(object):
         else:
             raise Exception("invalid state")
 
+    @property
+    def data(self):
+        """
+        The buffered, not yet consumed incoming octets.
+
+        This returns a copy, and is meant for the (infrequent) processing
+        of opening handshake and proxy connect data. Frame processing works
+        directly on the receive buffer.
+        """
+        return bytes(self._rx_buffer[self._rx_pos:])
+
+    @data.setter
+    def data(self, data):
+        self._rx_buffer = bytearray(data)
+        self._rx_pos = 0
+
+    def _yieldReceive(self):
+        """
+        The receive budget is used up: let other connections run, and process
+        the rest of the buffered octets on the next event loop iteration. Octets
+        received in the meantime are only buffered.
+        """
+        if self._receiveYielded:
+            return
+        self._receiveYielded = True
+        self._receiveResumeCall = txaio.call_later(0, self._resumeReceive)
+
+    def _resumeReceive(self):
+        self._receiveResumeCall = None
+        self._receiveYielded = False
+        self.consumeData()
+
+    def _compactReceiveBuffer(self):
+        """
+        Drop already consumed octets from the front of the receive buffer.
+
+        This is done once per chunk of received data (and not once per frame
+        processed), so the unconsumed octets are not copied over and over
+        when many frames are pipelined within one chunk.
+        """
+        if self._rx_pos:
+            if self._rx_pos >= len(self._rx_buffer):
+                self._rx_buffer = bytearray()
+            elif self._rx_viewed:
+                # don't shift octets under memoryviews delivered to
+                # onMessageFrameData (see frameDataMemoryview)
+                self._rx_buffer = self._rx_buffer[self._rx_pos:]
+            else:
+                del self._rx_buffer[:self._rx_pos]
+            self._rx_pos = 0
+        self._rx_viewed = False
+
+    def _scheduleHibernation(self):
+        """
+        Check again for the connection being idle after ``idleHibernationTimeout``.
+        """
+        if self.idleHibernationTimeout and self.state == WebSocketProtocol.STATE_OPEN:
+            self._hibernationActivity = (self.trafficStats.incomingOctetsWireLevel,
+                                         self.trafficStats.outgoingOctetsWireLevel)
+            self._hibernationCall = self._batched_timer.call_later(
+                self.idleHibernationTimeout,
+                self._checkHibernation,
+            )
+
+    def _checkHibernation(self):
+        """
+        Hibernate the connection when no octets were received or sent since
+        the last check, and nothing is in flight.
+        """
+        self._hibernationCall = None
+        if self.state != WebSocketProtocol.STATE_OPEN:
+            return
+        activity = (self.trafficStats.incomingOctetsWireLevel,
+                    self.trafficStats.outgoingOctetsWireLevel)
+        if activity == self._hibernationActivity and \
+           not self.inside_message and \
+           self.current_frame is None and \
+           self._rx_pos >= len(self._rx_buffer) and \
+           not self.send_queue and \
+           not self._sendQueueControl and \
+           not self._sendQueueHigh and \
+           not self.triggered and \
+           self._corkDepth == 0 and \
+           not self._writePaused and \
+           not self._compressPending and \
+           not self._receivePaused and \
+           not self._receiveYielded and \
+           not self._readingPaused:
+            self._hibernate()
+        else:
+            self._scheduleHibernation()
+
+    def _hibernate(self):
+        """
+        Release per-connection state which is only needed while receiving or
+        sending. It is recreated when needed again.
+        """
+        self.log.debug("hibernating idle connection to {peer}", peer=self.peer)
+        self._hibernated = True
+        self.utf8validator = None
+        self.utf8decoder = None
+        self.message_text = None
+        self.send_queue = None
+        self._sendQueueControl = None
+        self._sendQueueHigh = None
+        self._compressQueue = None
+        self._rx_buffer = bytearray()
+        self._rx_pos = 0
+
+    def _wakeUp(self):
+        """
+        The connection became active again. The state released when hibernating
+        is recreated when needed.
+        """
+        self._hibernated = False
+        self._scheduleHibernation()
+
     def processProxyConnect(self):
         """
         Process proxy connect.
@@ -1248,18 +2019,22 @@ class WebSocketProtocol(object):
         Send out stuff from send queue. For details how this works, see
         test/trickling in the repo.
         """
-        if len(self.send_queue) > 0:
-            e = self.send_queue.popleft()
+        lane = self._nextSendLane()
+        if lane is not None:
+            e = self._getSendQueue(lane).popleft()
+            if lane != WebSocketProtocol.SEND_LANE_CONTROL:
+                self._trackSendBoundary(lane, e[2])
 
             if self.state != WebSocketProtocol.STATE_CLOSED:
 
-                self.transport.write(e[0])
-
+                self._writtenOctets += len(e[0])
                 if self.state == WebSocketProtocol.STATE_OPEN:
                     self.trafficStats.outgoingOctetsWireLevel += len(e[0])
                 elif self.state == WebSocketProtocol.STATE_CONNECTING or self.state == WebSocketProtocol.STATE_PROXY_CONNECTING:
                     self.trafficStats.preopenOutgoingOctetsWireLevel += len(e[0])
 
+                self.transport.write(e[0])
+
                 if self.logOctets:
                     self.logTxOctets(e[0], e[1])
             else:
@@ -1274,6 +2049,219 @@ class WebSocketProtocol(object):
         else:
             self.triggered = False
 
+    def _nextSendLane(self):
+        """
+        Pick the send queue lane to write the next entry from: control frames
+        are written as soon as no frame is being written, and high priority
+        messages as soon as no message is being written.
+        """
+        if self._sendQueueControl and self._sendAtFrameBoundary:
+            return WebSocketProtocol.SEND_LANE_CONTROL
+        if self._sendActiveLane != WebSocketProtocol.SEND_LANE_NORMAL and self._sendQueueHigh:
+            return WebSocketProtocol.SEND_LANE_HIGH
+        if self._sendActiveLane != WebSocketProtocol.SEND_LANE_HIGH and self.send_queue:
+            return WebSocketProtocol.SEND_LANE_NORMAL
+        return None
+
+    def _trackSendBoundary(self, lane, boundary):
+        """
+        Remember where the octets of a data lane written last ended.
+        """
+        atFrameBoundary = boundary != WebSocketProtocol._SEND_BOUNDARY_NONE
+        if atFrameBoundary != self._sendAtFrameBoundary:
+            self._sendAtFrameBoundary = atFrameBoundary
+        if boundary == WebSocketProtocol._SEND_BOUNDARY_MESSAGE:
+            lane = None
+        if lane != self._sendActiveLane:
+            self._sendActiveLane = lane
+
+    def getSendQueueDepth(self):
+        """
+        Get the number of writes queued in each lane of the send queue.
+
+        :returns: dict -- Queued writes per lane (``SEND_LANE_CONTROL``,
+            ``SEND_LANE_HIGH`` and ``SEND_LANE_NORMAL``).
+        """
+        return {
+            WebSocketProtocol.SEND_LANE_CONTROL: len(self._sendQueueControl or ()),
+            WebSocketProtocol.SEND_LANE_HIGH: len(self._sendQueueHigh or ()),
+            WebSocketProtocol.SEND_LANE_NORMAL: len(self.send_queue or ()),
+        }
+
+    def _writeSequence(self, data):
+        """
+        Write a list of octet strings to the transport. The networking framework
+        specific subclasses override this to use a vectored write.
+        """
+        self.transport.write(b''.join(data))
+
+    def _getWriteBufferSize(self):
+        """
+        Get the number of octets buffered in the transport, not yet written to
+        the network. The networking framework specific subclasses override this.
+        """
+        return 0
+
+    def _writeData(self, data):
+        """
+        Write octets (or a list of octet strings) directly to the transport,
+        or buffer the octets while corked.
+        """
+        # account for the octets before writing, since the transport may
+        # call back into the protocol (see _pauseWriting)
+        if type(data) == list:
+            l = sum([len(d) for d in data])
+        else:
+            l = len(data)
+
+        self._writtenOctets += l
+        if self.state == WebSocketProtocol.STATE_OPEN:
+            self.trafficStats.outgoingOctetsWireLevel += l
+        elif self.state == WebSocketProtocol.STATE_CONNECTING or self.state == WebSocketProtocol.STATE_PROXY_CONNECTING:
+            self.trafficStats.preopenOutgoingOctetsWireLevel += l
+
+        if type(data) == list:
+            if self._corkedData is not None:
+                self._corkedData.extend(data)
+                self._corkedWrites += 1
+            else:
+                self._writeSequence(data)
+        else:
+            if self._corkedData is not None:
+                self._corkedData.append(data)
+                self._corkedWrites += 1
+            else:
+                self.transport.write(data)
+
+        if self.logOctets:
+            self.logTxOctets(b''.join(data) if type(data) == list else data, False)
+
+    def _flushCorked(self):
+        """
+        Write out octets buffered while corked with a single (vectored) write.
+        """
+        data = self._corkedData
+        writes = self._corkedWrites
+        self._corkedData = None
+        self._corkedWrites = 0
+
+        if not data:
+            return
+
+        if self.state == WebSocketProtocol.STATE_CLOSED:
+            self.log.debug("skipped corked write, since connection is closed")
+            return
+
+        if len(data) == 1:
+            self.transport.write(data[0])
+        else:
+            self._writeSequence(data)
+
+        if writes > 1:
+            self.trafficStats.outgoingWritesSaved += writes - 1
+
+    def _pauseWriting(self):
+        """
+        The outgoing buffer exceeded the high watermark: apply the policy
+        configured in ``writeHighWatermarkPolicy``.
+
+        The networking framework specific subclasses call this from the flow
+        control callbacks of the transport.
+        """
+        if self.writeHighWatermark == 0 or self._writePaused or self.state == WebSocketProtocol.STATE_CLOSED:
+            return
+
+        self._writePaused = True
+
+        if self.writeHighWatermarkPolicy == u'close':
+            self._fail_connection(WebSocketProtocol.CLOSE_STATUS_CODE_POLICY_VIOLATION,
+                                  u'outgoing buffer exceeded {} octets'.format(self.writeHighWatermark))
+            return
+
+        if self.writeHighWatermarkPolicy == u'block' and self._producer is not None and self._producerStreaming:
+            self._producer.pauseProducing()
+
+        self._onWritePaused()
+
+    def _resumeWriting(self):
+        """
+        The outgoing buffer drained to the low watermark: resume writing.
+
+        The networking framework specific subclasses call this from the flow
+        control callbacks of the transport.
+        """
+        if not self._writePaused or self.state == WebSocketProtocol.STATE_CLOSED:
+            return
+
+        self._writePaused = False
+
+        if self.writeHighWatermarkPolicy == u'block' and self._producer is not None and self._producerStreaming:
+            self._producer.resumeProducing()
+
+        self._resolveDrainWaiters()
+        self._onWriteResumed()
+
+    def _resolveDrainWaiters(self):
+        waiters = self._drainWaiters
+        if waiters:
+            self._drainWaiters = None
+            for d in waiters:
+                txaio.resolve(d, None)
+
+    def drain(self):
+        """
+        Wait until writing is not paused (see ``writeHighWatermark``).
+
+        :returns: A Deferred/Future which resolves when the outgoing buffer
+            dropped to the low watermark (or immediately, when writing is
+            not paused).
+        """
+        d = txaio.create_future()
+        if self._writePaused:
+            if self._drainWaiters is None:
+                self._drainWaiters = []
+            self._drainWaiters.append(d)
+        else:
+            txaio.resolve(d, None)
+        return d
+
+    def _dropPausedMessage(self):
+        """
+        Returns ``True`` iff a data message to be sent should be dropped, since
+        the outgoing buffer exceeded the high watermark.
+        """
+        if self._writePaused and self.writeHighWatermarkPolicy == u'drop':
+            self.trafficStats.outgoingWebSocketMessagesDropped += 1
+            return True
+        return False
+
+    @contextmanager
+    def cork(self):
+        """
+        Context manager which buffers all octets sent within the context,
+        and writes them to the transport with a single (vectored) write when
+        leaving the (outermost) context:
+
+        .. code-block:: python
+
+            with proto.cork():
+                for payload in payloads:
+                    proto.sendMessage(payload)
+
+        Synched and chopped writes (which go through the send queue) are not
+        buffered, but flush octets buffered up to that point first, so the
+        order of octets on the wire is preserved.
+        """
+        self._corkDepth += 1
+        if self._corkedData is None:
+            self._corkedData = []
+        try:
+            yield
+        finally:
+            self._corkDepth -= 1
+            if self._corkDepth == 0:
+                self._flushCorked()
+
     def sendData(self, data, sync=False, chopsize=None):
         """
         Wrapper for self.transport.write which allows to give a chopsize.
@@ -1283,8 +2271,42 @@ class WebSocketProtocol(object):
         and unrelated to WebSocket data message fragmentation. Note that this
         is also different from the TcpNoDelay option which can be set on the
         socket.
+
+        ``data`` can also be a list of octet strings, which are then written
+        to the transport in one go (without joining them first).
+
+        Queued octets are written in order, except that pings and pongs are
+        written at the next frame boundary, and high priority messages (see
+        sendMessage) at the next message boundary (see getSendQueueDepth).
         """
+        if self._sendFrameLane is not None:
+            # a complete frame (see sendFrame)
+            lane, boundary = self._sendFrameLane
+        else:
+            lane = WebSocketProtocol.SEND_LANE_NORMAL
+            if self.send_state == WebSocketProtocol.SEND_STATE_INSIDE_MESSAGE_FRAME:
+                boundary = WebSocketProtocol._SEND_BOUNDARY_NONE
+            elif self.send_state == WebSocketProtocol.SEND_STATE_GROUND:
+                boundary = WebSocketProtocol._SEND_BOUNDARY_MESSAGE
+            else:
+                boundary = WebSocketProtocol._SEND_BOUNDARY_FRAME
+
+        if self._hibernated:
+            self._wakeUp()
+
+        queued = self.send_queue or self._sendQueueControl or self._sendQueueHigh
+
+        if (chopsize and chopsize > 0) or sync or queued:
+            # octets going through the send queue: join a list of octet
+            # strings, and write out octets buffered while corked before
+            if type(data) == list:
+                data = b''.join(data)
+            if self._corkedData:
+                self._flushCorked()
+                self._corkedData = []
+
         if chopsize and chopsize > 0:
+            queue = self._getSendQueue(lane)
             i = 0
             n = len(data)
             done = False
@@ -1293,39 +2315,119 @@ class WebSocketProtocol(object):
                 if j >= n:
                     done = True
                     j = n
-                self.send_queue.append((data[i:j], True))
+                queue.append((data[i:j], True, boundary if done else WebSocketProtocol._SEND_BOUNDARY_NONE))
                 i += chopsize
             self._trigger()
         else:
-            if sync or len(self.send_queue) > 0:
-                self.send_queue.append((data, sync))
+            if sync or queued:
+                self._getSendQueue(lane).append((data, sync, boundary))
                 self._trigger()
             else:
-                self.transport.write(data)
+                if lane != WebSocketProtocol.SEND_LANE_CONTROL:
+                    self._trackSendBoundary(lane, boundary)
+                self._writeData(data)
+
+    def _getSendQueue(self, lane):
+        """
+        Get the send queue lane, which is created when first needed.
+        """
+        if lane == WebSocketProtocol.SEND_LANE_NORMAL:
+            if self.send_queue is None:
+                self.send_queue = deque()
+            return self.send_queue
+        elif lane == WebSocketProtocol.SEND_LANE_CONTROL:
+            if self._sendQueueControl is None:
+                self._sendQueueControl = deque()
+            return self._sendQueueControl
+        else:
+            if self._sendQueueHigh is None:
+                self._sendQueueHigh = deque()
+            return self._sendQueueHigh
 
-                if self.state == WebSocketProtocol.STATE_OPEN:
-                    self.trafficStats.outgoingOctetsWireLevel += len(data)
-                elif self.state == WebSocketProtocol.STATE_CONNECTING or self.state == WebSocketProtocol.STATE_PROXY_CONNECTING:
-                    self.trafficStats.preopenOutgoingOctetsWireLevel += len(data)
+    def _shouldCompress(self, payloadLen, isBinary):
+        """
+        Decide whether to compress an outgoing data message when compression
+        is in use (see ``perMessageCompressionMinSize`` and
+        ``perMessageCompressionAdaptive``).
+        """
+        if payloadLen < self.perMessageCompressionMinSize:
+            return False
+        if self.perMessageCompressionAdaptive:
+            if self._adaptiveCompression is None:
+                self._adaptiveCompression = {}
+            adaptive = self._adaptiveCompression.get(isBinary)
+            if adaptive is None:
+                adaptive = _AdaptiveCompression(self.perMessageCompressionAdaptiveWindow,
+                                                self.perMessageCompressionAdaptiveRatio,
+                                                self.perMessageCompressionAdaptiveProbeInterval)
+                self._adaptiveCompression[isBinary] = adaptive
+            return adaptive.shouldCompress()
+        return True
 
-                if self.logOctets:
-                    self.logTxOctets(data, False)
+    def _trackCompression(self, isBinary, uncompressedLen, compressedLen):
+        if self.perMessageCompressionAdaptive:
+            adaptive = self._adaptiveCompression[isBinary]
+            adaptive.track(uncompressedLen, compressedLen)
+            if not adaptive.enabled:
+                self.log.debug(
+                    "compression of {kind} messages does not pay off: sending uncompressed",
+                    kind="binary" if isBinary else "text",
+                )
+
+    def _configurePerMessageCompress(self):
+        """
+        Apply compression options to the permessage-compress extension
+        processor negotiated for this connection.
+        """
+        if isinstance(self._perMessageCompress, PerMessageDeflate):
+            self._perMessageCompress.compress_level = self.perMessageDeflateLevel
+            self._perMessageCompress.compress_strategy = self.perMessageDeflateStrategy
 
     def sendPreparedMessage(self, preparedMsg):
         """
         Implements :func:`autobahn.websocket.interfaces.IWebSocketChannel.sendPreparedMessage`
         """
+        if self._dropPausedMessage():
+            return
+
+        if self._compressPending or self._compressQueue:
+            # a message is being compressed in the thread pool: keep message order
+            self._queueAfterCompression(self._sendPreparedMessage, preparedMsg)
+            return
+
+        self._sendPreparedMessage(preparedMsg)
+
+    def _sendPreparedMessage(self, preparedMsg):
         if self._perMessageCompress is None or preparedMsg.doNotCompress:
-            self.sendData(preparedMsg.payloadHybi)
+            self.sendData(preparedMsg.frameHybi)
+        elif not self._shouldCompress(len(preparedMsg.payload), preparedMsg.binary):
+            if self.state == WebSocketProtocol.STATE_OPEN:
+                self.trafficStats.outgoingWebSocketMessagesUncompressed += 1
+            self.sendData(preparedMsg.frameHybi)
         else:
-            self.sendMessage(preparedMsg.payload, preparedMsg.binary)
+            t0 = _cputime()
+            compressed = preparedMsg.getCompressedFrame(self._perMessageCompress)
+            self.trafficStats.outgoingCompressionTime += _cputime() - t0
+            if compressed is None:
+                if self.state == WebSocketProtocol.STATE_OPEN:
+                    self._sendMessage(preparedMsg.payload, preparedMsg.binary, None, False, False)
+            elif self.state == WebSocketProtocol.STATE_OPEN:
+                frame, compressedLen = compressed
+                self._trackCompression(preparedMsg.binary, len(preparedMsg.payload), compressedLen)
+                self.trafficStats.outgoingWebSocketMessages += 1
+                self.trafficStats.outgoingWebSocketFrames += 1
+                self.trafficStats.outgoingOctetsAppLevel += len(preparedMsg.payload)
+                self.trafficStats.outgoingOctetsWebSocketLevel += compressedLen
+                self.sendData(frame)
 
     def processData(self):
         """
         After WebSocket handshake has been completed, this procedure will do
         all subsequent processing of incoming bytes.
         """
-        buffered_len = len(self.data)
+        buf = self._rx_buffer
+        pos = self._rx_pos
+        buffered_len = len(buf) - pos
 
         # outside a frame, that is we are awaiting data which starts a new frame
         #
@@ -1337,20 +2439,14 @@ class WebSocketProtocol(object):
 
                 # FIN, RSV, OPCODE
                 #
-                if six.PY3:
-                    b = self.data[0]
-                else:
-                    b = ord(self.data[0])
+                b = buf[pos]
                 frame_fin = (b & 0x80) != 0
                 frame_rsv = (b & 0x70) >> 4
                 frame_opcode = b & 0x0f
 
                 # MASK, PAYLOAD LEN 1
                 #
-                if six.PY3:
-                    b = self.data[1]
-                else:
-                    b = ord(self.data[1])
+                b = buf[pos + 1]
                 frame_masked = (b & 0x80) != 0
                 frame_payload_len1 = b & 0x7f
 
@@ -1460,18 +2556,18 @@ class WebSocketProtocol(object):
 
                     # minimum frame header length (already consumed)
                     #
-                    i = 2
+                    i = pos + 2
 
                     # extract extended payload length
                     #
                     if frame_payload_len1 == 126:
-                        frame_payload_len = struct.unpack("!H", self.data[i:i + 2])[0]
+                        frame_payload_len = struct.unpack_from("!H", buf, i)[0]
                         if frame_payload_len < 126:
                             if self._protocol_violation(u'invalid data frame length (not using minimal length encoding)'):
                                 return False
                         i += 2
                     elif frame_payload_len1 == 127:
-                        frame_payload_len = struct.unpack("!Q", self.data[i:i + 8])[0]
+                        frame_payload_len = struct.unpack_from("!Q", buf, i)[0]
                         if frame_payload_len > 0x7FFFFFFFFFFFFFFF:  # 2**63
                             if self._protocol_violation(u'invalid data frame length (>2^63)'):
                                 return False
@@ -1486,7 +2582,7 @@ class WebSocketProtocol(object):
                     #
                     frame_mask = None
                     if frame_masked:
-                        frame_mask = self.data[i:i + 4]
+                        frame_mask = bytes(buf[i:i + 4])
                         i += 4
 
                     if frame_masked and frame_payload_len > 0 and self.applyMask:
@@ -1494,9 +2590,9 @@ class WebSocketProtocol(object):
                     else:
                         self.current_frame_masker = XorMaskerNull()
 
-                    # remember rest (payload of current frame after header and everything thereafter)
+                    # advance read position to the payload of current frame
                     #
-                    self.data = self.data[i:]
+                    self._rx_pos = i
 
                     # ok, got complete frame header
                     #
@@ -1512,7 +2608,7 @@ class WebSocketProtocol(object):
 
                     # reprocess when frame has no payload or and buffered data left
                     #
-                    return frame_payload_len == 0 or len(self.data) > 0
+                    return frame_payload_len == 0 or len(self._rx_buffer) > self._rx_pos
 
                 else:
                     return False  # need more data
@@ -1527,35 +2623,58 @@ class WebSocketProtocol(object):
             #
             rest = self.current_frame.length - self.current_frame_masker.pointer()
             if buffered_len >= rest:
-                data = self.data[:rest]
                 length = rest
-                self.data = self.data[rest:]
             else:
-                data = self.data
                 length = buffered_len
-                self.data = b''
+            self._rx_pos = pos + length
 
-            if length > 0:
-                # unmask payload
+            if self._frameDataView:
+                # deliver payload as memoryview (only valid during the callback)
                 #
-                payload = self.current_frame_masker.process(data)
+                view = payload = memoryview(buf)[pos:pos + length]
+                self._rx_viewed = True
+                try:
+                    if _MASKER_ACCEPTS_BUFFERS:
+                        payload = self.current_frame_masker.process(view)
+                    else:
+                        payload = self.current_frame_masker.process(view.tobytes())
+                    if type(payload) is not memoryview:
+                        payload = memoryview(payload)
+                    fr = self.onFrameData(payload)
+                finally:
+                    # release the receive buffer, so it can be resized again
+                    payload.release()
+                    view.release()
+                # noinspection PySimplifyBooleanCheck
+                if fr is False:
+                    return False
             else:
-                # we also process empty payloads, since we need to fire
-                # our hooks (at least for streaming processing, this is
-                # necessary for correct protocol state transitioning)
-                #
-                payload = b''
+                if length > 0:
+                    # unmask payload
+                    #
+                    data = memoryview(buf)[pos:pos + length].tobytes()
+                    payload = self.current_frame_masker.process(data)
+                else:
+                    # we also process empty payloads, since we need to fire
+                    # our hooks (at least for streaming processing, this is
+                    # necessary for correct protocol state transitioning)
+                    #
+                    payload = b''
 
-            # process frame data
-            #
-            fr = self.onFrameData(payload)
-            # noinspection PySimplifyBooleanCheck
-            if fr is False:
-                return False
+                # process frame data
+                #
+                fr = self.onFrameData(payload)
+                # noinspection PySimplifyBooleanCheck
+                if fr is False:
+                    return False
 
             # fire frame end handler when frame payload is complete
             #
             if self.current_frame_masker.pointer() == self.current_frame.length:
+                if self._offloadedFrameData is not None:
+                    # pause processing until decompressed in the thread pool
+                    self._decompressFrameData()
+                    return False
                 fr = self.onFrameEnd()
                 # noinspection PySimplifyBooleanCheck
                 if fr is False:
@@ -1563,7 +2682,7 @@ class WebSocketProtocol(object):
 
             # reprocess when no error occurred and buffered data left
             #
-            return len(self.data) > 0
+            return len(self._rx_buffer) > self._rx_pos
 
     def onFrameBegin(self):
         """
@@ -1571,6 +2690,7 @@ class WebSocketProtocol(object):
         """
         if self.current_frame.opcode > 7:
             self.control_frame_data = []
+            self._frameDataView = False
         else:
             # new message started
             #
@@ -1582,14 +2702,33 @@ class WebSocketProtocol(object):
                 #
                 if self._perMessageCompress is not None and self.current_frame.rsv == 4:
                     self._isMessageCompressed = True
+                    self._inflatedMessageLength = 0
                     self._perMessageCompress.startDecompressMessage()
                 else:
                     self._isMessageCompressed = False
 
-                # setup UTF8 validator
+                # setup UTF8 decoder
                 #
-                if self.current_frame.opcode == WebSocketProtocol.MESSAGE_TYPE_TEXT and self.utf8validateIncoming:
-                    self.utf8validator.reset()
+                if self.current_frame.opcode == WebSocketProtocol.MESSAGE_TYPE_TEXT and self.utf8decodeIncoming:
+                    if self.utf8decoder is None:
+                        self.utf8decoder = _Utf8IncrementalDecoder()
+                    else:
+                        self.utf8decoder.reset()
+                    self.utf8decodeIncomingCurrentMessage = True
+                    self.utf8decodeOctets = 0
+                    self.message_text = []
+                else:
+                    self.utf8decodeIncomingCurrentMessage = False
+                    self.message_text = None
+
+                # setup UTF8 validator (the decoder validates while decoding)
+                #
+                if self.current_frame.opcode == WebSocketProtocol.MESSAGE_TYPE_TEXT and self.utf8validateIncoming and \
+                   not (self.utf8decodeIncomingCurrentMessage and _UTF8_DECODER_VALIDATES):
+                    if self.utf8validator is None:
+                        self.utf8validator = Utf8Validator()
+                    else:
+                        self.utf8validator.reset()
                     self.utf8validateIncomingCurrentMessage = True
                     self.utf8validateLast = (True, True, 0, 0)
                 else:
@@ -1604,6 +2743,15 @@ class WebSocketProtocol(object):
                 #
                 self._onMessageBegin(self.current_frame.opcode == WebSocketProtocol.MESSAGE_TYPE_BINARY)
 
+            # decompress large frames in the thread pool
+            #
+            if self._isMessageCompressed and 0 < self.perMessageCompressionOffloadSize <= self.current_frame.length:
+                self._offloadedFrameData = []
+
+            # deliver uncompressed payload as memoryview into the receive buffer
+            #
+            self._frameDataView = self.frameDataMemoryview and not self._isMessageCompressed and _MEMORYVIEW_RELEASE
+
             self._onMessageFrameBegin(self.current_frame.length)
 
     def onFrameData(self, payload):
@@ -1612,6 +2760,9 @@ class WebSocketProtocol(object):
         """
         if self.current_frame.opcode > 7:
             self.control_frame_data.append(payload)
+        elif self._offloadedFrameData is not None:
+            # decompressed in one go when the frame is complete
+            self._offloadedFrameData.append(payload)
         else:
             # decompress frame payload
             #
@@ -1623,26 +2774,124 @@ class WebSocketProtocol(object):
                     octets=_LazyHexFormatter(payload),
                 )
 
-                payload = self._perMessageCompress.decompressMessageData(payload)
-                uncompressedLen = len(payload)
-            else:
-                l = len(payload)
-                compressedLen = l
-                uncompressedLen = l
+                payload, cputime = self._decompressMessageData(payload)
+                self.trafficStats.incomingDecompressionTime += cputime
+                if self._inflated_payload(payload):
+                    return False
+            else:
+                compressedLen = len(payload)
+
+            return self._processFrameData(payload, compressedLen)
+
+    def _decompressMessageData(self, data):
+        """
+        Decompress frame payload. This runs in the thread pool (see
+        ``perMessageCompressionOffloadSize``).
+
+        With ``maxMessagePayloadSize`` set, at most one octet more than the
+        message may still take is decompressed, so that the limit being exceeded
+        can be detected without ever inflating the complete payload.
+
+        :returns: tuple -- The decompressed payload and the CPU time spent.
+        """
+        t0 = _cputime()
+        if self.maxMessagePayloadSize > 0:
+            remaining = self.maxMessagePayloadSize - self._inflatedMessageLength
+            if remaining < 0:
+                # limit already exceeded and connection failed: skip the payload
+                return b'', 0
+            payload = self._perMessageCompress.decompressMessageData(data, remaining + 1)
+        else:
+            payload = self._perMessageCompress.decompressMessageData(data)
+        return payload, _cputime() - t0
+
+    def _inflated_payload(self, payload):
+        """
+        Account for decompressed message payload, and fail the connection
+        when ``maxMessagePayloadSize`` is exceeded.
+
+        :returns: bool -- True, when any further processing should be discontinued.
+        """
+        self._inflatedMessageLength += len(payload)
+        if 0 < self.maxMessagePayloadSize < self._inflatedMessageLength and not self.failedByMe:
+            self.wasMaxMessagePayloadSizeExceeded = True
+            self._fail_connection(
+                WebSocketProtocol.CLOSE_STATUS_CODE_MESSAGE_TOO_BIG,
+                u'message exceeds payload limit of {} octets after decompression'.format(self.maxMessagePayloadSize)
+            )
+            return self.failByDrop
+        return False
+
+    def _decompressFrameData(self):
+        """
+        Decompress the payload of the current frame in the thread pool. Processing
+        of incoming data is paused until done.
+        """
+        data = b''.join(self._offloadedFrameData)
+        self._offloadedFrameData = None
+        self._receivePaused = True
+        self._updateTransportReading()
+        self.trafficStats.incomingDecompressionOffloaded += 1
+
+        d = self._deferToCompressionThread(self._decompressMessageData, data)
+
+        def decompressed(res):
+            self._receivePaused = False
+            if self.state == WebSocketProtocol.STATE_CLOSED:
+                return
+            self._updateTransportReading()
+            payload, cputime = res
+            self.trafficStats.incomingDecompressionTime += cputime
+            if self._inflated_payload(payload):
+                return
+            if self._processFrameData(payload, len(data)) is False:
+                return
+            if self.onFrameEnd() is False:
+                return
+            # process data received in the meantime
+            self.consumeData()
 
-            if self.state == WebSocketProtocol.STATE_OPEN:
-                self.trafficStats.incomingOctetsWebSocketLevel += compressedLen
-                self.trafficStats.incomingOctetsAppLevel += uncompressedLen
+        def error(fail):
+            self._receivePaused = False
+            if self.state != WebSocketProtocol.STATE_CLOSED:
+                self._updateTransportReading()
+                self._invalid_payload(u'decompressing frame payload failed: {}'.format(txaio.failure_message(fail)))
 
-            # incrementally validate UTF-8 payload
-            #
-            if self.utf8validateIncomingCurrentMessage:
+        txaio.add_callbacks(d, decompressed, error)
+
+    def _processFrameData(self, payload, compressedLen):
+        """
+        Process (decompressed) frame payload.
+        """
+        if self.state == WebSocketProtocol.STATE_OPEN:
+            self.trafficStats.incomingOctetsWebSocketLevel += compressedLen
+            self.trafficStats.incomingOctetsAppLevel += len(payload)
+
+        # incrementally validate UTF-8 payload
+        #
+        if self.utf8validateIncomingCurrentMessage:
+            if self._frameDataView and not _UTF8_VALIDATOR_ACCEPTS_BUFFERS:
+                self.utf8validateLast = self.utf8validator.validate(payload.tobytes())
+            else:
                 self.utf8validateLast = self.utf8validator.validate(payload)
-                if not self.utf8validateLast[0]:
-                    if self._invalid_payload(u'encountered invalid UTF-8 while processing text message at payload octet index {}'.format(self.utf8validateLast[3])):
-                        return False
+            if not self.utf8validateLast[0]:
+                if self._invalid_payload(u'encountered invalid UTF-8 while processing text message at payload octet index {}'.format(self.utf8validateLast[3])):
+                    return False
 
-            self._onMessageFrameData(payload)
+        # incrementally decode UTF-8 payload
+        #
+        if self.utf8decodeIncomingCurrentMessage:
+            try:
+                self.message_text.append(self.utf8decoder.decode(payload))
+            except UnicodeDecodeError as e:
+                # the decoder keeps octets of an incomplete code point from the
+                # previous chunk, and the error position is relative to those
+                index = self.utf8decodeOctets - len(self.utf8decoder.getstate()[0]) + e.start
+                if self._invalid_payload(u'encountered invalid UTF-8 while processing text message at payload octet index {}'.format(index)):
+                    return False
+            self.utf8decodeOctets += len(payload)
+
+        self._onMessageFrameData(payload)
 
     def onFrameEnd(self):
         """
@@ -1664,8 +2913,10 @@ class WebSocketProtocol(object):
 
                 # handle end of compressed message
                 #
-                if self._isMessageCompressed:
+                if self._isMessageCompressed and not self.failedByMe:
+                    t0 = _cputime()
                     self._perMessageCompress.endDecompressMessage()
+                    self.trafficStats.incomingDecompressionTime += _cputime() - t0
 
                 # verify UTF8 has actually ended
                 #
@@ -1674,6 +2925,13 @@ class WebSocketProtocol(object):
                         if self._invalid_payload(u'UTF-8 text message payload ended within Unicode code point at payload octet index {}'.format(self.utf8validateLast[3])):
                             return False
 
+                if self.utf8decodeIncomingCurrentMessage:
+                    try:
+                        self.message_text.append(self.utf8decoder.decode(b'', True))
+                    except UnicodeDecodeError:
+                        if self._invalid_payload(u'UTF-8 text message payload ended within Unicode code point at payload octet index {}'.format(self.utf8decodeOctets)):
+                            return False
+
                 if self.state == WebSocketProtocol.STATE_OPEN:
                     self.trafficStats.incomingWebSocketMessages += 1
 
@@ -1825,9 +3083,17 @@ class WebSocketProtocol(object):
             raise Exception("invalid payload length")
 
         if six.PY3:
-            raw = b''.join([b0.to_bytes(1, 'big'), b1.to_bytes(1, 'big'), el, mv, plm])
+            header = [b0.to_bytes(1, 'big'), b1.to_bytes(1, 'big'), el, mv]
+        else:
+            header = [chr(b0), chr(b1), el, mv]
+
+        # the payload of large frames is not copied, but written to the
+        # transport together with the frame header
+        if l < self._SCATTER_WRITE_THRESHOLD:
+            header.append(plm)
+            raw = b''.join(header)
         else:
-            raw = b''.join([chr(b0), chr(b1), el, mv, plm])
+            raw = [b''.join(header), plm]
 
         if opcode in [0, 1, 2]:
             self.trafficStats.outgoingWebSocketFrames += 1
@@ -1836,9 +3102,24 @@ class WebSocketProtocol(object):
             frameHeader = FrameHeader(opcode, fin, rsv, l, mask)
             self.logTxFrame(frameHeader, payload, payload_len, chopsize, sync)
 
-        # send frame octets
+        # send frame octets: pings and pongs jump ahead of queued data frames,
+        # while close frames keep their order (no data may follow them)
         #
-        self.sendData(raw, sync, chopsize)
+        if opcode == 9 or opcode == 10:
+            lane = WebSocketProtocol.SEND_LANE_CONTROL
+        elif self._sendHighPriority:
+            lane = WebSocketProtocol.SEND_LANE_HIGH
+        else:
+            lane = WebSocketProtocol.SEND_LANE_NORMAL
+        if fin or opcode > 7:
+            boundary = WebSocketProtocol._SEND_BOUNDARY_MESSAGE
+        else:
+            boundary = WebSocketProtocol._SEND_BOUNDARY_FRAME
+        self._sendFrameLane = (lane, boundary)
+        try:
+            self.sendData(raw, sync, chopsize)
+        finally:
+            self._sendFrameLane = None
 
     def sendPing(self, payload=None):
         """
@@ -1958,6 +3239,11 @@ class WebSocketProtocol(object):
         else:
             reasonUtf8 = None
 
+        if self._compressPending or self._compressQueue:
+            # send the close frame after messages being compressed in the thread pool
+            self._queueAfterCompression(self.sendCloseFrame, code, reasonUtf8, False)
+            return
+
         self.sendCloseFrame(code=code, reasonUtf8=reasonUtf8, isReply=False)
 
     def beginMessage(self, isBinary=False, doNotCompress=False):
@@ -1972,6 +3258,12 @@ class WebSocketProtocol(object):
         if self.send_state != WebSocketProtocol.SEND_STATE_GROUND:
             raise Exception("WebSocketProtocol.beginMessage invalid in current sending state")
 
+        # the frames would overtake the message(s) being compressed in the thread pool,
+        # and the compressor is in use there
+        #
+        if self._compressPending or self._compressQueue:
+            raise Exception("WebSocketProtocol.beginMessage invalid while a message is compressed in the thread pool")
+
         self.send_message_opcode = WebSocketProtocol.MESSAGE_TYPE_BINARY if isBinary else WebSocketProtocol.MESSAGE_TYPE_TEXT
         self.send_state = WebSocketProtocol.SEND_STATE_MESSAGE_BEGIN
 
@@ -2066,12 +3358,12 @@ class WebSocketProtocol(object):
         else:
             header = b''.join([chr(b0), chr(b1), el, mv])
 
-        self.sendData(header)
-
         # now we are inside message frame ..
         #
         self.send_state = WebSocketProtocol.SEND_STATE_INSIDE_MESSAGE_FRAME
 
+        self.sendData(header)
+
     def sendMessageFrameData(self, payload, sync=False):
         """
         Implements :func:`autobahn.websocket.interfaces.IWebSocketChannel.sendMessageFrameData`
@@ -2100,15 +3392,15 @@ class WebSocketProtocol(object):
         #
         plm = self.send_message_frame_masker.process(pl)
 
-        # send frame payload
-        #
-        self.sendData(plm, sync=sync)
-
         # if we are done with frame, move back into "inside message" state
         #
         if self.send_message_frame_masker.pointer() >= self.send_message_frame_length:
             self.send_state = WebSocketProtocol.SEND_STATE_INSIDE_MESSAGE
 
+        # send frame payload
+        #
+        self.sendData(plm, sync=sync)
+
         # when =0 : frame was completed exactly
         # when >0 : frame is still uncomplete and that much amount is still left to complete the frame
         # when <0 : frame was completed and there was this much unconsumed data in payload argument
@@ -2128,7 +3420,9 @@ class WebSocketProtocol(object):
         #   raise Exception("WebSocketProtocol.endMessage invalid in current sending state [%d]" % self.send_state)
 
         if self.send_compressed:
+            t0 = _cputime()
             payload = self._perMessageCompress.endCompressMessage()
+            self.trafficStats.outgoingCompressionTime += _cputime() - t0
             self.trafficStats.outgoingOctetsWebSocketLevel += len(payload)
         else:
             # send continuation frame with empty payload and FIN set to end message
@@ -2146,7 +3440,9 @@ class WebSocketProtocol(object):
 
         if self.send_compressed:
             self.trafficStats.outgoingOctetsAppLevel += len(payload)
+            t0 = _cputime()
             payload = self._perMessageCompress.compressMessageData(payload)
+            self.trafficStats.outgoingCompressionTime += _cputime() - t0
 
         self.beginMessageFrame(len(payload))
         self.sendMessageFrameData(payload, sync)
@@ -2156,47 +3452,143 @@ class WebSocketProtocol(object):
                     isBinary=False,
                     fragmentSize=None,
                     sync=False,
-                    doNotCompress=False):
+                    doNotCompress=False,
+                    highPriority=False):
         """
         Implements :func:`autobahn.websocket.interfaces.IWebSocketChannel.sendMessage`
+
+        :param highPriority: If ``True``, send the message ahead of messages still
+            queued for sending (e.g. when chopped or synched). Such messages are
+            not compressed.
+        :type highPriority: bool
         """
+        if type(payload) == bytearray:
+            # e.g. echoing a received message
+            payload = bytes(payload)
         assert(type(payload) == bytes)
 
         if self.state != WebSocketProtocol.STATE_OPEN:
             return
 
+        if self._dropPausedMessage():
+            return
+
+        if highPriority:
+            # the message is sent uncompressed, and so may overtake others
+            self._sendHighPriority = True
+            try:
+                self._sendMessage(payload, isBinary, fragmentSize, sync, True)
+            finally:
+                self._sendHighPriority = False
+            return
+
+        if self._compressPending or self._compressQueue:
+            # a message is being compressed in the thread pool: keep message order
+            self._queueAfterCompression(self._sendMessage, payload, isBinary, fragmentSize, sync, doNotCompress)
+            return
+
+        self._sendMessage(payload, isBinary, fragmentSize, sync, doNotCompress)
+
+    def _sendMessage(self, payload, isBinary, fragmentSize, sync, doNotCompress):
         if self.trackedTimings:
             self.trackedTimings.track("sendMessage")
 
-        # (initial) frame opcode
+        self.trafficStats.outgoingWebSocketMessages += 1
+
+        # compress payload
         #
-        if isBinary:
-            opcode = 2
+        if self._perMessageCompress is not None and not doNotCompress and self._shouldCompress(len(payload), isBinary):
+            uncompressedLen = len(payload)
+            self.trafficStats.outgoingOctetsAppLevel += uncompressedLen
+
+            if 0 < self.perMessageCompressionOffloadSize <= uncompressedLen:
+                # compress in the thread pool, and send when done
+                self._compressPending = True
+                self.trafficStats.outgoingCompressionOffloaded += 1
+                d = self._deferToCompressionThread(self._compressMessage, payload)
+
+                def compressed(res):
+                    self._compressPending = False
+                    if self.state == WebSocketProtocol.STATE_OPEN:
+                        self._sendCompressedMessage(res, isBinary, uncompressedLen, fragmentSize, sync)
+                    self._sendCompressQueue()
+
+                def error(fail):
+                    self._compressPending = False
+                    self.log.failure("compressing message failed: {log_failure}", failure=fail)
+                    self._fail_connection(WebSocketProtocol.CLOSE_STATUS_CODE_INTERNAL_ERROR, u'compressing message failed')
+
+                txaio.add_callbacks(d, compressed, error)
+            else:
+                self._sendCompressedMessage(self._compressMessage(payload), isBinary, uncompressedLen, fragmentSize, sync)
+
         else:
-            opcode = 1
+            if self._perMessageCompress is not None and not doNotCompress:
+                self.trafficStats.outgoingWebSocketMessagesUncompressed += 1
+            l = len(payload)
+            self.trafficStats.outgoingOctetsAppLevel += l
+            self.trafficStats.outgoingOctetsWebSocketLevel += l
+            self._sendMessageFrames(payload, isBinary, fragmentSize, sync, False)
 
-        self.trafficStats.outgoingWebSocketMessages += 1
+    def _compressMessage(self, payload):
+        """
+        Compress a message payload. This might run in the thread pool (see
+        ``perMessageCompressionOffloadSize``).
 
-        # setup compressor
-        #
-        if self._perMessageCompress is not None and not doNotCompress:
-            sendCompressed = True
+        :returns: tuple -- The compressed payload and the CPU time spent.
+        """
+        t0 = _cputime()
+        self._perMessageCompress.startCompressMessage()
+        payload1 = self._perMessageCompress.compressMessageData(payload)
+        payload2 = self._perMessageCompress.endCompressMessage()
+        return b''.join([payload1, payload2]), _cputime() - t0
 
-            self._perMessageCompress.startCompressMessage()
+    def _sendCompressedMessage(self, compressed, isBinary, uncompressedLen, fragmentSize, sync):
+        payload, cputime = compressed
+        self.trafficStats.outgoingCompressionTime += cputime
+        self.trafficStats.outgoingOctetsWebSocketLevel += len(payload)
+        self._trackCompression(isBinary, uncompressedLen, len(payload))
+        self._sendMessageFrames(payload, isBinary, fragmentSize, sync, True)
 
-            self.trafficStats.outgoingOctetsAppLevel += len(payload)
+    def _queueAfterCompression(self, f, *args):
+        """
+        Queue a send until the message being compressed in the thread pool
+        was sent. The queue is only allocated when needed.
+        """
+        if self._compressQueue is None:
+            self._compressQueue = deque()
+        self._compressQueue.append((f, args))
 
-            payload1 = self._perMessageCompress.compressMessageData(payload)
-            payload2 = self._perMessageCompress.endCompressMessage()
-            payload = b''.join([payload1, payload2])
+    def _sendCompressQueue(self):
+        """
+        Send out messages queued while a message was compressed in the
+        thread pool (until the next message is compressed in the thread pool).
+        """
+        while self._compressQueue and not self._compressPending:
+            f, args = self._compressQueue.popleft()
+            if self.state == WebSocketProtocol.STATE_OPEN:
+                f(*args)
 
-            self.trafficStats.outgoingOctetsWebSocketLevel += len(payload)
+    def _deferToCompressionThread(self, f, *args):
+        """
+        Run a function in the thread pool used to compress/decompress large
+        messages. The networking framework specific subclasses override this
+        (the default runs the function right away).
+
+        :returns: A Deferred/Future with the result of the function.
+        """
+        try:
+            return txaio.create_future_success(f(*args))
+        except Exception:
+            return txaio.create_future_error()
 
+    def _sendMessageFrames(self, payload, isBinary, fragmentSize, sync, sendCompressed):
+        # (initial) frame opcode
+        #
+        if isBinary:
+            opcode = 2
         else:
-            sendCompressed = False
-            l = len(payload)
-            self.trafficStats.outgoingOctetsAppLevel += l
-            self.trafficStats.outgoingOctetsWebSocketLevel += l
+            opcode = 1
 
         # explicit fragmentSize arguments overrides autoFragmentSize setting
         #
@@ -2234,6 +3626,31 @@ class WebSocketProtocol(object):
                     self.sendFrame(opcode=0, payload=payload[i:j], fin=done, sync=sync)
                 i += pfs
 
+    def sendMessages(self, messages, sync=False):
+        """
+        Send a batch of messages, writing all resulting frames to the
+        transport with a single (vectored) write (see :meth:`cork`).
+
+        :param messages: The messages to send. Each item is either a payload
+            (bytes) sent as a text message, a tuple ``(payload, isBinary)`` or
+            ``(payload, isBinary, doNotCompress)`` with the respective arguments
+            to :meth:`sendMessage`, or a :class:`PreparedMessage`.
+        :type messages: list
+        :param sync: Passed on to :meth:`sendMessage`. Note that synched
+            messages are not coalesced.
+        :type sync: bool
+        """
+        with self.cork():
+            for msg in messages:
+                if isinstance(msg, PreparedMessage):
+                    self.sendPreparedMessage(msg)
+                elif type(msg) == tuple:
+                    payload, isBinary = msg[0], msg[1]
+                    doNotCompress = msg[2] if len(msg) > 2 else False
+                    self.sendMessage(payload, isBinary, sync=sync, doNotCompress=doNotCompress)
+                else:
+                    self.sendMessage(msg, sync=sync)
+
     def _parseExtensionsHeader(self, header, removeQuotes=True):
         """
         Parse the Sec-WebSocket-Extensions header.
@@ -2271,6 +3688,8 @@ IWebSocketChannel.register(WebSocketProtocol)
 IWebSocketChannelFrameApi.register(WebSocketProtocol)
 IWebSocketChannelStreamingApi.register(WebSocketProtocol)
 
+_onMessageFrameDefault = six.get_unbound_function(WebSocketProtocol.onMessageFrame)
+
 
 class PreparedMessage(object):
     """
@@ -2302,16 +3721,29 @@ class PreparedMessage(object):
             self.payload = payload
             self.binary = isBinary
         self.doNotCompress = doNotCompress
+        self.applyMask = applyMask
+
+        # compressed frames, for connections compressing every message
+        # independently (cache key -> compressed frame)
+        self._compressedFrames = {}
 
+        self.frameHybi = self._frame(payload, isBinary, 0)
+
+    def _frame(self, payload, isBinary, rsv):
+        """
+        Frame the payload into a raw WS message (single frame). For large
+        payloads, this is a list of frame header and payload (see
+        :meth:`WebSocketProtocol.sendData`).
+        """
         l = len(payload)
 
         # first byte
         #
-        b0 = ((1 << 7) | 2) if isBinary else ((1 << 7) | 1)
+        b0 = (1 << 7) | (rsv << 4) | (2 if isBinary else 1)
 
         # second byte, payload len bytes and mask
         #
-        if applyMask:
+        if self.applyMask:
             b1 = 1 << 7
             mask = struct.pack("!I", random.getrandbits(32))
             if l == 0:
@@ -2337,12 +3769,51 @@ class PreparedMessage(object):
         else:
             raise Exception("invalid payload length")
 
-        # raw WS message (single frame)
-        #
         if six.PY3:
-            self.payloadHybi = b''.join([b0.to_bytes(1, 'big'), b1.to_bytes(1, 'big'), el, mask, plm])
+            header = [b0.to_bytes(1, 'big'), b1.to_bytes(1, 'big'), el, mask]
         else:
-            self.payloadHybi = b''.join([chr(b0), chr(b1), el, mask, plm])
+            header = [chr(b0), chr(b1), el, mask]
+
+        if l < WebSocketProtocol._SCATTER_WRITE_THRESHOLD:
+            header.append(plm)
+            return b''.join(header)
+        else:
+            return [b''.join(header), plm]
+
+    def getCompressedFrame(self, perMessageCompress):
+        """
+        Get the message compressed and framed for a connection with the given
+        compression in use, or `None` when the compressed message can't be shared
+        between connections (see :meth:`autobahn.websocket.compress_base.PerMessageCompress.getCompressionCacheKey`).
+
+        The message is compressed once for each distinct set of compression
+        parameters, and the compressed frame is cached.
+
+        :returns: tuple -- The raw WS message (as with ``frameHybi``) and the
+            length of the compressed payload, or `None`.
+        """
+        key = perMessageCompress.getCompressionCacheKey()
+        if key is None:
+            return None
+
+        compressed = self._compressedFrames.get(key)
+        if compressed is None:
+            perMessageCompress.startCompressMessage()
+            payload1 = perMessageCompress.compressMessageData(self.payload)
+            payload2 = perMessageCompress.endCompressMessage()
+            payload = b''.join([payload1, payload2])
+            compressed = self._frame(payload, self.binary, 4), len(payload)
+            self._compressedFrames[key] = compressed
+        return compressed
+
+    @property
+    def payloadHybi(self):
+        """
+        The raw WebSocket message (single frame) as one octet string.
+        """
+        if type(self.frameHybi) == list:
+            return b''.join(self.frameHybi)
+        return self.frameHybi
 
 
 class WebSocketFactory(object):
@@ -2352,6 +3823,17 @@ class WebSocketFactory(object):
     :class:`autobahn.websocket.protocol.WebSocketServerFactory`.
     """
 
+    def _resetConfigAttrs(self, protocol):
+        """
+        Reset the protocol options to the defaults, which are the class attributes
+        of the protocol class.
+        """
+        for configAttr in protocol.CONFIG_ATTRS:
+            value = getattr(protocol, configAttr)
+            if type(value) == list:
+                value = list(value)
+            setattr(self, configAttr, value)
+
     def prepareMessage(self, payload, isBinary=False, doNotCompress=False):
         """
         Prepare a WebSocket message. This can be later sent on multiple
@@ -2386,6 +3868,32 @@ class WebSocketServerProtocol(WebSocketProtocol):
 
     CONFIG_ATTRS = WebSocketProtocol.CONFIG_ATTRS_COMMON + WebSocketProtocol.CONFIG_ATTRS_SERVER
 
+    # defaults of server configuration attributes (see WebSocketProtocol)
+    versions = WebSocketProtocol.SUPPORTED_PROTOCOL_VERSIONS
+    webStatus = True
+    requireMaskedClientFrames = True
+    maskServerFrames = False
+    perMessageCompressionAccept = staticmethod(lambda _: None)
+    serveFlashSocketPolicy = False
+    flashSocketPolicy = u'''<cross-domain-policy>
+     <allow-access-from domain="*" to-ports="*" />
+</cross-domain-policy>\x00'''
+    allowedOrigins = ["*"]
+    allowedOriginsPatterns = wildcards2patterns(allowedOrigins)
+    allowNullOrigin = True
+    maxConnections = 0
+
+    # broadcast groups (on the factory) this connection is a member of
+    _broadcastGroups = None
+
+    # compression memory accounted for this connection (on the factory)
+    _compressionMemory = None
+
+    # admission control (see handshakeRateLimit): the Retry-After (in seconds)
+    # when rejected, and the call resuming the opening handshake when delayed
+    _admissionRetryAfter = None
+    _admissionDelayCall = None
+
     def onConnect(self, request):
         """
         Callback fired during WebSocket opening handshake when new WebSocket client
@@ -2417,6 +3925,10 @@ class WebSocketServerProtocol(WebSocketProtocol):
         self.factory.countConnections += 1
         self.log.debug("connection accepted from peer {peer}", peer=self.peer)
 
+        delay, self._admissionRetryAfter = self.factory._admitConnection(self.peer)
+        if delay:
+            self._admissionDelayCall = txaio.call_later(delay, self._onAdmissionDelayExpired)
+
     def _connectionLost(self, reason):
         """
         Called by network framework when established transport connection from client
@@ -2424,22 +3936,47 @@ class WebSocketServerProtocol(WebSocketProtocol):
         When overriding in derived class, make sure to call this base class
         implementation *after* your code.
         """
+        if self._admissionDelayCall is not None:
+            self._admissionDelayCall.cancel()
+            self._admissionDelayCall = None
         WebSocketProtocol._connectionLost(self, reason)
         self.factory.countConnections -= 1
+        self.factory._unregisterConnection(self)
+        self.factory._releaseCompressionMemory(self)
 
     def processProxyConnect(self):
         raise Exception("Autobahn isn't a proxy server")
 
+    def _onAdmissionDelayExpired(self):
+        self._admissionDelayCall = None
+        if self.state == WebSocketProtocol.STATE_CONNECTING and self._rx_pos < len(self._rx_buffer):
+            self.consumeData()
+
     def processHandshake(self):
         """
         Process WebSocket opening handshake request from client.
         """
+        # delayed by admission control: the handshake is processed when the delay expired
+        #
+        if self._admissionDelayCall is not None:
+            return
+
         # only proceed when we have fully received the HTTP request line and all headers
         #
-        end_of_header = self.data.find(b"\x0d\x0a\x0d\x0a")
+        end_of_header = self._rx_buffer.find(b"\x0d\x0a\x0d\x0a", self._rx_pos)
+
+        # rejected by admission control: reply without parsing the request
+        #
+        if self._admissionRetryAfter is not None:
+            if end_of_header >= 0:
+                self.wasNotCleanReason = "handshake rate limit exceeded"
+                self.sendHttpErrorResponse(503, "Service Unavailable", [("Retry-After", self._admissionRetryAfter)])
+                self.dropConnection(abort=False)
+            return
+
         if end_of_header >= 0:
 
-            self.http_request_data = self.data[:end_of_header + 4]
+            self.http_request_data = bytes(self._rx_buffer[self._rx_pos:end_of_header + 4])
             self.log.debug(
                 "received HTTP request:\n\n{data}\n\n",
                 data=self.http_request_data,
@@ -2478,12 +4015,19 @@ class WebSocketServerProtocol(WebSocketProtocol):
             #
             self.http_request_uri = rl[1].strip()
             try:
-                (scheme, netloc, path, params, query, fragment) = urllib.parse.urlparse(self.http_request_uri)
+                uri = self.http_request_uri
+                if uri[:1] == "/" and uri[:2] != "//" and "#" not in uri and ";" not in uri:
+                    # fast path for the common case of a plain absolute path, optionally
+                    # followed by a query string (what urlparse() would return for it)
+                    path, _, query = uri.partition("?")
+                    fragment = ""
+                else:
+                    (scheme, netloc, path, params, query, fragment) = urllib.parse.urlparse(uri)
 
-                # FIXME: check that if absolute resource URI is given,
-                # the scheme/netloc matches the server
-                if scheme != "" or netloc != "":
-                    pass
+                    # FIXME: check that if absolute resource URI is given,
+                    # the scheme/netloc matches the server
+                    if scheme != "" or netloc != "":
+                        pass
 
                 # Fragment identifiers are meaningless in the context of WebSocket
                 # URIs, and MUST NOT be used on these URIs.
@@ -2655,32 +4199,10 @@ class WebSocketServerProtocol(WebSocketProtocol):
                 if http_headers_cnt[websocket_origin_header_key] > 1:
                     return self.failHandshake("HTTP Origin header appears more than once in opening handshake request")
                 self.websocket_origin = self.http_headers[websocket_origin_header_key].strip()
-                try:
-                    origin_tuple = _url_to_origin(self.websocket_origin)
-                except ValueError as e:
-                    return self.failHandshake(
-                        "HTTP Origin header invalid: {}".format(e)
-                    )
-                have_origin = True
-            else:
-                # non-browser clients are allowed to omit this header
-                have_origin = False
-
-            if have_origin:
-                if origin_tuple == 'null' and self.factory.allowNullOrigin:
-                    origin_is_allowed = True
-                else:
-                    origin_is_allowed = _is_same_origin(
-                        origin_tuple,
-                        'https' if self.factory.isSecure else 'http',
-                        self.factory.externalPort or self.factory.port,
-                        self.allowedOriginsPatterns,
-                    )
-                if not origin_is_allowed:
-                    return self.failHandshake(
-                        "WebSocket connection denied: origin '{0}' "
-                        "not allowed".format(self.websocket_origin)
-                    )
+                reason = self.factory._checkOrigin(self.websocket_origin, self.allowedOriginsPatterns)
+                if reason is not None:
+                    return self.failHandshake(reason)
+            # else: non-browser clients are allowed to omit this header
 
             # Sec-WebSocket-Key
             #
@@ -2704,13 +4226,20 @@ class WebSocketServerProtocol(WebSocketProtocol):
                 if http_headers_cnt["sec-websocket-extensions"] > 1:
                     return self.failHandshake("HTTP Sec-WebSocket-Extensions header appears more than once in opening handshake request")
                 else:
-                    # extensions requested/offered by client
+                    # extensions requested/offered by client (parsed offers are cached
+                    # by raw header value, and copied, since these are handed out to onConnect())
                     #
-                    self.websocket_extensions = self._parseExtensionsHeader(self.http_headers["sec-websocket-extensions"])
+                    header = self.http_headers["sec-websocket-extensions"]
+                    extensions = self.factory._extensionsCache.get(header)
+                    if extensions is None:
+                        extensions = self._parseExtensionsHeader(header)
+                        self.factory._extensionsCache[header] = extensions
+                    self.websocket_extensions = [(extension, dict((k, list(v)) for k, v in params.items()))
+                                                 for extension, params in extensions]
 
             # Ok, got complete HS input, remember rest (if any)
             #
-            self.data = self.data[end_of_header + 4:]
+            self._rx_pos = end_of_header + 4
 
             # store WS key
             #
@@ -2830,9 +4359,13 @@ class WebSocketServerProtocol(WebSocketProtocol):
         #
         if len(pmceOffers) > 0:
             accept = self.perMessageCompressionAccept(pmceOffers)
+            if accept is not None and self.factory.perMessageCompressionMemoryBudget > 0:
+                accept = self.factory._budgetCompressionAccept(accept)
             if accept is not None:
                 PMCE = PERMESSAGE_COMPRESSION_EXTENSION[accept.EXTENSION_NAME]
                 self._perMessageCompress = PMCE['PMCE'].createFromOfferAccept(self.factory.isServer, accept)
+                self._configurePerMessageCompress()
+                self.factory._acquireCompressionMemory(self)
                 self.websocket_extensions_in_use.append(self._perMessageCompress)
                 extensionResponse.append(accept.getExtensionString())
             else:
@@ -2842,31 +4375,15 @@ class WebSocketServerProtocol(WebSocketProtocol):
                     offers=pmceOffers,
                 )
 
-        # build response to complete WebSocket handshake
+        # build response to complete WebSocket handshake, starting from the
+        # status line and headers which are the same for all connections
         #
-        response = "HTTP/1.1 101 Switching Protocols\x0d\x0a"
+        response = self.factory._getHandshakeResponsePrefix()
 
-        if self.factory.server:
-            response += "Server: %s\x0d\x0a" % self.factory.server
-
-        response += "Upgrade: WebSocket\x0d\x0a"
-        response += "Connection: Upgrade\x0d\x0a"
-
-        # optional, user supplied additional HTTP headers
+        # optional, user supplied additional HTTP headers from onConnect
         #
-        # headers from factory, headers from onConnect
-        for headers_source in (self.factory.headers.items(), headers.items()):
-            for uh in headers_source:
-                if isinstance(uh[1], six.string_types):
-                    header_values = [uh[1]]
-                else:
-                    try:
-                        header_values = iter(uh[1])
-                    except TypeError:
-                        header_values = [uh[1]]
-
-                for header_value in header_values:
-                    response += "%s: %s\x0d\x0a" % (uh[0], header_value)
+        if headers:
+            response += _formatHttpHeaders(headers)
 
         if self.websocket_protocol_in_use is not None:
             response += "Sec-WebSocket-Protocol: %s\x0d\x0a" % str(self.websocket_protocol_in_use)
@@ -2908,6 +4425,7 @@ class WebSocketServerProtocol(WebSocketProtocol):
         # opening handshake completed, move WebSocket connection into OPEN state
         #
         self.state = WebSocketProtocol.STATE_OPEN
+        self.factory._registerConnection(self)
 
         # cancel any opening HS timer if present
         #
@@ -2929,6 +4447,10 @@ class WebSocketServerProtocol(WebSocketProtocol):
                 self._sendAutoPing,
             )
 
+        # idle connection hibernation
+        #
+        self._scheduleHibernation()
+
         # fire handler on derived class
         #
         if self.trackedTimings:
@@ -2937,7 +4459,7 @@ class WebSocketServerProtocol(WebSocketProtocol):
 
         # process rest, if any
         #
-        if len(self.data) > 0:
+        if self._rx_pos < len(self._rx_buffer):
             self.consumeData()
 
     def failHandshake(self, reason, code=400, responseHeaders=None):
@@ -3048,6 +4570,20 @@ class WebSocketServerFactory(WebSocketFactory):
     Flag indicating if this factory is client- or server-side.
     """
 
+    _HANDSHAKE_CACHE_SIZE = 1024
+    """
+    Number of parsed ``Sec-WebSocket-Extensions`` headers and of origin decisions
+    cached (by raw header value) for the opening handshake.
+    """
+
+    _ADMISSION_MAX_PEERS = 65536
+    """
+    Number of source hosts tracked for ``handshakeRateLimitPerPeer``. When exceeded,
+    the least recently seen host is forgotten.
+    """
+
+    log = txaio.make_logger()
+
     def __init__(self,
                  url=None,
                  protocols=None,
@@ -3089,6 +4625,36 @@ class WebSocketServerFactory(WebSocketFactory):
         #
         self.countConnections = 0
 
+        # registry of open connections, and named broadcast groups
+        # (group name -> set of connections)
+        #
+        self._broadcastConnections = set()
+        self._broadcastGroups = {}
+
+        # memory held by compression state of connections (see
+        # perMessageCompressionMemoryBudget)
+        #
+        self._compressionMemoryUsage = 0
+        self._compressionConnections = 0
+        self._compressionDowngraded = 0
+        self._compressionDeclined = 0
+
+        # opening handshake caches: parsed extension offers and origin
+        # decisions by raw header value, and the response status line and
+        # headers common to all connections
+        #
+        self._extensionsCache = _LRUCache(self._HANDSHAKE_CACHE_SIZE)
+        self._originCache = _LRUCache(self._HANDSHAKE_CACHE_SIZE)
+        self._originCachePatterns = None
+        self._handshakeResponsePrefix = None
+        self._handshakeResponsePrefixSource = None
+
+        # admission control of new connections (see handshakeRateLimit)
+        #
+        self._admissionAdmitted = 0
+        self._admissionDelayed = 0
+        self._admissionRejected = 0
+
     def setSessionParameters(self,
                              url=None,
                              protocols=None,
@@ -3138,47 +4704,37 @@ class WebSocketServerFactory(WebSocketFactory):
         """
         Reset all WebSocket protocol options to defaults.
         """
-        self.versions = WebSocketProtocol.SUPPORTED_PROTOCOL_VERSIONS
-        self.webStatus = True
-        self.utf8validateIncoming = True
-        self.requireMaskedClientFrames = True
-        self.maskServerFrames = False
-        self.applyMask = True
-        self.maxFramePayloadSize = 0
-        self.maxMessagePayloadSize = 0
-        self.autoFragmentSize = 0
-        self.failByDrop = True
-        self.echoCloseCodeReason = False
-        self.openHandshakeTimeout = 5
-        self.closeHandshakeTimeout = 1
-        self.tcpNoDelay = True
-        self.serveFlashSocketPolicy = False
-        self.flashSocketPolicy = u'''<cross-domain-policy>
-     <allow-access-from domain="*" to-ports="*" />
-</cross-domain-policy>\x00'''
+        # options copied to the connections: the defaults are class
+        # attributes of the protocol classes
+        self._resetConfigAttrs(WebSocketServerProtocol)
 
-        # permessage-XXX extension
-        #
-        self.perMessageCompressionAccept = lambda _: None
+        # thread pool for permessage-compress (see perMessageCompressionOffloadSize)
+        self.perMessageCompressionOffloadThreads = 4
 
-        # automatic ping/pong ("heartbeating")
-        #
-        self.autoPingInterval = 0
-        self.autoPingTimeout = 0
-        self.autoPingSize = 4
+        # broadcasting
+        self.broadcastMaxBufferSize = 0
+        self.broadcastSlowConsumerPolicy = u'skip'
+        self.broadcastBatchSize = 1000
 
-        # check WebSocket origin against this list
-        self.allowedOrigins = ["*"]
-        self.allowedOriginsPatterns = wildcards2patterns(self.allowedOrigins)
-        self.allowNullOrigin = True
+        # memory budget for compression state of connections
+        self.perMessageCompressionMemoryBudget = 0
 
-        # maximum number of concurrent connections
-        self.maxConnections = 0
+        # admission control of new connections
+        self.handshakeRateLimit = 0
+        self.handshakeRateBurst = 0
+        self.handshakeRateLimitPerPeer = 0
+        self.handshakeRateBurstPerPeer = 0
+        self.handshakeRateLimitPolicy = u'reject'
+        self.handshakeMaxDelay = 1
+        self.handshakeRetryAfter = 1
+        self.handshakeRetryAfterJitter = 0
+        self._resetAdmission()
 
     def setProtocolOptions(self,
                            versions=None,
                            webStatus=None,
                            utf8validateIncoming=None,
+                           utf8decodeIncoming=None,
                            maskServerFrames=None,
                            requireMaskedClientFrames=None,
                            applyMask=None,
@@ -3194,11 +4750,40 @@ class WebSocketServerFactory(WebSocketFactory):
                            autoPingInterval=None,
                            autoPingTimeout=None,
                            autoPingSize=None,
+                           writeHighWatermark=None,
+                           writeLowWatermark=None,
+                           writeHighWatermarkPolicy=None,
+                           perMessageCompressionMinSize=None,
+                           perMessageDeflateLevel=None,
+                           perMessageDeflateStrategy=None,
+                           perMessageCompressionAdaptive=None,
+                           perMessageCompressionAdaptiveWindow=None,
+                           perMessageCompressionAdaptiveRatio=None,
+                           perMessageCompressionAdaptiveProbeInterval=None,
+                           perMessageCompressionOffloadSize=None,
+                           perMessageCompressionOffloadThreads=None,
+                           idleHibernationTimeout=None,
+                           frameDataMemoryview=None,
+                           receiveBudget=None,
+                           maxPendingMessages=None,
+                           messageDataBytearray=None,
                            serveFlashSocketPolicy=None,
                            flashSocketPolicy=None,
                            allowedOrigins=None,
                            allowNullOrigin=False,
-                           maxConnections=None):
+                           maxConnections=None,
+                           broadcastMaxBufferSize=None,
+                           broadcastSlowConsumerPolicy=None,
+                           broadcastBatchSize=None,
+                           perMessageCompressionMemoryBudget=None,
+                           handshakeRateLimit=None,
+                           handshakeRateBurst=None,
+                           handshakeRateLimitPerPeer=None,
+                           handshakeRateBurstPerPeer=None,
+                           handshakeRateLimitPolicy=None,
+                           handshakeMaxDelay=None,
+                           handshakeRetryAfter=None,
+                           handshakeRetryAfterJitter=None):
         """
         Set WebSocket protocol options used as defaults for new protocol instances.
 
@@ -3208,6 +4793,9 @@ class WebSocketServerFactory(WebSocketFactory):
         :type webStatus: bool or None
         :param utf8validateIncoming: Validate incoming UTF-8 in text message payloads (default: `True`).
         :type utf8validateIncoming: bool or None
+        :param utf8decodeIncoming: Decode incoming text messages while receiving, and deliver the text to
+           :meth:`autobahn.websocket.protocol.WebSocketProtocol.onTextMessage` (default: `False`).
+        :type utf8decodeIncoming: bool or None
         :param maskServerFrames: Mask server-to-client frames (default: `False`).
         :type maskServerFrames: bool or None
         :param requireMaskedClientFrames: Require client-to-server frames to be masked (default: `True`).
@@ -3216,7 +4804,7 @@ class WebSocketServerFactory(WebSocketFactory):
         :type applyMask: bool or None
         :param maxFramePayloadSize: Maximum frame payload size that will be accepted when receiving or `0` for unlimited (default: `0`).
         :type maxFramePayloadSize: int or None
-        :param maxMessagePayloadSize: Maximum message payload size (after reassembly of fragmented messages) that will be accepted when receiving or `0` for unlimited (default: `0`).
+        :param maxMessagePayloadSize: Maximum message payload size (after reassembly of fragmented messages and decompression) that will be accepted when receiving or `0` for unlimited (default: `0`).
         :type maxMessagePayloadSize: int or None
         :param autoFragmentSize: Automatic fragmentation of outgoing data messages (when using the message-based API) into frames with payload length `<=` this size or `0` for no auto-fragmentation (default: `0`).
         :type autoFragmentSize: int or None
@@ -3240,6 +4828,65 @@ class WebSocketServerFactory(WebSocketFactory):
         :type autoPingTimeout: float or None
         :param autoPingSize: Payload size for automatic pings/pongs. Must be an integer from `[4, 125]`. (default: `4`).
         :type autoPingSize: int or None
+        :param writeHighWatermark: When more than this many octets are buffered for sending, writing is paused
+           and ``writeHighWatermarkPolicy`` applies. Twisted transports report octets buffered only above their
+           own buffer size (64 kB for TCP). Set to `0` to disable (default: `0`).
+        :type writeHighWatermark: int or None
+        :param writeLowWatermark: When writing was paused, resume writing when the octets buffered for sending
+           dropped to this many, must not exceed ``writeHighWatermark`` (default: `0`). Twisted transports
+           only resume writing when their buffer is empty.
+        :type writeLowWatermark: int or None
+        :param writeHighWatermarkPolicy: What to do while writing is paused: `"block"` (pause a registered producer),
+           `"drop"` (drop data messages sent) or `"close"` (fail the connection with code `1008`) (default: `"block"`).
+        :type writeHighWatermarkPolicy: unicode or None
+        :param perMessageCompressionMinSize: Send data messages with a payload smaller than this many octets
+           uncompressed, even when permessage-compress is in use (default: `0`).
+        :type perMessageCompressionMinSize: int or None
+        :param perMessageDeflateLevel: permessage-deflate compression level from `[0, 9]`, or `-1` for the zlib
+           default (default: `-1`).
+        :type perMessageDeflateLevel: int or None
+        :param perMessageDeflateStrategy: permessage-deflate compression strategy, e.g. ``zlib.Z_FILTERED`` or
+           ``zlib.Z_HUFFMAN_ONLY`` (default: ``zlib.Z_DEFAULT_STRATEGY``).
+        :type perMessageDeflateStrategy: int or None
+        :param perMessageCompressionAdaptive: Track the compression ratio of outgoing text and binary messages, and
+           stop compressing messages of a type when compression does not pay off (default: `False`).
+        :type perMessageCompressionAdaptive: bool or None
+        :param perMessageCompressionAdaptiveWindow: Number of messages over which the compression ratio is tracked (default: `16`).
+        :type perMessageCompressionAdaptiveWindow: int or None
+        :param perMessageCompressionAdaptiveRatio: Stop compressing when the compressed size exceeds this fraction
+           of the uncompressed size (default: `0.95`).
+        :type perMessageCompressionAdaptiveRatio: float or None
+        :param perMessageCompressionAdaptiveProbeInterval: After this many messages were sent uncompressed,
+           probe compression again (default: `256`).
+        :type perMessageCompressionAdaptiveProbeInterval: int or None
+        :param perMessageCompressionOffloadSize: Compress outgoing messages (sent with ``sendMessage``) and decompress
+           incoming frames of at least this many octets in a thread pool, instead of on the event loop. Reading
+           from the transport is paused while a frame is decompressed, and ``beginMessage`` raises while a message
+           is compressed. Set to `0` to disable (default: `0`).
+        :type perMessageCompressionOffloadSize: int or None
+        :param perMessageCompressionOffloadThreads: Maximum number of threads in the thread pool used for
+           compressing/decompressing (default: `4`).
+        :type perMessageCompressionOffloadThreads: int or None
+        :param idleHibernationTimeout: After an open connection was idle for (about) this many seconds, release
+           receive/send buffers and other per-connection state, which is recreated when the connection
+           becomes active again. Set to `0` to disable (default: `0`).
+        :type idleHibernationTimeout: float or None
+        :param frameDataMemoryview: Deliver the payload of uncompressed frames to ``onMessageFrameData`` as
+           ``memoryview`` into the receive buffer, instead of copying it into ``bytes``. The memoryview is
+           only valid during the call (Python 3 only, default: `False`).
+        :type frameDataMemoryview: bool or None
+        :param receiveBudget: Process at most (about) this many octets of incoming frames per event loop iteration,
+           and then yield to other connections before processing the rest. Reading from the transport is
+           paused while more than a few budgets are buffered. Set to `0` to disable (default: `0`).
+        :type receiveBudget: int or None
+        :param maxPendingMessages: Pause reading from the transport while this many message handlers are in flight
+           (``onMessage`` returned a Deferred/Future which did not complete yet), and resume when
+           handlers complete. Set to `0` to disable (default: `0`).
+        :type maxPendingMessages: int or None
+        :param messageDataBytearray: Reassemble fragmented messages in a ``bytearray`` grown in place, and deliver
+           it to ``onMessage`` as is. This avoids holding all fragments plus the joined ``bytes`` at the end of
+           a message, which doubles peak memory (default: `False`).
+        :type messageDataBytearray: bool or None
         :param serveFlashSocketPolicy: Serve the Flash Socket Policy when we receive a policy file request on this protocol. (default: `False`).
         :type serveFlashSocketPolicy: bool or None
         :param flashSocketPolicy: The flash socket policy to be served when we are serving the Flash Socket Policy on this protocol
@@ -3254,6 +4901,60 @@ class WebSocketServerFactory(WebSocketFactory):
 
         :param maxConnections: Maximum number of concurrent connections. Set to `0` to disable (default: `0`).
         :type maxConnections: int or None
+
+        :param broadcastMaxBufferSize: When broadcasting, connections with more than this many octets buffered
+           in the transport are treated as slow consumers (on Twisted, for connections made after setting this).
+           Set to `0` to disable (default: `0`).
+        :type broadcastMaxBufferSize: int or None
+
+        :param broadcastSlowConsumerPolicy: What to do with slow consumers when broadcasting: ``u'skip'`` the
+           message for the connection, or ``u'evict'`` (drop) the connection (default: ``u'skip'``).
+        :type broadcastSlowConsumerPolicy: unicode or None
+
+        :param broadcastBatchSize: Send broadcasts to at most this many connections at once, before returning
+           to the event loop. Set to `0` to send to all connections at once (default: `1000`).
+        :type broadcastBatchSize: int or None
+
+        :param perMessageCompressionMemoryBudget: Memory (in octets) the compression state of all connections may
+           hold. When accepting a permessage-deflate offer would exceed the budget, smaller window sizes and memory
+           levels, and then no context takeover are negotiated, or compression is declined. Set to `0` to
+           disable (default: `0`).
+        :type perMessageCompressionMemoryBudget: int or None
+
+        :param handshakeRateLimit: Number of new connections per second admitted to the opening handshake
+           (from all peers). Connections exceeding the limit are rejected or delayed (see
+           ``handshakeRateLimitPolicy``) before their handshake request is parsed. Set to `0` to
+           disable (default: `0`).
+        :type handshakeRateLimit: float or None
+
+        :param handshakeRateBurst: Number of new connections admitted at once above ``handshakeRateLimit``.
+           Set to `0` to use the rate, rounded up (default: `0`).
+        :type handshakeRateBurst: int or None
+
+        :param handshakeRateLimitPerPeer: Like ``handshakeRateLimit``, but for the connections from each
+           source host (default: `0`).
+        :type handshakeRateLimitPerPeer: float or None
+
+        :param handshakeRateBurstPerPeer: Like ``handshakeRateBurst``, but for the connections from each
+           source host (default: `0`).
+        :type handshakeRateBurstPerPeer: int or None
+
+        :param handshakeRateLimitPolicy: What to do with connections exceeding a handshake rate limit:
+           ``u'reject'`` the handshake with HTTP status 503 and a ``Retry-After`` header, or ``u'delay'`` the
+           handshake until admitted, for at most ``handshakeMaxDelay`` (default: ``u'reject'``).
+        :type handshakeRateLimitPolicy: unicode or None
+
+        :param handshakeMaxDelay: With policy ``u'delay'``, reject connections which would have to wait
+           longer than this many seconds (default: `1`).
+        :type handshakeMaxDelay: float or None
+
+        :param handshakeRetryAfter: Minimum number of seconds sent in ``Retry-After`` when rejecting
+           connections exceeding a handshake rate limit (default: `1`).
+        :type handshakeRetryAfter: int or None
+
+        :param handshakeRetryAfterJitter: Add a random number of seconds between `0` and this to
+           ``Retry-After``, so that rejected clients do not retry all at once (default: `0`).
+        :type handshakeRetryAfterJitter: int or None
         """
         if versions is not None:
             for v in versions:
@@ -3268,6 +4969,9 @@ class WebSocketServerFactory(WebSocketFactory):
         if utf8validateIncoming is not None and utf8validateIncoming != self.utf8validateIncoming:
             self.utf8validateIncoming = utf8validateIncoming
 
+        if utf8decodeIncoming is not None and utf8decodeIncoming != self.utf8decodeIncoming:
+            self.utf8decodeIncoming = utf8decodeIncoming
+
         if requireMaskedClientFrames is not None and requireMaskedClientFrames != self.requireMaskedClientFrames:
             self.requireMaskedClientFrames = requireMaskedClientFrames
 
@@ -3315,6 +5019,88 @@ class WebSocketServerFactory(WebSocketFactory):
             assert(4 <= autoPingSize <= 125)
             self.autoPingSize = autoPingSize
 
+        high = self.writeHighWatermark if writeHighWatermark is None else writeHighWatermark
+        low = self.writeLowWatermark if writeLowWatermark is None else writeLowWatermark
+        if high > 0 and low > high:
+            raise Exception("writeLowWatermark ({}) must not exceed writeHighWatermark ({})".format(low, high))
+
+        if writeHighWatermark is not None and writeHighWatermark != self.writeHighWatermark:
+            assert(type(writeHighWatermark) in six.integer_types)
+            assert(writeHighWatermark >= 0)
+            self.writeHighWatermark = writeHighWatermark
+
+        if writeLowWatermark is not None and writeLowWatermark != self.writeLowWatermark:
+            assert(type(writeLowWatermark) in six.integer_types)
+            assert(writeLowWatermark >= 0)
+            self.writeLowWatermark = writeLowWatermark
+
+        if writeHighWatermarkPolicy is not None and writeHighWatermarkPolicy != self.writeHighWatermarkPolicy:
+            assert(writeHighWatermarkPolicy in [u'block', u'drop', u'close'])
+            self.writeHighWatermarkPolicy = writeHighWatermarkPolicy
+
+        if perMessageCompressionMinSize is not None and perMessageCompressionMinSize != self.perMessageCompressionMinSize:
+            assert(type(perMessageCompressionMinSize) in six.integer_types)
+            assert(perMessageCompressionMinSize >= 0)
+            self.perMessageCompressionMinSize = perMessageCompressionMinSize
+
+        if perMessageDeflateLevel is not None and perMessageDeflateLevel != self.perMessageDeflateLevel:
+            assert(perMessageDeflateLevel in PerMessageDeflate.COMPRESS_LEVEL_PERMISSIBLE_VALUES)
+            self.perMessageDeflateLevel = perMessageDeflateLevel
+
+        if perMessageDeflateStrategy is not None and perMessageDeflateStrategy != self.perMessageDeflateStrategy:
+            assert(perMessageDeflateStrategy in PerMessageDeflate.COMPRESS_STRATEGY_PERMISSIBLE_VALUES)
+            self.perMessageDeflateStrategy = perMessageDeflateStrategy
+
+        if perMessageCompressionAdaptive is not None and perMessageCompressionAdaptive != self.perMessageCompressionAdaptive:
+            self.perMessageCompressionAdaptive = perMessageCompressionAdaptive
+
+        if perMessageCompressionAdaptiveWindow is not None and perMessageCompressionAdaptiveWindow != self.perMessageCompressionAdaptiveWindow:
+            assert(type(perMessageCompressionAdaptiveWindow) in six.integer_types)
+            assert(perMessageCompressionAdaptiveWindow > 0)
+            self.perMessageCompressionAdaptiveWindow = perMessageCompressionAdaptiveWindow
+
+        if perMessageCompressionAdaptiveRatio is not None and perMessageCompressionAdaptiveRatio != self.perMessageCompressionAdaptiveRatio:
+            assert(type(perMessageCompressionAdaptiveRatio) == float or type(perMessageCompressionAdaptiveRatio) in six.integer_types)
+            assert(perMessageCompressionAdaptiveRatio > 0)
+            self.perMessageCompressionAdaptiveRatio = perMessageCompressionAdaptiveRatio
+
+        if perMessageCompressionAdaptiveProbeInterval is not None and perMessageCompressionAdaptiveProbeInterval != self.perMessageCompressionAdaptiveProbeInterval:
+            assert(type(perMessageCompressionAdaptiveProbeInterval) in six.integer_types)
+            assert(perMessageCompressionAdaptiveProbeInterval >= 0)
+            self.perMessageCompressionAdaptiveProbeInterval = perMessageCompressionAdaptiveProbeInterval
+
+        if perMessageCompressionOffloadSize is not None and perMessageCompressionOffloadSize != self.perMessageCompressionOffloadSize:
+            assert(type(perMessageCompressionOffloadSize) in six.integer_types)
+            assert(perMessageCompressionOffloadSize >= 0)
+            self.perMessageCompressionOffloadSize = perMessageCompressionOffloadSize
+
+        if perMessageCompressionOffloadThreads is not None and perMessageCompressionOffloadThreads != self.perMessageCompressionOffloadThreads:
+            assert(type(perMessageCompressionOffloadThreads) in six.integer_types)
+            assert(perMessageCompressionOffloadThreads > 0)
+            self.perMessageCompressionOffloadThreads = perMessageCompressionOffloadThreads
+
+        if idleHibernationTimeout is not None and idleHibernationTimeout != self.idleHibernationTimeout:
+            assert(idleHibernationTimeout >= 0)
+            self.idleHibernationTimeout = idleHibernationTimeout
+
+        if frameDataMemoryview is not None and frameDataMemoryview != self.frameDataMemoryview:
+            assert(type(frameDataMemoryview) == bool)
+            self.frameDataMemoryview = frameDataMemoryview
+
+        if receiveBudget is not None and receiveBudget != self.receiveBudget:
+            assert(type(receiveBudget) in six.integer_types)
+            assert(receiveBudget >= 0)
+            self.receiveBudget = receiveBudget
+
+        if maxPendingMessages is not None and maxPendingMessages != self.maxPendingMessages:
+            assert(type(maxPendingMessages) in six.integer_types)
+            assert(maxPendingMessages >= 0)
+            self.maxPendingMessages = maxPendingMessages
+
+        if messageDataBytearray is not None and messageDataBytearray != self.messageDataBytearray:
+            assert(type(messageDataBytearray) == bool)
+            self.messageDataBytearray = messageDataBytearray
+
         if serveFlashSocketPolicy is not None and serveFlashSocketPolicy != self.serveFlashSocketPolicy:
             self.serveFlashSocketPolicy = serveFlashSocketPolicy
 
@@ -3334,6 +5120,67 @@ class WebSocketServerFactory(WebSocketFactory):
             assert(maxConnections >= 0)
             self.maxConnections = maxConnections
 
+        if broadcastMaxBufferSize is not None and broadcastMaxBufferSize != self.broadcastMaxBufferSize:
+            assert(type(broadcastMaxBufferSize) in six.integer_types)
+            assert(broadcastMaxBufferSize >= 0)
+            self.broadcastMaxBufferSize = broadcastMaxBufferSize
+
+        if broadcastSlowConsumerPolicy is not None and broadcastSlowConsumerPolicy != self.broadcastSlowConsumerPolicy:
+            if broadcastSlowConsumerPolicy not in [u'skip', u'evict']:
+                raise Exception("invalid broadcast slow consumer policy '%s' (allowed values: 'skip', 'evict')" % broadcastSlowConsumerPolicy)
+            self.broadcastSlowConsumerPolicy = broadcastSlowConsumerPolicy
+
+        if broadcastBatchSize is not None and broadcastBatchSize != self.broadcastBatchSize:
+            assert(type(broadcastBatchSize) in six.integer_types)
+            assert(broadcastBatchSize >= 0)
+            self.broadcastBatchSize = broadcastBatchSize
+
+        if perMessageCompressionMemoryBudget is not None and perMessageCompressionMemoryBudget != self.perMessageCompressionMemoryBudget:
+            assert(type(perMessageCompressionMemoryBudget) in six.integer_types)
+            assert(perMessageCompressionMemoryBudget >= 0)
+            self.perMessageCompressionMemoryBudget = perMessageCompressionMemoryBudget
+
+        if handshakeRateLimit is not None and handshakeRateLimit != self.handshakeRateLimit:
+            assert(handshakeRateLimit >= 0)
+            self.handshakeRateLimit = handshakeRateLimit
+            self._resetAdmission()
+
+        if handshakeRateBurst is not None and handshakeRateBurst != self.handshakeRateBurst:
+            assert(type(handshakeRateBurst) in six.integer_types)
+            assert(handshakeRateBurst >= 0)
+            self.handshakeRateBurst = handshakeRateBurst
+            self._resetAdmission()
+
+        if handshakeRateLimitPerPeer is not None and handshakeRateLimitPerPeer != self.handshakeRateLimitPerPeer:
+            assert(handshakeRateLimitPerPeer >= 0)
+            self.handshakeRateLimitPerPeer = handshakeRateLimitPerPeer
+            self._resetAdmission()
+
+        if handshakeRateBurstPerPeer is not None and handshakeRateBurstPerPeer != self.handshakeRateBurstPerPeer:
+            assert(type(handshakeRateBurstPerPeer) in six.integer_types)
+            assert(handshakeRateBurstPerPeer >= 0)
+            self.handshakeRateBurstPerPeer = handshakeRateBurstPerPeer
+            self._resetAdmission()
+
+        if handshakeRateLimitPolicy is not None and handshakeRateLimitPolicy != self.handshakeRateLimitPolicy:
+            if handshakeRateLimitPolicy not in [u'reject', u'delay']:
+                raise Exception("invalid handshake rate limit policy '%s' (allowed values: 'reject', 'delay')" % handshakeRateLimitPolicy)
+            self.handshakeRateLimitPolicy = handshakeRateLimitPolicy
+
+        if handshakeMaxDelay is not None and handshakeMaxDelay != self.handshakeMaxDelay:
+            assert(handshakeMaxDelay >= 0)
+            self.handshakeMaxDelay = handshakeMaxDelay
+
+        if handshakeRetryAfter is not None and handshakeRetryAfter != self.handshakeRetryAfter:
+            assert(type(handshakeRetryAfter) in six.integer_types)
+            assert(handshakeRetryAfter >= 0)
+            self.handshakeRetryAfter = handshakeRetryAfter
+
+        if handshakeRetryAfterJitter is not None and handshakeRetryAfterJitter != self.handshakeRetryAfterJitter:
+            assert(type(handshakeRetryAfterJitter) in six.integer_types)
+            assert(handshakeRetryAfterJitter >= 0)
+            self.handshakeRetryAfterJitter = handshakeRetryAfterJitter
+
     def getConnectionCount(self):
         """
         Get number of currently connected clients.
@@ -3342,6 +5189,347 @@ class WebSocketServerFactory(WebSocketFactory):
         """
         return self.countConnections
 
+    def _checkOrigin(self, origin, allowedOriginsPatterns):
+        """
+        Check the (stripped) value of the Origin header sent in an opening handshake
+        against the allowed origins. Decisions are cached by header value.
+
+        :returns: None if the origin is allowed, or else the reason for denying the handshake.
+        """
+        if allowedOriginsPatterns is not self._originCachePatterns:
+            self._originCache.clear()
+            self._originCachePatterns = allowedOriginsPatterns
+
+        port = self.externalPort or self.port
+        key = (origin, self.isSecure, port, self.allowNullOrigin)
+        reason = self._originCache.get(key, _NO_DEFAULT)
+        if reason is not _NO_DEFAULT:
+            return reason
+
+        reason = None
+        try:
+            origin_tuple = _url_to_origin(origin)
+        except ValueError as e:
+            reason = "HTTP Origin header invalid: {}".format(e)
+        else:
+            if origin_tuple == 'null' and self.allowNullOrigin:
+                origin_is_allowed = True
+            else:
+                origin_is_allowed = _is_same_origin(
+                    origin_tuple,
+                    'https' if self.isSecure else 'http',
+                    port,
+                    allowedOriginsPatterns,
+                )
+            if not origin_is_allowed:
+                reason = "WebSocket connection denied: origin '{0}' not allowed".format(origin)
+
+        self._originCache[key] = reason
+        return reason
+
+    def _getHandshakeResponsePrefix(self):
+        """
+        Get the status line and headers which start the response to every successful
+        opening handshake. These are formatted once, and again only when ``server``
+        or ``headers`` changed.
+        """
+        source = (self.server, self.headers)
+        if self._handshakeResponsePrefix is None or self._handshakeResponsePrefixSource != source:
+            response = "HTTP/1.1 101 Switching Protocols\x0d\x0a"
+            if self.server:
+                response += "Server: %s\x0d\x0a" % self.server
+            response += "Upgrade: WebSocket\x0d\x0a"
+            response += "Connection: Upgrade\x0d\x0a"
+            response += _formatHttpHeaders(self.headers)
+            self._handshakeResponsePrefix = response
+            self._handshakeResponsePrefixSource = (self.server, copy.deepcopy(self.headers))
+        return self._handshakeResponsePrefix
+
+    def _resetAdmission(self):
+        """
+        Forget the token buckets of admission control, e.g. when the handshake rate
+        limits changed.
+        """
+        self._admissionBucket = None
+        self._admissionPeerBuckets = _LRUCache(self._ADMISSION_MAX_PEERS)
+
+    def _admissionPeerBucket(self, host, now):
+        buckets = self._admissionPeerBuckets
+        bucket = buckets.get(host)
+        if bucket is None:
+            burst = self.handshakeRateBurstPerPeer or int(math.ceil(self.handshakeRateLimitPerPeer))
+            bucket = buckets[host] = _TokenBucket(self.handshakeRateLimitPerPeer, burst, now)
+        return bucket
+
+    def _admitConnection(self, peer):
+        """
+        Called by a protocol instance for a new connection, to check the connection
+        against the handshake rate limits.
+
+        :returns: tuple -- ``(delay, retryAfter)``: The seconds to wait before processing
+            the opening handshake, and ``None``, or ``None`` and the seconds to send in
+            ``Retry-After`` when rejecting the opening handshake.
+        """
+        if not self.handshakeRateLimit and not self.handshakeRateLimitPerPeer:
+            self._admissionAdmitted += 1
+            return 0, None
+
+        now = _monotonic()
+        buckets = []
+        if self.handshakeRateLimit:
+            if self._admissionBucket is None:
+                burst = self.handshakeRateBurst or int(math.ceil(self.handshakeRateLimit))
+                self._admissionBucket = _TokenBucket(self.handshakeRateLimit, burst, now)
+            buckets.append(self._admissionBucket)
+        if self.handshakeRateLimitPerPeer:
+            buckets.append(self._admissionPeerBucket(_peer_host(peer), now))
+
+        wait = max(bucket.wait(now) for bucket in buckets)
+        if wait == 0 or (self.handshakeRateLimitPolicy == u'delay' and wait <= self.handshakeMaxDelay):
+            for bucket in buckets:
+                bucket.take()
+            if wait == 0:
+                self._admissionAdmitted += 1
+            else:
+                self._admissionDelayed += 1
+            return wait, None
+
+        self._admissionRejected += 1
+        retryAfter = max(self.handshakeRetryAfter, int(math.ceil(wait)))
+        if self.handshakeRetryAfterJitter:
+            retryAfter += random.randint(0, self.handshakeRetryAfterJitter)
+        return None, retryAfter
+
+    def getAdmissionStats(self):
+        """
+        Get statistics of the admission control of new connections (see
+        ``handshakeRateLimit`` and ``handshakeRateLimitPerPeer``).
+
+        :returns: dict -- With keys ``admitted``, ``delayed`` and ``rejected`` (number of
+            connections admitted immediately, delayed, or rejected), and ``peers`` (number
+            of source hosts tracked).
+        """
+        return {
+            u'admitted': self._admissionAdmitted,
+            u'delayed': self._admissionDelayed,
+            u'rejected': self._admissionRejected,
+            u'peers': len(self._admissionPeerBuckets),
+        }
+
+    def _budgetCompressionAccept(self, accept):
+        """
+        Fit an accept for a permessage-compress offer into the memory left
+        in ``perMessageCompressionMemoryBudget``: if needed, negotiate smaller window
+        sizes and memory level, and then no context takeover.
+
+        :returns: The (adjusted) accept, or `None` to decline compression.
+        """
+        remaining = self.perMessageCompressionMemoryBudget - self._compressionMemoryUsage
+        candidates = [accept]
+
+        if isinstance(accept, PerMessageDeflateOfferAccept):
+            offer = accept.offer
+            windowBits = min(accept.windowBits or offer.requestMaxWindowBits or 15, 10)
+            requestMaxWindowBits = accept.requestMaxWindowBits
+            if offer.acceptMaxWindowBits:
+                requestMaxWindowBits = min(requestMaxWindowBits or 15, 10)
+            memLevel = min(accept.memLevel or PerMessageDeflate.DEFAULT_MEM_LEVEL, 4)
+            for noContextTakeover in [False, True]:
+                try:
+                    candidates.append(PerMessageDeflateOfferAccept(
+                        offer,
+                        requestNoContextTakeover=accept.requestNoContextTakeover or (noContextTakeover and offer.acceptNoContextTakeover),
+                        requestMaxWindowBits=requestMaxWindowBits,
+                        noContextTakeover=True if noContextTakeover else accept.noContextTakeover,
+                        windowBits=windowBits,
+                        memLevel=memLevel))
+                except Exception as e:
+                    self.log.debug("skipping permessage-deflate accept: {e}", e=e)
+
+        for candidate in candidates:
+            PMCE = PERMESSAGE_COMPRESSION_EXTENSION[candidate.EXTENSION_NAME]
+            if PMCE['PMCE'].createFromOfferAccept(True, candidate).getMemoryUsage() <= remaining:
+                if candidate is not accept:
+                    self._compressionDowngraded += 1
+                return candidate
+
+        self._compressionDeclined += 1
+        return None
+
+    def _acquireCompressionMemory(self, proto):
+        proto._compressionMemory = proto._perMessageCompress.getMemoryUsage()
+        self._compressionMemoryUsage += proto._compressionMemory
+        self._compressionConnections += 1
+
+    def _releaseCompressionMemory(self, proto):
+        if proto._compressionMemory is not None:
+            self._compressionMemoryUsage -= proto._compressionMemory
+            self._compressionConnections -= 1
+            proto._compressionMemory = None
+
+    def getCompressionMemoryStats(self):
+        """
+        Get the (estimated) memory held by the compression state of all
+        connections (see ``perMessageCompressionMemoryBudget``).
+
+        :returns: dict -- With keys ``budget`` and ``usage`` (in octets), ``connections``
+            (number of connections using compression), and ``downgraded`` and ``declined``
+            (number of offers accepted with reduced parameters, or declined due to the budget).
+        """
+        return {
+            u'budget': self.perMessageCompressionMemoryBudget,
+            u'usage': self._compressionMemoryUsage,
+            u'connections': self._compressionConnections,
+            u'downgraded': self._compressionDowngraded,
+            u'declined': self._compressionDeclined,
+        }
+
+    def _registerConnection(self, proto):
+        """
+        Called by a protocol instance when the WebSocket connection is open.
+        """
+        self._broadcastConnections.add(proto)
+
+    def _unregisterConnection(self, proto):
+        """
+        Called by a protocol instance when the connection was lost.
+        """
+        self._broadcastConnections.discard(proto)
+        for group in proto._broadcastGroups or ():
+            members = self._broadcastGroups.get(group)
+            if members is not None:
+                members.discard(proto)
+                if not members:
+                    del self._broadcastGroups[group]
+        proto._broadcastGroups = None
+
+    def joinGroup(self, group, proto):
+        """
+        Add a connection to a named broadcast group. Connections leave all
+        groups automatically when the connection is lost.
+
+        :param group: The name of the group.
+        :type group: unicode
+        :param proto: The connection, which must be open.
+        :type proto: instance of :class:`autobahn.websocket.protocol.WebSocketServerProtocol`
+        """
+        if proto.state != WebSocketProtocol.STATE_OPEN:
+            raise Exception("WebSocketServerFactory.joinGroup invalid for a connection which is not open")
+        if group not in self._broadcastGroups:
+            self._broadcastGroups[group] = set()
+        self._broadcastGroups[group].add(proto)
+        if proto._broadcastGroups is None:
+            proto._broadcastGroups = set()
+        proto._broadcastGroups.add(group)
+
+    def leaveGroup(self, group, proto):
+        """
+        Remove a connection from a named broadcast group.
+
+        :param group: The name of the group.
+        :type group: unicode
+        :param proto: The connection.
+        :type proto: instance of :class:`autobahn.websocket.protocol.WebSocketServerProtocol`
+        """
+        members = self._broadcastGroups.get(group)
+        if members is not None:
+            members.discard(proto)
+            if not members:
+                del self._broadcastGroups[group]
+        if proto._broadcastGroups is not None:
+            proto._broadcastGroups.discard(group)
+
+    def getGroupSize(self, group=None):
+        """
+        Get number of connections in a broadcast group.
+
+        :param group: The name of the group, or `None` for all open connections.
+        :type group: unicode or None
+
+        :returns: int -- Number of connections.
+        """
+        if group is None:
+            return len(self._broadcastConnections)
+        return len(self._broadcastGroups.get(group, ()))
+
+    def broadcast(self, payload, isBinary=False, group=None, exclude=None, doNotCompress=False):
+        """
+        Send a message to all open connections, or all connections in a named
+        group. The message is framed only once (see :meth:`prepareMessage`).
+
+        To not stall the event loop with very large groups, the message is sent
+        in batches of ``broadcastBatchSize`` connections. Connections with more than
+        ``broadcastMaxBufferSize`` octets buffered in the transport are skipped
+        or evicted (see ``broadcastSlowConsumerPolicy``).
+
+        :param payload: The message payload.
+        :type payload: bytes
+        :param isBinary: `True` iff payload is binary, else the payload must be
+            UTF-8 encoded text.
+        :type isBinary: bool
+        :param group: The name of the group to broadcast to, or `None` for all
+            open connections.
+        :type group: unicode or None
+        :param exclude: Optional connections to not send to (e.g. the sender).
+        :type exclude: list or None
+        :param doNotCompress: Iff `True`, never compress this message.
+        :type doNotCompress: bool
+
+        :returns: A Deferred/Future which fires with a dict with the number of
+            connections the message was ``sent`` to, ``skipped`` and ``evicted``, and
+            the fan-out ``latency`` in seconds (from call until the message was
+            handed to the last connection).
+        """
+        started = rtime()
+        preparedMsg = self.prepareMessage(payload, isBinary, doNotCompress)
+
+        if group is None:
+            members = list(self._broadcastConnections)
+        else:
+            members = list(self._broadcastGroups.get(group, ()))
+        if exclude:
+            exclude = set(exclude)
+            members = [proto for proto in members if proto not in exclude]
+
+        result = {u'sent': 0, u'skipped': 0, u'evicted': 0, u'latency': None}
+        done = txaio.create_future()
+
+        maxBufferSize = self.broadcastMaxBufferSize
+        evict = self.broadcastSlowConsumerPolicy == u'evict'
+        batchSize = self.broadcastBatchSize or len(members)
+
+        def sendBatch(i):
+            for proto in members[i:i + batchSize]:
+                if proto.state != WebSocketProtocol.STATE_OPEN:
+                    continue
+                if maxBufferSize and proto._getWriteBufferSize() > maxBufferSize:
+                    if evict:
+                        proto.wasNotCleanReason = u'slow consumer evicted from broadcast'
+                        proto.dropConnection(abort=True)
+                        result[u'evicted'] += 1
+                    else:
+                        result[u'skipped'] += 1
+                    continue
+                proto.sendPreparedMessage(preparedMsg)
+                result[u'sent'] += 1
+
+            i += batchSize
+            if i < len(members):
+                txaio.call_later(0, sendBatch, i)
+            else:
+                result[u'latency'] = rtime() - started
+                self.log.debug(
+                    "broadcast to {sent} connections in {latency} ms ({skipped} skipped, {evicted} evicted)",
+                    sent=result[u'sent'],
+                    skipped=result[u'skipped'],
+                    evicted=result[u'evicted'],
+                    latency=round(1000. * result[u'latency'], 3),
+                )
+                txaio.resolve(done, result)
+
+        sendBatch(0)
+        return done
+
 
 class WebSocketClientProtocol(WebSocketProtocol):
     """
@@ -3350,6 +5538,14 @@ class WebSocketClientProtocol(WebSocketProtocol):
 
     CONFIG_ATTRS = WebSocketProtocol.CONFIG_ATTRS_COMMON + WebSocketProtocol.CONFIG_ATTRS_CLIENT
 
+    # defaults of client configuration attributes (see WebSocketProtocol)
+    version = WebSocketProtocol.DEFAULT_SPEC_VERSION
+    acceptMaskedServerFrames = False
+    maskClientFrames = True
+    serverConnectionDropTimeout = 1
+    perMessageCompressionOffers = []
+    perMessageCompressionAccept = staticmethod(lambda _: None)
+
     def onConnect(self, response):
         """
         Callback fired directly after WebSocket opening handshake when new WebSocket server
@@ -3700,6 +5896,7 @@ class WebSocketClientProtocol(WebSocketProtocol):
                             return self.failHandshake("WebSocket permessage-compress extension response from server denied by client")
 
                         self._perMessageCompress = PMCE['PMCE'].createFromResponseAccept(self.factory.isServer, accept)
+                        self._configurePerMessageCompress()
 
                         self.websocket_extensions_in_use.append(self._perMessageCompress)
 
@@ -3750,6 +5947,10 @@ class WebSocketClientProtocol(WebSocketProtocol):
                     self._sendAutoPing,
                 )
 
+            # idle connection hibernation
+            #
+            self._scheduleHibernation()
+
             # we handle this symmetrical to server-side .. that is, give the
             # client a chance to bail out .. i.e. on no subprotocol selected
             # by server
@@ -3896,35 +6097,17 @@ class WebSocketClientFactory(WebSocketFactory):
         """
         Reset all WebSocket protocol options to defaults.
         """
-        self.version = WebSocketProtocol.DEFAULT_SPEC_VERSION
-        self.utf8validateIncoming = True
-        self.acceptMaskedServerFrames = False
-        self.maskClientFrames = True
-        self.applyMask = True
-        self.maxFramePayloadSize = 0
-        self.maxMessagePayloadSize = 0
-        self.autoFragmentSize = 0
-        self.failByDrop = True
-        self.echoCloseCodeReason = False
-        self.serverConnectionDropTimeout = 1
-        self.openHandshakeTimeout = 5
-        self.closeHandshakeTimeout = 1
-        self.tcpNoDelay = True
-
-        # permessage-XXX extensions
-        #
-        self.perMessageCompressionOffers = []
-        self.perMessageCompressionAccept = lambda _: None
+        # options copied to the connections: the defaults are class
+        # attributes of the protocol classes
+        self._resetConfigAttrs(WebSocketClientProtocol)
 
-        # automatic ping/pong ("heartbeating")
-        #
-        self.autoPingInterval = 0
-        self.autoPingTimeout = 0
-        self.autoPingSize = 4
+        # thread pool for permessage-compress (see perMessageCompressionOffloadSize)
+        self.perMessageCompressionOffloadThreads = 4
 
     def setProtocolOptions(self,
                            version=None,
                            utf8validateIncoming=None,
+                           utf8decodeIncoming=None,
                            acceptMaskedServerFrames=None,
                            maskClientFrames=None,
                            applyMask=None,
@@ -3941,13 +6124,33 @@ class WebSocketClientFactory(WebSocketFactory):
                            perMessageCompressionAccept=None,
                            autoPingInterval=None,
                            autoPingTimeout=None,
-                           autoPingSize=None):
+                           autoPingSize=None,
+                           writeHighWatermark=None,
+                           writeLowWatermark=None,
+                           writeHighWatermarkPolicy=None,
+                           perMessageCompressionMinSize=None,
+                           perMessageDeflateLevel=None,
+                           perMessageDeflateStrategy=None,
+                           perMessageCompressionAdaptive=None,
+                           perMessageCompressionAdaptiveWindow=None,
+                           perMessageCompressionAdaptiveRatio=None,
+                           perMessageCompressionAdaptiveProbeInterval=None,
+                           perMessageCompressionOffloadSize=None,
+                           perMessageCompressionOffloadThreads=None,
+                           idleHibernationTimeout=None,
+                           frameDataMemoryview=None,
+                           receiveBudget=None,
+                           maxPendingMessages=None,
+                           messageDataBytearray=None):
         """
         Set WebSocket protocol options used as defaults for _new_ protocol instances.
 
         :param version: The WebSocket protocol spec (draft) version to be used (default: :func:`autobahn.websocket.protocol.WebSocketProtocol.SUPPORTED_PROTOCOL_VERSIONS`).
         :param utf8validateIncoming: Validate incoming UTF-8 in text message payloads (default: `True`).
         :type utf8validateIncoming: bool
+        :param utf8decodeIncoming: Decode incoming text messages while receiving, and deliver the text to
+           :meth:`autobahn.websocket.protocol.WebSocketProtocol.onTextMessage` (default: `False`).
+        :type utf8decodeIncoming: bool
         :param acceptMaskedServerFrames: Accept masked server-to-client frames (default: `False`).
         :type acceptMaskedServerFrames: bool
         :param maskClientFrames: Mask client-to-server frames (default: `True`).
@@ -3956,7 +6159,7 @@ class WebSocketClientFactory(WebSocketFactory):
         :type applyMask: bool
         :param maxFramePayloadSize: Maximum frame payload size that will be accepted when receiving or `0` for unlimited (default: `0`).
         :type maxFramePayloadSize: int
-        :param maxMessagePayloadSize: Maximum message payload size (after reassembly of fragmented messages) that will be accepted when receiving or `0` for unlimited (default: `0`).
+        :param maxMessagePayloadSize: Maximum message payload size (after reassembly of fragmented messages and decompression) that will be accepted when receiving or `0` for unlimited (default: `0`).
         :type maxMessagePayloadSize: int
         :param autoFragmentSize: Automatic fragmentation of outgoing data messages (when using the message-based API) into frames with payload length `<=` this size or `0` for no auto-fragmentation (default: `0`).
         :type autoFragmentSize: int
@@ -3984,6 +6187,65 @@ class WebSocketClientFactory(WebSocketFactory):
         :type autoPingTimeout: float or None
         :param autoPingSize: Payload size for automatic pings/pongs. Must be an integer from `[4, 125]`. (default: `4`).
         :type autoPingSize: int
+        :param writeHighWatermark: When more than this many octets are buffered for sending, writing is paused
+           and ``writeHighWatermarkPolicy`` applies. Twisted transports report octets buffered only above their
+           own buffer size (64 kB for TCP). Set to `0` to disable (default: `0`).
+        :type writeHighWatermark: int
+        :param writeLowWatermark: When writing was paused, resume writing when the octets buffered for sending
+           dropped to this many, must not exceed ``writeHighWatermark`` (default: `0`). Twisted transports
+           only resume writing when their buffer is empty.
+        :type writeLowWatermark: int
+        :param writeHighWatermarkPolicy: What to do while writing is paused: `"block"` (pause a registered producer),
+           `"drop"` (drop data messages sent) or `"close"` (fail the connection with code `1008`) (default: `"block"`).
+        :type writeHighWatermarkPolicy: unicode
+        :param perMessageCompressionMinSize: Send data messages with a payload smaller than this many octets
+           uncompressed, even when permessage-compress is in use (default: `0`).
+        :type perMessageCompressionMinSize: int
+        :param perMessageDeflateLevel: permessage-deflate compression level from `[0, 9]`, or `-1` for the zlib
+           default (default: `-1`).
+        :type perMessageDeflateLevel: int
+        :param perMessageDeflateStrategy: permessage-deflate compression strategy, e.g. ``zlib.Z_FILTERED`` or
+           ``zlib.Z_HUFFMAN_ONLY`` (default: ``zlib.Z_DEFAULT_STRATEGY``).
+        :type perMessageDeflateStrategy: int
+        :param perMessageCompressionAdaptive: Track the compression ratio of outgoing text and binary messages, and
+           stop compressing messages of a type when compression does not pay off (default: `False`).
+        :type perMessageCompressionAdaptive: bool
+        :param perMessageCompressionAdaptiveWindow: Number of messages over which the compression ratio is tracked (default: `16`).
+        :type perMessageCompressionAdaptiveWindow: int
+        :param perMessageCompressionAdaptiveRatio: Stop compressing when the compressed size exceeds this fraction
+           of the uncompressed size (default: `0.95`).
+        :type perMessageCompressionAdaptiveRatio: float
+        :param perMessageCompressionAdaptiveProbeInterval: After this many messages were sent uncompressed,
+           probe compression again (default: `256`).
+        :type perMessageCompressionAdaptiveProbeInterval: int
+        :param perMessageCompressionOffloadSize: Compress outgoing messages (sent with ``sendMessage``) and decompress
+           incoming frames of at least this many octets in a thread pool, instead of on the event loop. Reading
+           from the transport is paused while a frame is decompressed, and ``beginMessage`` raises while a message
+           is compressed. Set to `0` to disable (default: `0`).
+        :type perMessageCompressionOffloadSize: int
+        :param perMessageCompressionOffloadThreads: Maximum number of threads in the thread pool used for
+           compressing/decompressing (default: `4`).
+        :type perMessageCompressionOffloadThreads: int
+        :param idleHibernationTimeout: After an open connection was idle for (about) this many seconds, release
+           receive/send buffers and other per-connection state, which is recreated when the connection
+           becomes active again. Set to `0` to disable (default: `0`).
+        :type idleHibernationTimeout: float
+        :param frameDataMemoryview: Deliver the payload of uncompressed frames to ``onMessageFrameData`` as
+           ``memoryview`` into the receive buffer, instead of copying it into ``bytes``. The memoryview is
+           only valid during the call (Python 3 only, default: `False`).
+        :type frameDataMemoryview: bool
+        :param receiveBudget: Process at most (about) this many octets of incoming frames per event loop iteration,
+           and then yield to other connections before processing the rest. Reading from the transport is
+           paused while more than a few budgets are buffered. Set to `0` to disable (default: `0`).
+        :type receiveBudget: int
+        :param maxPendingMessages: Pause reading from the transport while this many message handlers are in flight
+           (``onMessage`` returned a Deferred/Future which did not complete yet), and resume when
+           handlers complete. Set to `0` to disable (default: `0`).
+        :type maxPendingMessages: int
+        :param messageDataBytearray: Reassemble fragmented messages in a ``bytearray`` grown in place, and deliver
+           it to ``onMessage`` as is. This avoids holding all fragments plus the joined ``bytes`` at the end of
+           a message, which doubles peak memory (default: `False`).
+        :type messageDataBytearray: bool
         """
         if version is not None:
             if version not in WebSocketProtocol.SUPPORTED_SPEC_VERSIONS:
@@ -3994,6 +6256,9 @@ class WebSocketClientFactory(WebSocketFactory):
         if utf8validateIncoming is not None and utf8validateIncoming != self.utf8validateIncoming:
             self.utf8validateIncoming = utf8validateIncoming
 
+        if utf8decodeIncoming is not None and utf8decodeIncoming != self.utf8decodeIncoming:
+            self.utf8decodeIncoming = utf8decodeIncoming
+
         if acceptMaskedServerFrames is not None and acceptMaskedServerFrames != self.acceptMaskedServerFrames:
             self.acceptMaskedServerFrames = acceptMaskedServerFrames
 
@@ -4052,3 +6317,85 @@ class WebSocketClientFactory(WebSocketFactory):
             assert(type(autoPingSize) == float or type(autoPingSize) in six.integer_types)
             assert(4 <= autoPingSize <= 125)
             self.autoPingSize = autoPingSize
+
+        high = self.writeHighWatermark if writeHighWatermark is None else writeHighWatermark
+        low = self.writeLowWatermark if writeLowWatermark is None else writeLowWatermark
+        if high > 0 and low > high:
+            raise Exception("writeLowWatermark ({}) must not exceed writeHighWatermark ({})".format(low, high))
+
+        if writeHighWatermark is not None and writeHighWatermark != self.writeHighWatermark:
+            assert(type(writeHighWatermark) in six.integer_types)
+            assert(writeHighWatermark >= 0)
+            self.writeHighWatermark = writeHighWatermark
+
+        if writeLowWatermark is not None and writeLowWatermark != self.writeLowWatermark:
+            assert(type(writeLowWatermark) in six.integer_types)
+            assert(writeLowWatermark >= 0)
+            self.writeLowWatermark = writeLowWatermark
+
+        if writeHighWatermarkPolicy is not None and writeHighWatermarkPolicy != self.writeHighWatermarkPolicy:
+            assert(writeHighWatermarkPolicy in [u'block', u'drop', u'close'])
+            self.writeHighWatermarkPolicy = writeHighWatermarkPolicy
+
+        if perMessageCompressionMinSize is not None and perMessageCompressionMinSize != self.perMessageCompressionMinSize:
+            assert(type(perMessageCompressionMinSize) in six.integer_types)
+            assert(perMessageCompressionMinSize >= 0)
+            self.perMessageCompressionMinSize = perMessageCompressionMinSize
+
+        if perMessageDeflateLevel is not None and perMessageDeflateLevel != self.perMessageDeflateLevel:
+            assert(perMessageDeflateLevel in PerMessageDeflate.COMPRESS_LEVEL_PERMISSIBLE_VALUES)
+            self.perMessageDeflateLevel = perMessageDeflateLevel
+
+        if perMessageDeflateStrategy is not None and perMessageDeflateStrategy != self.perMessageDeflateStrategy:
+            assert(perMessageDeflateStrategy in PerMessageDeflate.COMPRESS_STRATEGY_PERMISSIBLE_VALUES)
+            self.perMessageDeflateStrategy = perMessageDeflateStrategy
+
+        if perMessageCompressionAdaptive is not None and perMessageCompressionAdaptive != self.perMessageCompressionAdaptive:
+            self.perMessageCompressionAdaptive = perMessageCompressionAdaptive
+
+        if perMessageCompressionAdaptiveWindow is not None and perMessageCompressionAdaptiveWindow != self.perMessageCompressionAdaptiveWindow:
+            assert(type(perMessageCompressionAdaptiveWindow) in six.integer_types)
+            assert(perMessageCompressionAdaptiveWindow > 0)
+            self.perMessageCompressionAdaptiveWindow = perMessageCompressionAdaptiveWindow
+
+        if perMessageCompressionAdaptiveRatio is not None and perMessageCompressionAdaptiveRatio != self.perMessageCompressionAdaptiveRatio:
+            assert(type(perMessageCompressionAdaptiveRatio) == float or type(perMessageCompressionAdaptiveRatio) in six.integer_types)
+            assert(perMessageCompressionAdaptiveRatio > 0)
+            self.perMessageCompressionAdaptiveRatio = perMessageCompressionAdaptiveRatio
+
+        if perMessageCompressionAdaptiveProbeInterval is not None and perMessageCompressionAdaptiveProbeInterval != self.perMessageCompressionAdaptiveProbeInterval:
+            assert(type(perMessageCompressionAdaptiveProbeInterval) in six.integer_types)
+            assert(perMessageCompressionAdaptiveProbeInterval >= 0)
+            self.perMessageCompressionAdaptiveProbeInterval = perMessageCompressionAdaptiveProbeInterval
+
+        if perMessageCompressionOffloadSize is not None and perMessageCompressionOffloadSize != self.perMessageCompressionOffloadSize:
+            assert(type(perMessageCompressionOffloadSize) in six.integer_types)
+            assert(perMessageCompressionOffloadSize >= 0)
+            self.perMessageCompressionOffloadSize = perMessageCompressionOffloadSize
+
+        if perMessageCompressionOffloadThreads is not None and perMessageCompressionOffloadThreads != self.perMessageCompressionOffloadThreads:
+            assert(type(perMessageCompressionOffloadThreads) in six.integer_types)
+            assert(perMessageCompressionOffloadThreads > 0)
+            self.perMessageCompressionOffloadThreads = perMessageCompressionOffloadThreads
+
+        if idleHibernationTimeout is not None and idleHibernationTimeout != self.idleHibernationTimeout:
+            assert(idleHibernationTimeout >= 0)
+            self.idleHibernationTimeout = idleHibernationTimeout
+
+        if frameDataMemoryview is not None and frameDataMemoryview != self.frameDataMemoryview:
+            assert(type(frameDataMemoryview) == bool)
+            self.frameDataMemoryview = frameDataMemoryview
+
+        if receiveBudget is not None and receiveBudget != self.receiveBudget:
+            assert(type(receiveBudget) in six.integer_types)
+            assert(receiveBudget >= 0)
+            self.receiveBudget = receiveBudget
+
+        if maxPendingMessages is not None and maxPendingMessages != self.maxPendingMessages:
+            assert(type(maxPendingMessages) in six.integer_types)
+            assert(maxPendingMessages >= 0)
+            self.maxPendingMessages = maxPendingMessages
+
+        if messageDataBytearray is not None and messageDataBytearray != self.messageDataBytearray:
+            assert(type(messageDataBytearray) == bool)
+            self.messageDataBytearray = messageDataBytearray
@@ -0,0 +1,102 @@
+###############################################################################
+#
+# The MIT License (MIT)
+#
+# Copyright (c) Tavendo GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+###############################################################################
+
+
+from __future__ import absolute_import
+
+import os
+import zlib
+import unittest2 as unittest
+
+from autobahn.websocket.compress_deflate import PerMessageDeflate, _compressor_pool
+
+
+def _compress(pmce, payload):
+    pmce.startCompressMessage()
+    data = pmce.compressMessageData(payload)
+    return data + pmce.endCompressMessage()
+
+
+def _decompress(pmce, data):
+    pmce.startDecompressMessage()
+    payload = pmce.decompressMessageData(data)
+    pmce.endDecompressMessage()
+    return payload
+
+
+class PerMessageDeflateTests(unittest.TestCase):
+
+    def test_pooled_compressor(self):
+        """
+        Without context takeover, compressors are reused across connections,
+        and every message can be decompressed on its own.
+        """
+        server1 = PerMessageDeflate(True, True, False, 0, 0, 0)
+        server2 = PerMessageDeflate(True, True, False, 0, 0, 0)
+
+        payload = os.urandom(100) * 10
+        data = _compress(server1, payload)
+        self.assertEqual(server1._compressor, None)
+        pooled = _compressor_pool._pool[server1._compressorKey()][-1]
+
+        for i in range(3):
+            server2.startCompressMessage()
+            self.assertTrue(server2._compressor is pooled)
+            data = server2.compressMessageData(payload) + server2.endCompressMessage()
+
+            client = PerMessageDeflate(False, True, False, 0, 0, 0)
+            self.assertEqual(_decompress(client, data), payload)
+            self.assertEqual(client._decompressor, None)
+
+    def test_pool_keys(self):
+        a = PerMessageDeflate(True, True, False, 0, 0, 0)
+        b = PerMessageDeflate(True, True, False, 0, 0, 0, compress_level=1)
+        _compress(a, b'hello')
+        a.startCompressMessage()
+        b.startCompressMessage()
+        self.assertFalse(a._compressor is b._compressor)
+
+    def test_context_takeover(self):
+        """
+        With context takeover, the compressor is kept (and not pooled).
+        """
+        server = PerMessageDeflate(True, False, False, 0, 0, 0)
+        client = PerMessageDeflate(False, False, False, 0, 0, 0)
+        payload = b'hello, world! ' * 10
+
+        first = _compress(server, payload)
+        compressor = server._compressor
+        second = _compress(server, payload)
+        self.assertTrue(server._compressor is compressor)
+        self.assertTrue(len(second) < len(first))
+
+        self.assertEqual(_decompress(client, first), payload)
+        self.assertEqual(_decompress(client, second), payload)
+        self.assertFalse(client._decompressor is None)
+
+        # the peer must not rely on the context
+        decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+        self.assertEqual(decompressor.decompress(first + b'\x00\x00\xff\xff'), payload)
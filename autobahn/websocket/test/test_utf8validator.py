@@ -0,0 +1,85 @@
+###############################################################################
+#
+# The MIT License (MIT)
+#
+# Copyright (c) Tavendo GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+###############################################################################
+
+
+from __future__ import absolute_import
+
+import unittest2 as unittest
+
+from autobahn.websocket.utf8validator import Utf8Validator
+
+
+class Utf8ValidatorTests(unittest.TestCase):
+
+    def _validate(self, *chunks):
+        v = Utf8Validator()
+        res = []
+        for chunk in chunks:
+            r = v.validate(chunk)
+            res.append(r)
+            if not r[0]:
+                break
+        return res
+
+    def test_valid(self):
+        data = u'Hello-\u00b5@\u00df\u00f6\u00e4\u00fc\u00e0\u00e1-UTF-8!! \U0001f600'.encode('utf8')
+        self.assertEqual(self._validate(data), [(True, True, len(data), len(data))])
+
+    def test_empty(self):
+        self.assertEqual(self._validate(b''), [(True, True, 0, 0)])
+
+    def test_incomplete_code_point(self):
+        self.assertEqual(self._validate(b'ab\xe2\x82', b'\xac'),
+                         [(True, False, 4, 4), (True, True, 1, 5)])
+
+    def test_split_every_octet(self):
+        data = u'\u20ac\U0001f600x'.encode('utf8')
+        res = self._validate(*[data[i:i + 1] for i in range(len(data))])
+        self.assertTrue(all(r[0] for r in res))
+        self.assertEqual([r[1] for r in res],
+                         [False, False, True, False, False, False, True, True])
+        self.assertEqual(res[-1][3], len(data))
+
+    def test_invalid_index(self):
+        # first octet which renders the sequence invalid
+        self.assertEqual(self._validate(b'abc\xffdef'), [(False, False, 3, 3)])
+        self.assertEqual(self._validate(b'ab', b'c\xc0\xafd'),
+                         [(True, True, 2, 2), (False, False, 1, 3)])
+
+    def test_invalid_surrogate_at_chunk_end(self):
+        # an encoded surrogate (U+D800) is rejected at its second octet, even
+        # when the chunk ends before the code point is complete
+        self.assertEqual(self._validate(b'a\xed\xa0'), [(False, False, 2, 2)])
+
+    def test_invalid_spanning_chunks(self):
+        self.assertEqual(self._validate(b'a\xf4', b'\x90\x80\x80'),
+                         [(True, False, 2, 2), (False, False, 0, 2)])
+
+    def test_reset(self):
+        v = Utf8Validator()
+        self.assertFalse(v.validate(b'\xff')[0])
+        v.reset()
+        self.assertEqual(v.validate(b'ok'), (True, True, 2, 2))
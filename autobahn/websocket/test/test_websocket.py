@@ -28,11 +28,13 @@ from __future__ import absolute_import, print_function
 
 import os
 import struct
+import zlib
 
 if os.environ.get('USE_TWISTED', False):
     from twisted.trial import unittest
     from twisted.internet.address import IPv4Address
     from twisted.internet.task import Clock
+    from twisted.internet.defer import Deferred
     from six import PY3
 
     from autobahn.twisted.websocket import WebSocketServerProtocol
@@ -43,6 +45,9 @@ if os.environ.get('USE_TWISTED', False):
     from mock import MagicMock, patch
     from txaio.testutil import replace_loop
 
+    from autobahn.websocket.compress import PerMessageDeflate, \
+        PerMessageDeflateOffer, PerMessageDeflateOfferAccept
+
     from base64 import b64decode
 
     @patch('base64.b64encode')
@@ -71,7 +76,8 @@ if os.environ.get('USE_TWISTED', False):
         data = []
 
         def collect(d, *args):
-            data.append(d)
+            # large frames are sent as a list of header and payload
+            data.append(b''.join(d) if isinstance(d, list) else d)
         proto.sendData = collect
 
         proto.sendFrame(**kwargs)
@@ -82,6 +88,37 @@ if os.environ.get('USE_TWISTED', False):
 
     mock_handshake_server = b'HTTP/1.1 101 Switching Protocols\r\nServer: AutobahnPython/0.10.2\r\nX-Powered-By: AutobahnPython/0.10.2\r\nUpgrade: WebSocket\r\nConnection: Upgrade\r\nSec-WebSocket-Protocol: wamp.2.json\r\nSec-WebSocket-Accept: QIatSt9QkZPyS4QQfdufO8TgkL0=\r\n\r\n\x81~\x02\x19[1,"crossbar",{"roles":{"subscriber":{"features":{"publisher_identification":true,"pattern_based_subscription":true,"subscription_revocation":true}},"publisher":{"features":{"publisher_identification":true,"publisher_exclusion":true,"subscriber_blackwhite_listing":true}},"caller":{"features":{"caller_identification":true,"progressive_call_results":true}},"callee":{"features":{"progressive_call_results":true,"pattern_based_registration":true,"registration_revocation":true,"shared_registration":true,"caller_identification":true}}}}]\x18'
 
+    def create_server_protocol(test, factory=None, handshake=mock_handshake_client, **options):
+        """
+        Connects a server protocol over a mocked transport and runs the
+        opening handshake, returning the open protocol. Unless a factory is
+        given, one is started with the protocol options given. Both are
+        cleaned up after the test.
+        """
+        if factory is None:
+            factory = WebSocketServerFactory(protocols=['wamp.2.json'])
+            factory.protocol = WebSocketServerProtocol
+            factory.setProtocolOptions(**options)
+            factory.doStart()
+            test.addCleanup(factory.doStop)
+        elif options:
+            factory.setProtocolOptions(**options)
+
+        proto = factory.buildProtocol(IPv4Address('TCP', '127.0.0.1', 65534))
+        proto.transport = MagicMock()
+        proto.connectionMade()
+
+        def cancel_timeout():
+            # only still pending if the handshake failed
+            if proto.openHandshakeTimeoutCall:
+                proto.openHandshakeTimeoutCall.cancel()
+        test.addCleanup(cancel_timeout)
+
+        proto.data = handshake
+        proto.processHandshake()
+        test.assertEqual(proto.state, WebSocketServerProtocol.STATE_OPEN)
+        return proto
+
     class TestClient(unittest.TestCase):
         def setUp(self):
             self.factory = WebSocketClientFactory(protocols=['wamp.2.json'])
@@ -280,3 +317,1121 @@ if os.environ.get('USE_TWISTED', False):
 
                 # which should have cancelled the call
                 self.assertTrue(timeout_call.cancelled)
+
+    class TestReceiveBuffer(unittest.TestCase):
+        def setUp(self):
+            self.proto = create_server_protocol(self)
+            self.messages = []
+            self.proto.onMessage = lambda payload, isBinary: self.messages.append((payload, isBinary))
+
+        def test_pipelined_frames(self):
+            """
+            many frames received in one chunk are all processed, and the
+            receive buffer is empty afterwards
+            """
+            payloads = [u'message {}'.format(i).encode('utf8') for i in range(100)]
+            frames = b''.join([create_client_frame(opcode=1, payload=p) for p in payloads])
+
+            self.proto.dataReceived(frames)
+
+            self.assertEqual(self.messages, [(p, False) for p in payloads])
+            self.assertEqual(self.proto.data, b'')
+
+        def test_split_frames(self):
+            """
+            frames received octet by octet are reassembled correctly
+            """
+            payloads = [b'*' * 10, b'#' * 200, b'+' * 70000]
+            frames = b''.join([create_client_frame(opcode=2, payload=p) for p in payloads])
+
+            for i in range(len(frames)):
+                self.proto.dataReceived(frames[i:i + 1])
+
+            self.assertEqual(self.messages, [(p, True) for p in payloads])
+            self.assertEqual(self.proto.data, b'')
+
+    class TestTextDecoding(unittest.TestCase):
+        def setUp(self):
+            self.proto = create_server_protocol(self, utf8decodeIncoming=True)
+            self.messages = []
+            self.texts = []
+            self.proto.onMessage = lambda payload, isBinary: self.messages.append((payload, isBinary))
+            self.proto.onTextMessage = lambda payload: self.texts.append(payload)
+
+        def test_text_message(self):
+            """
+            text messages are delivered decoded, also when a code point
+            spans frames, while binary messages are not affected
+            """
+            payload = u'Hello \u20ac \U0001f600'.encode('utf8')
+            frames = create_client_frame(opcode=1, payload=payload[:7], fin=False) + \
+                create_client_frame(opcode=0, payload=payload[7:13], fin=False) + \
+                create_client_frame(opcode=0, payload=payload[13:], fin=True) + \
+                create_client_frame(opcode=2, payload=b'\xff')
+
+            self.proto.dataReceived(frames)
+
+            self.assertEqual(self.texts, [u'Hello \u20ac \U0001f600'])
+            self.assertEqual(self.messages, [(b'\xff', True)])
+
+        def test_default_forwards_to_onMessage(self):
+            """
+            without an onTextMessage override, text messages go to onMessage as before
+            """
+            del self.proto.onTextMessage
+            self.proto.dataReceived(create_client_frame(opcode=1, payload=u'\u20ac'.encode('utf8')))
+
+            self.assertEqual(self.messages, [(u'\u20ac'.encode('utf8'), False)])
+
+        def test_octets_not_kept(self):
+            """
+            the octets of decoded text messages are not reassembled as well
+            """
+            self.proto.maxMessagePayloadSize = 1000
+            self.proto.onTextMessage = lambda payload: self.texts.append((payload, len(self.proto.message_data)))
+            self.proto.dataReceived(create_client_frame(opcode=1, payload=b'a' * 100, fin=False) +
+                                    create_client_frame(opcode=0, payload=b'b' * 100))
+
+            self.assertEqual(self.texts, [(u'a' * 100 + u'b' * 100, 0)])
+
+        def test_invalid_utf8(self):
+            self.proto.dataReceived(create_client_frame(opcode=1, payload=b'abc\xff'))
+
+            self.assertTrue(self.proto.failedByMe)
+            self.assertEqual(self.texts, [])
+
+        def test_ends_within_code_point(self):
+            self.proto.dataReceived(create_client_frame(opcode=1, payload=b'abc\xe2\x82'))
+
+            self.assertTrue(self.proto.failedByMe)
+            self.assertEqual(self.texts, [])
+
+    class TestScatterWrite(unittest.TestCase):
+        def setUp(self):
+            self.proto = create_server_protocol(self)
+            self.factory = self.proto.factory
+            self.transport = self.proto.transport
+            self.transport.reset_mock()
+
+        def test_large_frame(self):
+            """
+            the payload of a large frame is handed to the transport as is,
+            after the frame header
+            """
+            payload = b'*' * 70000
+            wire_before = self.proto.trafficStats.outgoingOctetsWireLevel
+
+            self.proto.sendMessage(payload, isBinary=True)
+
+            self.assertFalse(self.transport.write.called)
+            header, body = self.transport.writeSequence.call_args[0][0]
+            self.assertEqual(header, b'\x82\x7f' + struct.pack('!Q', 70000))
+            self.assertTrue(body is payload)
+            self.assertEqual(self.proto.trafficStats.outgoingOctetsWireLevel - wire_before, 10 + 70000)
+
+        def test_small_frame(self):
+            self.proto.sendMessage(b'hello')
+
+            self.assertFalse(self.transport.writeSequence.called)
+            self.transport.write.assert_called_once_with(b'\x81\x05hello')
+
+        def test_prepared_message(self):
+            payload = b'*' * 70000
+            msg = self.factory.prepareMessage(payload, isBinary=True)
+
+            self.proto.sendPreparedMessage(msg)
+
+            header, body = self.transport.writeSequence.call_args[0][0]
+            self.assertTrue(body is payload)
+            self.assertEqual(msg.payloadHybi, header + payload)
+
+        def test_send_messages(self):
+            """
+            a batch of messages is written with one vectored write
+            """
+            msg = self.factory.prepareMessage(b'prepared')
+            self.proto.sendMessages([b'hello', (b'\x00\x01', True), (b'world', False, True), msg])
+
+            self.assertFalse(self.transport.write.called)
+            self.assertEqual(self.transport.writeSequence.call_count, 1)
+            data = self.transport.writeSequence.call_args[0][0]
+            self.assertEqual(data, [b'\x81\x05hello', b'\x82\x02\x00\x01', b'\x81\x05world', b'\x81\x08prepared'])
+            self.assertEqual(self.proto.trafficStats.outgoingWritesSaved, 3)
+            self.assertEqual(self.proto.trafficStats.outgoingWebSocketMessages, 3)
+
+        def test_cork_nested(self):
+            with self.proto.cork():
+                self.proto.sendMessage(b'a')
+                with self.proto.cork():
+                    self.proto.sendMessage(b'b')
+                self.assertFalse(self.transport.writeSequence.called)
+                self.proto.sendMessage(b'c')
+
+            self.transport.writeSequence.assert_called_once_with([b'\x81\x01a', b'\x81\x01b', b'\x81\x01c'])
+
+        def test_cork_single_write(self):
+            with self.proto.cork():
+                self.proto.sendMessage(b'a')
+
+            self.transport.write.assert_called_once_with(b'\x81\x01a')
+            self.assertEqual(self.proto.trafficStats.outgoingWritesSaved, 0)
+
+        def test_cork_sync_ordering(self):
+            """
+            a synched write flushes octets buffered before it
+            """
+            with replace_loop(Clock()) as reactor:
+                written = []
+                self.transport.write.side_effect = written.append
+                with self.proto.cork():
+                    self.proto.sendMessage(b'a')
+                    self.proto.sendMessage(b'b', sync=True)
+                    self.proto.sendMessage(b'c')
+                reactor.advance(1)
+
+            self.assertEqual(written, [b'\x81\x01a', b'\x81\x01b', b'\x81\x01c'])
+
+    class TestBroadcast(unittest.TestCase):
+        def setUp(self):
+            self.factory = WebSocketServerFactory(protocols=['wamp.2.json'])
+            self.factory.protocol = WebSocketServerProtocol
+            self.factory.doStart()
+
+            self.protos = []
+            for i in range(3):
+                proto = create_server_protocol(self, self.factory)
+                proto.transport.reset_mock()
+                self.protos.append(proto)
+
+        def tearDown(self):
+            self.factory.doStop()
+            # not really necessary, but ...
+            del self.factory
+            del self.protos
+
+        def _results(self, d):
+            results = []
+            d.addCallback(results.append)
+            return results
+
+        def test_broadcast_all(self):
+            results = self._results(self.factory.broadcast(b'hello'))
+
+            for proto in self.protos:
+                proto.transport.write.assert_called_once_with(b'\x81\x05hello')
+            self.assertEqual(results[0][u'sent'], 3)
+            self.assertTrue(results[0][u'latency'] >= 0)
+
+        def test_broadcast_group(self):
+            p0, p1, p2 = self.protos
+            self.factory.joinGroup(u'room', p0)
+            self.factory.joinGroup(u'room', p1)
+            self.assertEqual(self.factory.getGroupSize(u'room'), 2)
+
+            results = self._results(self.factory.broadcast(b'hello', group=u'room', exclude=[p0]))
+
+            self.assertFalse(p0.transport.write.called)
+            self.assertTrue(p1.transport.write.called)
+            self.assertFalse(p2.transport.write.called)
+            self.assertEqual(results[0][u'sent'], 1)
+
+            self.factory.leaveGroup(u'room', p1)
+            self.assertEqual(self.factory.getGroupSize(u'room'), 1)
+
+        def test_connection_lost(self):
+            """
+            connections are removed from the registry and all groups when lost
+            """
+            p0 = self.protos[0]
+            self.factory.joinGroup(u'room', p0)
+            p0._connectionLost(None)
+
+            self.assertEqual(self.factory.getGroupSize(), 2)
+            self.assertEqual(self.factory.getGroupSize(u'room'), 0)
+
+        def test_join_not_open(self):
+            p0 = self.protos[0]
+            p0._connectionLost(None)
+            self.assertRaises(Exception, self.factory.joinGroup, u'room', p0)
+            self.assertEqual(self.factory.getGroupSize(u'room'), 0)
+
+        def test_write_buffer_tracked(self):
+            """
+            while the transport paused the protocol, the octets buffered for sending
+            are those written since the transport last wrote out its buffer
+            """
+            proto = create_server_protocol(self, self.factory, broadcastMaxBufferSize=1000)
+            proto.transport.registerProducer.assert_called_once_with(proto, True)
+            self.assertEqual(proto._getWriteBufferSize(), 0)
+            proto.resumeProducing()
+
+            proto.transport.write.side_effect = lambda data: proto.pauseProducing()
+            proto.sendMessage(b'hello')
+            self.assertEqual(proto._getWriteBufferSize(), 7)
+
+            proto.resumeProducing()
+            self.assertEqual(proto._getWriteBufferSize(), 0)
+
+        def test_slow_consumer_skip(self):
+            p0, p1, p2 = self.protos
+            p1._getWriteBufferSize = lambda: 2000
+            self.factory.setProtocolOptions(broadcastMaxBufferSize=1000)
+            for proto in [p0, p2]:
+                proto._getWriteBufferSize = lambda: 0
+
+            results = self._results(self.factory.broadcast(b'hello'))
+
+            self.assertFalse(p1.transport.write.called)
+            self.assertEqual(results[0][u'sent'], 2)
+            self.assertEqual(results[0][u'skipped'], 1)
+
+        def test_slow_consumer_evict(self):
+            p0, p1, p2 = self.protos
+            p1._getWriteBufferSize = lambda: 2000
+            self.factory.setProtocolOptions(broadcastMaxBufferSize=1000, broadcastSlowConsumerPolicy=u'evict')
+            for proto in [p0, p2]:
+                proto._getWriteBufferSize = lambda: 0
+
+            results = self._results(self.factory.broadcast(b'hello'))
+
+            self.assertTrue(p1.transport.abortConnection.called)
+            self.assertEqual(p1.state, WebSocketServerProtocol.STATE_CLOSED)
+            self.assertEqual(results[0][u'evicted'], 1)
+
+        def test_batches(self):
+            """
+            broadcasts return to the event loop between batches
+            """
+            self.factory.setProtocolOptions(broadcastBatchSize=2)
+            with replace_loop(Clock()) as reactor:
+                results = self._results(self.factory.broadcast(b'hello'))
+                self.assertEqual(len([p for p in self.protos if p.transport.write.called]), 2)
+                self.assertEqual(results, [])
+
+                reactor.advance(0)
+
+            self.assertEqual(len([p for p in self.protos if p.transport.write.called]), 3)
+            self.assertEqual(results[0][u'sent'], 3)
+
+        def test_compressed_prepared_message(self):
+            """
+            connections compressing without context takeover share one
+            compressed frame
+            """
+            for proto in self.protos:
+                proto._perMessageCompress = PerMessageDeflate(True, True, False, 0, 0, 0)
+                proto._perMessageCompress.startCompressMessage = MagicMock(wraps=proto._perMessageCompress.startCompressMessage)
+            payload = b'hello, world! ' * 10
+
+            results = self._results(self.factory.broadcast(payload))
+
+            self.assertEqual(results[0][u'sent'], 3)
+            self.assertEqual(sum([p._perMessageCompress.startCompressMessage.call_count for p in self.protos]), 1)
+            frames = [p.transport.write.call_args[0][0] for p in self.protos]
+            self.assertEqual(frames[0], frames[1])
+            self.assertEqual(frames[0], frames[2])
+
+            # rsv1 bit (compressed) set, and frame payload decompresses to message payload
+            self.assertEqual(frames[0][0:1], b'\xc1')
+            decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+            self.assertEqual(decompressor.decompress(frames[0][2:] + b'\x00\x00\xff\xff'), payload)
+            self.assertEqual(self.protos[0].trafficStats.outgoingOctetsAppLevel, len(payload))
+
+        def test_compressed_prepared_message_context_takeover(self):
+            """
+            with context takeover, every connection compresses on its own
+            """
+            for proto in self.protos:
+                proto._perMessageCompress = PerMessageDeflate(True, False, False, 0, 0, 0)
+            payload = b'hello, world! ' * 10
+
+            msg = self.factory.prepareMessage(payload)
+            for i in range(2):
+                for proto in self.protos:
+                    proto.sendPreparedMessage(msg)
+
+            self.assertEqual(msg._compressedFrames, {})
+            for proto in self.protos:
+                decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+                for (frame,), _ in proto.transport.write.call_args_list:
+                    self.assertEqual(decompressor.decompress(frame[2:] + b'\x00\x00\xff\xff'), payload)
+
+    class TestWriteWatermarks(unittest.TestCase):
+        def setUp(self):
+            self.proto = create_server_protocol(self, writeHighWatermark=1000, writeLowWatermark=100)
+            self.factory = self.proto.factory
+            self.transport = self.proto.transport
+            self.transport.reset_mock()
+
+            # like Twisted transports with more than bufferSize octets buffered,
+            # pause the protocol on every write
+            self.transport.write.side_effect = lambda data: self.proto.pauseProducing()
+            self.transport.writeSequence.side_effect = lambda data: self.proto.pauseProducing()
+            self.proto.resumeProducing()
+
+            self.proto.onWritePaused = MagicMock()
+            self.proto.onWriteResumed = MagicMock()
+
+        def test_transport_producer(self):
+            """
+            the protocol is registered as a streaming producer with the transport
+            """
+            self.assertTrue(self.proto._transportProducer)
+
+            self.proto.dropConnection(abort=True)
+            self.transport.unregisterProducer.assert_called_once_with()
+
+        def test_low_above_high(self):
+            self.assertRaises(Exception, self.factory.setProtocolOptions, writeLowWatermark=2000)
+            self.assertEqual(self.factory.writeLowWatermark, 100)
+
+        def test_pause_resume(self):
+            drained = []
+            self.proto.drain().addCallback(drained.append)
+            self.assertEqual(drained, [None])
+
+            self.proto.sendMessage(b'hello')
+            self.assertFalse(self.proto.onWritePaused.called)
+
+            self.proto.sendMessage(b'x' * 1000)
+            self.assertTrue(self.proto.onWritePaused.called)
+
+            self.proto.drain().addCallback(drained.append)
+            self.assertEqual(drained, [None])
+            self.assertFalse(self.proto.onWriteResumed.called)
+
+            # the transport wrote out its buffer
+            self.proto.resumeProducing()
+            self.assertEqual(drained, [None, None])
+            self.assertTrue(self.proto.onWriteResumed.called)
+
+        def test_disabled(self):
+            self.proto.writeHighWatermark = 0
+            self.proto.sendMessage(b'x' * 2000)
+            self.assertFalse(self.proto.onWritePaused.called)
+
+        def test_block_producer(self):
+            producer = MagicMock()
+            self.proto.registerProducer(producer, True)
+            self.assertFalse(self.transport.registerProducer.called)
+
+            self.proto.sendMessage(b'x' * 2000)
+            self.assertTrue(producer.pauseProducing.called)
+            self.assertFalse(producer.resumeProducing.called)
+
+            self.proto.resumeProducing()
+            self.assertTrue(producer.resumeProducing.called)
+
+            self.proto.stopProducing()
+            self.assertTrue(producer.stopProducing.called)
+
+        def test_pull_producer(self):
+            """
+            pull producers are registered with the transport instead of the protocol
+            """
+            producer = MagicMock()
+            self.proto.registerProducer(producer, False)
+            self.transport.unregisterProducer.assert_called_once_with()
+            self.transport.registerProducer.assert_called_once_with(producer, False)
+
+            self.transport.reset_mock()
+            self.proto.unregisterProducer()
+            self.transport.unregisterProducer.assert_called_once_with()
+            self.transport.registerProducer.assert_called_once_with(self.proto, True)
+
+        def test_drop(self):
+            self.proto.writeHighWatermarkPolicy = u'drop'
+            self.proto.sendMessage(b'x' * 2000)
+            self.proto.sendMessage(b'world')
+            self.proto.sendPreparedMessage(self.factory.prepareMessage(b'world'))
+            self.proto.sendPing()
+
+            self.assertEqual(self.transport.writeSequence.call_count, 1)
+            self.assertEqual(self.transport.write.call_count, 1)
+            self.assertEqual(self.proto.trafficStats.outgoingWebSocketMessagesDropped, 2)
+
+        def test_close(self):
+            self.proto.writeHighWatermarkPolicy = u'close'
+            self.proto.sendMessage(b'x' * 2000)
+
+            self.assertTrue(self.transport.abortConnection.called)
+            self.assertEqual(self.proto.state, WebSocketServerProtocol.STATE_CLOSED)
+            self.assertFalse(self.proto.onWritePaused.called)
+
+        def test_connection_lost(self):
+            self.proto.sendMessage(b'x' * 2000)
+            drained = []
+            self.proto.drain().addCallback(drained.append)
+            self.proto.onClose = MagicMock()
+            self.proto._connectionLost(None)
+            self.assertEqual(drained, [None])
+            self.assertFalse(self.proto._writePaused)
+
+    class TestCompressionOptions(unittest.TestCase):
+        def setUp(self):
+            self.factory = WebSocketServerFactory(protocols=['wamp.2.json'])
+            self.factory.protocol = WebSocketServerProtocol
+            self.factory.doStart()
+
+            def accept(offers):
+                for offer in offers:
+                    if isinstance(offer, PerMessageDeflateOffer):
+                        return PerMessageDeflateOfferAccept(offer)
+            self.factory.setProtocolOptions(perMessageCompressionAccept=accept)
+
+        def tearDown(self):
+            self.factory.doStop()
+            # not really necessary, but ...
+            del self.factory
+
+        def _connect(self):
+            handshake = mock_handshake_client.replace(b'\r\n\r\n', b'\r\nSec-WebSocket-Extensions: permessage-deflate\r\n\r\n')
+            proto = create_server_protocol(self, self.factory, handshake)
+            self.assertTrue(isinstance(proto._perMessageCompress, PerMessageDeflate))
+            proto.transport.reset_mock()
+            return proto
+
+        def test_level_strategy(self):
+            self.factory.setProtocolOptions(perMessageDeflateLevel=1, perMessageDeflateStrategy=zlib.Z_HUFFMAN_ONLY)
+            proto = self._connect()
+            self.assertEqual(proto._perMessageCompress.compress_level, 1)
+            self.assertEqual(proto._perMessageCompress.compress_strategy, zlib.Z_HUFFMAN_ONLY)
+
+            payload = b'hello, world! ' * 10
+            proto.sendMessage(payload)
+            frame = proto.transport.write.call_args[0][0]
+            self.assertEqual(frame[0:1], b'\xc1')
+            decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+            self.assertEqual(decompressor.decompress(frame[2:] + b'\x00\x00\xff\xff'), payload)
+            self.assertTrue(proto.trafficStats.outgoingCompressionTime >= 0)
+            self.assertEqual(proto.trafficStats.__json__()['outgoingCompressionRatio'],
+                             float(len(frame) - 2) / len(payload))
+
+        def test_cache_key(self):
+            a = PerMessageDeflate(True, True, False, 0, 0, 0)
+            b = PerMessageDeflate(True, True, False, 0, 0, 0, compress_level=1)
+            c = PerMessageDeflate(True, True, False, 0, 0, 0, compress_strategy=zlib.Z_FILTERED)
+            self.assertEqual(len(set([a.getCompressionCacheKey(), b.getCompressionCacheKey(), c.getCompressionCacheKey()])), 3)
+
+        def test_min_size(self):
+            self.factory.setProtocolOptions(perMessageCompressionMinSize=64)
+            proto = self._connect()
+
+            proto.sendMessage(b'ping')
+            proto.sendPreparedMessage(self.factory.prepareMessage(b'pong'))
+            self.assertEqual(proto.transport.write.call_args_list[0][0][0], b'\x81\x04ping')
+            self.assertEqual(proto.transport.write.call_args_list[1][0][0], b'\x81\x04pong')
+            self.assertEqual(proto.trafficStats.outgoingWebSocketMessagesUncompressed, 2)
+
+            proto.sendMessage(b'*' * 64)
+            self.assertEqual(proto.transport.write.call_args[0][0][0:1], b'\xc1')
+            self.assertEqual(proto.trafficStats.outgoingWebSocketMessagesUncompressed, 2)
+
+        def test_adaptive(self):
+            self.factory.setProtocolOptions(perMessageCompressionAdaptive=True,
+                                            perMessageCompressionAdaptiveWindow=4,
+                                            perMessageCompressionAdaptiveProbeInterval=8)
+            proto = self._connect()
+
+            def compressed():
+                return bytearray(proto.transport.write.call_args[0][0])[0] & 0x40 != 0
+
+            # incompressible binary messages: compression is disabled after a window
+            for i in range(4):
+                proto.sendMessage(os.urandom(200), isBinary=True)
+                self.assertTrue(compressed())
+            for i in range(8):
+                proto.sendMessage(os.urandom(200), isBinary=True)
+                self.assertFalse(compressed())
+            self.assertEqual(proto.trafficStats.outgoingWebSocketMessagesUncompressed, 8)
+
+            # .. while text messages are still compressed
+            proto.sendMessage(b'hello, world! ' * 10)
+            self.assertTrue(compressed())
+
+            # re-probe
+            proto.sendMessage(b'hello, world! ' * 10, isBinary=True)
+            self.assertTrue(compressed())
+
+        def _offload(self, proto):
+            """
+            Collect calls to be run in the thread pool, so the test can run
+            these one by one.
+            """
+            calls = []
+
+            def defer(f, *args):
+                d = Deferred()
+                calls.append((d, f, args))
+                return d
+            proto._deferToCompressionThread = defer
+
+            def run():
+                d, f, args = calls.pop(0)
+                d.callback(f(*args))
+            return calls, run
+
+        def test_offload_send_ordering(self):
+            self.factory.setProtocolOptions(perMessageCompressionOffloadSize=1000)
+            proto = self._connect()
+            proto.closeHandshakeTimeout = 0
+            calls, run = self._offload(proto)
+
+            big = b'hello, world! ' * 100
+            proto.sendMessage(big)
+            proto.sendMessage(b'small')
+            proto.sendMessage(big)
+            proto.sendClose(1000)
+            self.assertEqual(len(calls), 1)
+            self.assertFalse(proto.transport.write.called)
+
+            # the streaming API can't be used meanwhile
+            self.assertRaises(Exception, proto.beginMessage)
+
+            run()
+            # big message sent, small message sent, next big message compressing
+            self.assertEqual(proto.transport.write.call_count, 2)
+            self.assertEqual(len(calls), 1)
+
+            run()
+            frames = [args[0] for args, _ in proto.transport.write.call_args_list]
+            self.assertEqual(len(frames), 4)
+            self.assertEqual(frames[3], b'\x88\x02\x03\xe8')
+            self.assertEqual(proto.trafficStats.outgoingCompressionOffloaded, 2)
+
+            # frames were compressed in order, with the context taken over
+            decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+
+            def payload(frame):
+                length = struct.unpack('!H', frame[2:4])[0] if bytearray(frame)[1] == 126 else bytearray(frame)[1]
+                data = frame[4:] if bytearray(frame)[1] == 126 else frame[2:]
+                self.assertEqual(len(data), length)
+                return decompressor.decompress(data + b'\x00\x00\xff\xff')
+            self.assertEqual([payload(f) for f in frames[:3]], [big, b'small', big])
+
+        def test_offload_receive_ordering(self):
+            self.factory.setProtocolOptions(perMessageCompressionOffloadSize=100)
+            proto = self._connect()
+            calls, run = self._offload(proto)
+            proto.onMessage = MagicMock()
+
+            big = os.urandom(500)
+            compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -zlib.MAX_WBITS)
+            compressed = compressor.compress(big) + compressor.flush(zlib.Z_SYNC_FLUSH)[:-4]
+            self.assertTrue(len(compressed) >= 100)
+            data = create_client_frame(opcode=2, payload=compressed, rsv=4) + \
+                create_client_frame(opcode=2, payload=b'small')
+
+            proto.dataReceived(data[:10])
+            proto.dataReceived(data[10:])
+            self.assertEqual(len(calls), 1)
+            self.assertFalse(proto.onMessage.called)
+            self.assertEqual(proto.transport.pauseProducing.call_count, 1)
+
+            run()
+            self.assertEqual(proto.onMessage.call_args_list, [((big, True),), ((b'small', True),)])
+            self.assertEqual(proto.transport.resumeProducing.call_count, 1)
+            self.assertEqual(proto.trafficStats.incomingDecompressionOffloaded, 1)
+
+        def test_memory_budget(self):
+            full = PerMessageDeflate(True, False, False, 0, 0, 0).getMemoryUsage()
+            small = PerMessageDeflate(True, False, False, 10, 0, 4).getMemoryUsage()
+            self.assertTrue(small < full)
+            self.factory.setProtocolOptions(perMessageCompressionMemoryBudget=full + small)
+
+            # first connection gets the full parameters, the second smaller ones
+            first = self._connect()
+            self.assertEqual(first._perMessageCompress.server_max_window_bits, 15)
+            second = self._connect()
+            self.assertEqual(second._perMessageCompress.server_max_window_bits, 10)
+            self.assertEqual(second._perMessageCompress.mem_level, 4)
+
+            # .. and the third no context takeover, which holds no memory between messages
+            third = self._connect()
+            self.assertTrue(third._perMessageCompress.server_no_context_takeover)
+            self.assertTrue(third._perMessageCompress.client_no_context_takeover)
+            self.assertEqual(third._perMessageCompress.getMemoryUsage(), 0)
+
+            stats = self.factory.getCompressionMemoryStats()
+            self.assertEqual(stats[u'usage'], full + small)
+            self.assertEqual(stats[u'connections'], 3)
+            self.assertEqual(stats[u'downgraded'], 2)
+            self.assertEqual(stats[u'declined'], 0)
+
+            # closing a connection frees up its share of the budget
+            first._connectionLost(None)
+            self.assertEqual(self.factory.getCompressionMemoryStats()[u'usage'], small)
+            self.assertEqual(self._connect()._perMessageCompress.server_max_window_bits, 15)
+
+        def test_inflated_payload_limit(self):
+            self.factory.setProtocolOptions(maxMessagePayloadSize=1000)
+            proto = self._connect()
+            proto.onMessage = MagicMock()
+
+            # small on the wire, but inflates way beyond the limit
+            compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -zlib.MAX_WBITS)
+            compressed = compressor.compress(b'\x00' * 1000000) + compressor.flush(zlib.Z_SYNC_FLUSH)[:-4]
+            self.assertTrue(len(compressed) < 1000)
+            proto.dataReceived(create_client_frame(opcode=2, payload=compressed, rsv=4))
+
+            self.assertFalse(proto.onMessage.called)
+            self.assertTrue(proto.wasMaxMessagePayloadSizeExceeded)
+            self.assertEqual(proto.trafficStats.incomingOctetsAppLevel, 0)
+            self.assertTrue(proto.failedByMe)
+
+    class TestHibernation(unittest.TestCase):
+
+        def _connect(self):
+            proto = create_server_protocol(self, idleHibernationTimeout=10, openHandshakeTimeout=0)
+            proto.onMessage = MagicMock()
+            return proto
+
+        def test_hibernate_wake_up(self):
+            with replace_loop(Clock()) as reactor:
+                proto = self._connect()
+                reactor.advance(11)
+                self.assertTrue(proto._hibernated)
+                self.assertTrue(proto.utf8validator is None)
+                self.assertTrue(proto.send_queue is None)
+
+                # receiving wakes the connection up
+                proto.dataReceived(create_client_frame(opcode=1, payload=b'hello'))
+                self.assertFalse(proto._hibernated)
+                proto.onMessage.assert_called_once_with(b'hello', False)
+
+                # the connection was active since the last check
+                reactor.advance(11)
+                self.assertFalse(proto._hibernated)
+                reactor.advance(11)
+                self.assertTrue(proto._hibernated)
+
+                # .. and so does sending
+                proto.sendMessage(b'world')
+                self.assertFalse(proto._hibernated)
+                self.assertEqual(proto.transport.write.call_args[0][0], b'\x81\x05world')
+
+                proto._connectionLost(None)
+                self.assertEqual(reactor.getDelayedCalls(), [])
+
+        def test_busy(self):
+            with replace_loop(Clock()) as reactor:
+                proto = self._connect()
+
+                # a partially received frame keeps the connection awake
+                frame = create_client_frame(opcode=2, payload=b'*' * 100)
+                proto.dataReceived(frame[:10])
+                reactor.advance(11)
+                reactor.advance(11)
+                self.assertFalse(proto._hibernated)
+
+                proto.dataReceived(frame[10:])
+                proto.onMessage.assert_called_once_with(b'*' * 100, True)
+                reactor.advance(11)
+                reactor.advance(11)
+                self.assertTrue(proto._hibernated)
+                proto._connectionLost(None)
+
+    class TestConfigDefaults(unittest.TestCase):
+
+        def test_defaults_match_factory(self):
+            from autobahn.websocket import protocol
+            for factory, proto in [(WebSocketServerFactory(), protocol.WebSocketServerProtocol),
+                                   (WebSocketClientFactory(), protocol.WebSocketClientProtocol)]:
+                for configAttr in proto.CONFIG_ATTRS:
+                    self.assertTrue(hasattr(proto, configAttr), configAttr)
+                    self.assertEqual(getattr(proto, configAttr), getattr(factory, configAttr), configAttr)
+
+        def test_defaults_not_copied(self):
+            """
+            with all options at their defaults, protocol instances carry none of them
+            """
+            for factory, protocol in [(WebSocketServerFactory(), WebSocketServerProtocol),
+                                      (WebSocketClientFactory(), WebSocketClientProtocol)]:
+                factory.protocol = protocol
+                proto = factory.buildProtocol(IPv4Address('TCP', '127.0.0.1', 65534))
+                proto.transport = MagicMock()
+                proto.connectionMade()
+                self.assertEqual([a for a in proto.CONFIG_ATTRS if a in proto.__dict__], [])
+                if proto.openHandshakeTimeoutCall:
+                    proto.openHandshakeTimeoutCall.cancel()
+
+        def test_copy_from_factory(self):
+            factory = WebSocketServerFactory()
+            factory.setProtocolOptions(maxMessagePayloadSize=1000)
+
+            class Protocol(WebSocketServerProtocol):
+                autoFragmentSize = 0
+
+            factory.protocol = Protocol
+            factory.setProtocolOptions(autoFragmentSize=100)
+            proto = factory.buildProtocol(IPv4Address('TCP', '127.0.0.1', 65534))
+            proto.transport = MagicMock()
+            proto.closeHandshakeTimeout = 7
+            proto.connectionMade()
+
+            # options with non-default values are copied ..
+            self.assertEqual(proto.__dict__['maxMessagePayloadSize'], 1000)
+            # .. while defaults are not
+            self.assertFalse('maxFramePayloadSize' in proto.__dict__)
+            self.assertEqual(proto.maxFramePayloadSize, 0)
+
+            # options set on the protocol class or instance take precedence
+            self.assertEqual(proto.autoFragmentSize, 0)
+            self.assertEqual(proto.closeHandshakeTimeout, 7)
+
+            # changing the factory does not affect existing connections
+            factory.setProtocolOptions(maxFramePayloadSize=10, maxMessagePayloadSize=20)
+            self.assertEqual(proto.maxFramePayloadSize, 0)
+            self.assertEqual(proto.maxMessagePayloadSize, 1000)
+
+            proto.openHandshakeTimeoutCall.cancel()
+
+    class TestFrameDataMemoryview(unittest.TestCase):
+        def setUp(self):
+            self.proto = create_server_protocol(self, frameDataMemoryview=True, openHandshakeTimeout=0)
+
+        def test_streaming(self):
+            chunks = []
+
+            def onMessageFrameData(payload):
+                self.assertEqual(type(payload), memoryview)
+                chunks.append(payload.tobytes())
+            self.proto.onMessageFrameData = onMessageFrameData
+
+            frame = create_client_frame(opcode=2, payload=b'hello, world')
+            self.proto.dataReceived(frame[:10])
+            self.proto.dataReceived(frame[10:])
+            self.assertEqual(chunks, [b'hell', b'o, world'])
+
+        def test_default_buffers(self):
+            self.proto.onMessage = MagicMock()
+            self.proto.dataReceived(create_client_frame(opcode=1, payload=u'héllo'.encode('utf8'), fin=False))
+            self.proto.dataReceived(create_client_frame(opcode=0, payload=b' world'))
+            self.proto.onMessage.assert_called_once_with(u'héllo world'.encode('utf8'), False)
+
+        def test_view_kept(self):
+            views = []
+
+            def onMessageFrameData(payload):
+                views.append(payload)
+                views.append(payload[2:])
+            self.proto.onMessageFrameData = onMessageFrameData
+
+            # payload is delivered straight from the receive buffer when not unmasked
+            self.proto.applyMask = False
+            frame = b'\x82\x8a' + b'\x00' * 4 + b'0123456789'
+            self.proto.dataReceived(frame + b'\x82')
+            # views are released after the callback ..
+            self.assertRaises(ValueError, views[0].tobytes)
+            # .. and slices held on to don't keep the receive buffer from growing
+            self.assertEqual(views[1].tobytes(), b'23456789')
+            self.proto.dataReceived(b'\x80')
+            self.assertEqual(views[1].tobytes(), b'23456789')
+
+    class TestMessageAssembly(unittest.TestCase):
+        def setUp(self):
+            self.proto = create_server_protocol(self, maxMessagePayloadSize=100, openHandshakeTimeout=0)
+
+        def test_fragmented(self):
+            self.proto.onMessage = MagicMock()
+            frame = create_client_frame(opcode=2, payload=b'0123456789', fin=False)
+            self.proto.dataReceived(frame[:12])
+            self.proto.dataReceived(frame[12:])
+            self.proto.dataReceived(create_client_frame(opcode=0, payload=b'abc'))
+
+            self.proto.onMessage.assert_called_once_with(b'0123456789abc', True)
+            self.assertEqual(type(self.proto.onMessage.call_args[0][0]), bytes)
+
+        def test_bytearray(self):
+            self.proto.messageDataBytearray = True
+            self.proto.onMessage = MagicMock()
+            self.proto.dataReceived(create_client_frame(opcode=2, payload=b'0123456789'))
+
+            self.proto.onMessage.assert_called_once_with(b'0123456789', True)
+            self.assertEqual(type(self.proto.onMessage.call_args[0][0]), bytearray)
+
+        def test_header_only(self):
+            # no space is reserved for payload not received yet
+            self.proto.messageDataBytearray = True
+            frame = create_client_frame(opcode=2, payload=b'*' * 100, fin=False)
+            self.proto.dataReceived(frame[:6])
+            self.assertEqual(len(self.proto.message_data), 0)
+            self.proto.dataReceived(frame[6:20])
+            self.assertEqual(len(self.proto.message_data), 14)
+
+        def _peakMemory(self, fragments, size):
+            try:
+                import tracemalloc
+            except ImportError:
+                raise unittest.SkipTest("tracemalloc not available")
+
+            self.proto.maxMessagePayloadSize = 0
+            self.proto.onMessage = MagicMock()
+            # unmasked (all-zero mask) client frames, built before tracing
+            frames = []
+            for i in range(fragments):
+                b0 = (0x80 if i == fragments - 1 else 0) | (2 if i == 0 else 0)
+                frames.append(struct.pack('!BBQ', b0, 0x80 | 127, size) + b'\x00' * 4 + b'*' * size)
+
+            tracemalloc.start()
+            try:
+                for frame in frames:
+                    self.proto.dataReceived(frame)
+                peak = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+            self.assertEqual(len(self.proto.onMessage.call_args[0][0]), fragments * size)
+            return peak
+
+        def test_peak_memory(self):
+            """
+            joining the fragments of a message needs twice the message size ..
+            """
+            peak = self._peakMemory(16, 2 ** 20)
+            self.assertTrue(peak < 2.25 * 16 * 2 ** 20, peak)
+
+        def test_peak_memory_bytearray(self):
+            """
+            .. while a bytearray grown in place needs little more than the message size
+            """
+            self.proto.messageDataBytearray = True
+            peak = self._peakMemory(16, 2 ** 20)
+            self.assertTrue(peak < 1.5 * 16 * 2 ** 20, peak)
+
+        def test_on_message_frame(self):
+            frames = []
+
+            def onMessageFrame(payload):
+                frames.append(payload)
+                WebSocketServerProtocol.onMessageFrame(self.proto, payload)
+            self.proto.onMessageFrame = onMessageFrame
+            self.proto.onMessage = MagicMock()
+
+            frame = create_client_frame(opcode=2, payload=b'0123456789')
+            self.proto.dataReceived(frame[:12])
+            self.proto.dataReceived(frame[12:])
+
+            self.assertEqual(frames, [[b'012345', b'6789']])
+            self.proto.onMessage.assert_called_once_with(b'0123456789', True)
+
+    class TestSendLanes(unittest.TestCase):
+
+        def test_control_and_high_priority(self):
+            with replace_loop(Clock()) as reactor:
+                proto = create_server_protocol(self, openHandshakeTimeout=0)
+                proto.transport.write.reset_mock()
+
+                # the first fragment is written right away, the others are queued
+                proto.sendMessage(b'0123456789', isBinary=True, fragmentSize=4, sync=True)
+                proto.sendPing(b'ping')
+                proto.sendMessage(b'hi', highPriority=True)
+                self.assertEqual(proto.getSendQueueDepth(), {u'control': 1, u'high': 1, u'normal': 2})
+
+                for _ in range(5):
+                    reactor.advance(1)
+                self.assertEqual(proto.getSendQueueDepth(), {u'control': 0, u'high': 0, u'normal': 0})
+
+                # the ping goes out at the next frame boundary, the high priority
+                # message only after the fragmented message
+                opcodes = [bytearray(args[0][:1])[0] & 0x0f for args, _ in proto.transport.write.call_args_list]
+                self.assertEqual(opcodes, [2, 9, 0, 0, 1])
+
+    class TestReceiveBudget(unittest.TestCase):
+
+        def test_yield(self):
+            with replace_loop(Clock()) as reactor:
+                proto = create_server_protocol(self, receiveBudget=10, openHandshakeTimeout=0)
+                proto.onMessage = MagicMock()
+
+                # each frame is 7 octets on the wire
+                frames = [create_client_frame(opcode=2, payload=p) for p in [b'a', b'b', b'c', b'd']]
+                proto.dataReceived(b''.join(frames[:3]))
+                self.assertEqual(proto.onMessage.call_count, 2)
+
+                # octets received in the meantime are only buffered
+                proto.dataReceived(frames[3])
+                self.assertEqual(proto.onMessage.call_count, 2)
+
+                reactor.advance(0)
+                self.assertEqual([args[0] for args, _ in proto.onMessage.call_args_list], [b'a', b'b', b'c', b'd'])
+
+        def test_backlog(self):
+            with replace_loop(Clock()) as reactor:
+                proto = create_server_protocol(self, receiveBudget=10, openHandshakeTimeout=0)
+                proto.onMessage = MagicMock()
+
+                frame = create_client_frame(opcode=2, payload=b'*')
+                proto.dataReceived(frame * 3)
+                self.assertFalse(proto.transport.pauseProducing.called)
+
+                # more than 4 receive budgets buffered: stop reading ..
+                proto.dataReceived(frame * 6)
+                self.assertEqual(proto.transport.pauseProducing.call_count, 1)
+
+                # .. until the backlog was processed
+                reactor.advance(0)
+                self.assertEqual(proto.onMessage.call_count, 9)
+                self.assertEqual(proto.transport.pauseProducing.call_count, 1)
+                self.assertEqual(proto.transport.resumeProducing.call_count, 1)
+
+    class TestMaxPendingMessages(unittest.TestCase):
+
+        def test_pause_reading(self):
+            with replace_loop(Clock()) as reactor:
+                proto = create_server_protocol(self, maxPendingMessages=2, openHandshakeTimeout=0)
+
+                handlers = []
+
+                def onMessage(payload, isBinary):
+                    handlers.append((payload, Deferred()))
+                    return handlers[-1][1]
+                proto.onMessage = onMessage
+
+                frames = [create_client_frame(opcode=2, payload=p) for p in [b'a', b'b', b'c']]
+                proto.dataReceived(b''.join(frames))
+
+                # the third message waits until a handler completed
+                self.assertEqual([payload for payload, _ in handlers], [b'a', b'b'])
+                self.assertEqual(proto.transport.pauseProducing.call_count, 1)
+                self.assertEqual(proto.trafficStats.incomingReadingPaused, 1)
+
+                handlers[0][1].callback(None)
+                self.assertEqual(proto.transport.resumeProducing.call_count, 1)
+                reactor.advance(0)
+                self.assertEqual([payload for payload, _ in handlers], [b'a', b'b', b'c'])
+                self.assertEqual(proto.transport.pauseProducing.call_count, 2)
+
+    class TestHandshakeCache(unittest.TestCase):
+        def setUp(self):
+            self.factory = WebSocketServerFactory(protocols=['wamp.2.json'])
+            self.factory.protocol = WebSocketServerProtocol
+            self.factory.setProtocolOptions(openHandshakeTimeout=0)
+            self.factory.doStart()
+
+        def tearDown(self):
+            self.factory.doStop()
+            # not really necessary, but ...
+            del self.factory
+
+        def handshake(self, *headers):
+            proto = self.factory.buildProtocol(IPv4Address('TCP', '127.0.0.1', 65534))
+            proto.transport = MagicMock()
+            proto.connectionMade()
+            proto.data = mock_handshake_client[:-2] + b''.join(h + b'\r\n' for h in headers) + b'\r\n'
+            proto.failHandshake = MagicMock()
+            proto.processHandshake()
+            return proto
+
+        def test_extensions(self):
+            header = b'Sec-WebSocket-Extensions: permessage-deflate; client_max_window_bits, x-foo'
+            proto1 = self.handshake(header)
+            proto2 = self.handshake(header)
+            self.assertEqual(len(self.factory._extensionsCache), 1)
+            self.assertEqual(proto2.websocket_extensions,
+                             [('permessage-deflate', {'client_max_window_bits': [True]}), ('x-foo', {})])
+
+            # connections don't share the parsed offers
+            self.assertEqual(proto1.websocket_extensions, proto2.websocket_extensions)
+            self.assertIsNot(proto1.websocket_extensions[0][1], proto2.websocket_extensions[0][1])
+
+        def test_origin(self):
+            header = b'Origin: http://www.example.com'
+            self.factory.setProtocolOptions(allowedOrigins=[u'*.example.com:*'])
+            self.assertFalse(self.handshake(header).failHandshake.called)
+            self.assertFalse(self.handshake(header).failHandshake.called)
+            self.assertEqual(len(self.factory._originCache), 1)
+
+            # decisions are dropped when the allowed origins change
+            self.factory.setProtocolOptions(allowedOrigins=[u'*.example.org:*'])
+            proto = self.handshake(header)
+            self.assertTrue(proto.failHandshake.called)
+            self.assertIn('not allowed', proto.failHandshake.call_args[0][0])
+
+    class TestAdmission(unittest.TestCase):
+        def setUp(self):
+            self.factory = WebSocketServerFactory(protocols=['wamp.2.json'])
+            self.factory.protocol = WebSocketServerProtocol
+            self.factory.setProtocolOptions(openHandshakeTimeout=0)
+            self.factory.doStart()
+
+        def tearDown(self):
+            self.factory.doStop()
+            # not really necessary, but ...
+            del self.factory
+
+        def connect(self, host='127.0.0.1', port=65534):
+            proto = self.factory.buildProtocol(IPv4Address('TCP', host, port))
+            proto.transport = MagicMock()
+            proto.transport.getPeer.return_value = IPv4Address('TCP', host, port)
+            proto.connectionMade()
+            return proto
+
+        def handshake(self, proto, data=mock_handshake_client):
+            proto.data = data
+            proto.processHandshake()
+            return b''.join(call[0][0] for call in proto.transport.write.call_args_list)
+
+        def test_reject_per_peer(self):
+            self.factory.setProtocolOptions(handshakeRateLimitPerPeer=0.001)
+            proto1 = self.connect(port=1000)
+            proto2 = self.connect(port=1001)
+            proto3 = self.connect(host='127.0.0.2')
+
+            self.assertIn(b'101 Switching Protocols', self.handshake(proto1))
+            self.assertEqual(proto1.state, proto1.STATE_OPEN)
+
+            # rejected without parsing the request
+            self.assertEqual(self.handshake(proto2, b'garbage\r\n'), b'')
+            self.assertEqual(self.handshake(proto2, b'garbage\r\n\r\n'),
+                             b'HTTP/1.1 503 Service Unavailable\r\nRetry-After: 1000\r\n\r\n')
+            self.assertEqual(proto2.state, proto2.STATE_CLOSED)
+
+            # other peers have their own limit
+            self.assertIn(b'101 Switching Protocols', self.handshake(proto3))
+
+            self.assertEqual(self.factory.getAdmissionStats(),
+                             {u'admitted': 2, u'delayed': 0, u'rejected': 1, u'peers': 2})
+
+        def test_peers_lru(self):
+            """
+            when too many source hosts are tracked, the least recently seen is forgotten
+            """
+            self.factory._ADMISSION_MAX_PEERS = 2
+            self.factory.setProtocolOptions(handshakeRateLimitPerPeer=0.001)
+            for host in ['127.0.0.1', '127.0.0.2', '127.0.0.1', '127.0.0.3']:
+                self.connect(host=host)
+            self.assertEqual(self.factory.getAdmissionStats()[u'peers'], 2)
+
+            # 127.0.0.1 is still limited, 127.0.0.2 was forgotten
+            self.assertIsNotNone(self.connect(host='127.0.0.1')._admissionRetryAfter)
+            self.assertIsNone(self.connect(host='127.0.0.2')._admissionRetryAfter)
+
+        def test_retry_after_jitter(self):
+            self.factory.setProtocolOptions(handshakeRateLimit=0.5, handshakeRetryAfterJitter=3)
+            self.connect()
+            retryAfter = set(self.connect()._admissionRetryAfter for _ in range(50))
+            self.assertTrue(retryAfter <= set([2, 3, 4, 5]))
+            self.assertTrue(len(retryAfter) > 1)
+
+        def test_delay(self):
+            with replace_loop(Clock()) as reactor:
+                self.factory.setProtocolOptions(handshakeRateLimit=1, handshakeRateLimitPolicy=u'delay',
+                                                handshakeMaxDelay=5)
+                proto1 = self.connect()
+                proto2 = self.connect()
+                proto3 = self.connect()
+                self.handshake(proto1)
+                self.handshake(proto2)
+                self.handshake(proto3)
+                self.assertEqual(proto1.state, proto1.STATE_OPEN)
+                self.assertEqual(proto2.state, proto2.STATE_CONNECTING)
+                self.assertEqual(proto3.state, proto3.STATE_CONNECTING)
+
+                # the delayed connections are admitted one after the other
+                reactor.advance(1)
+                self.assertEqual(proto2.state, proto2.STATE_OPEN)
+                self.assertEqual(proto3.state, proto3.STATE_CONNECTING)
+                reactor.advance(1)
+                self.assertEqual(proto3.state, proto3.STATE_OPEN)
+
+                self.assertEqual(self.factory.getAdmissionStats()[u'delayed'], 2)
@@ -0,0 +1,79 @@
+###############################################################################
+#
+# The MIT License (MIT)
+#
+# Copyright (c) Tavendo GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+###############################################################################
+
+
+from __future__ import absolute_import
+
+import os
+import unittest2 as unittest
+
+import six
+
+from autobahn.websocket.xormasker import createXorMasker
+
+
+def _xor_reference(mask, data):
+    mask = bytearray(mask)
+    return bytes(bytearray(b ^ mask[i & 3] for i, b in enumerate(bytearray(data))))
+
+
+class XorMaskerTests(unittest.TestCase):
+
+    def _check(self, length, chunk):
+        mask = os.urandom(4)
+        data = os.urandom(length)
+        masker = createXorMasker(mask, length)
+        result = b''
+        for i in six.moves.range(0, length, chunk):
+            result += masker.process(data[i:i + chunk])
+        self.assertEqual(result, _xor_reference(mask, data))
+        self.assertEqual(masker.pointer(), length)
+
+    def test_whole(self):
+        for length in [0, 1, 3, 4, 5, 125, 127, 128, 1000, 65537]:
+            self._check(length, max(length, 1))
+
+    def test_split(self):
+        """
+        The mask phase is carried over between chunks of odd lengths.
+        """
+        for length in [1, 7, 128, 1000]:
+            for chunk in [1, 2, 3, 5, 127]:
+                self._check(length, chunk)
+
+    def test_reset(self):
+        mask = b'\x01\x02\x03\x04'
+        masker = createXorMasker(mask, 10)
+        masker.process(b'abc')
+        masker.reset()
+        self.assertEqual(masker.pointer(), 0)
+        self.assertEqual(masker.process(b'abcdef'), _xor_reference(mask, b'abcdef'))
+
+    def test_bytearray(self):
+        mask = b'\xaa\xbb\xcc\xdd'
+        data = bytearray(b'hello, world')
+        self.assertEqual(createXorMasker(mask, len(data)).process(data),
+                         _xor_reference(mask, data))
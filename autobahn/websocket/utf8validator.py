@@ -72,15 +72,25 @@ except ImportError:
 
         # Python 3 and above
 
+        import codecs
+
         # convert DFA table to bytes (performance)
         UTF8VALIDATOR_DFA_S = bytes(UTF8VALIDATOR_DFA)
 
+        # the (strict) UTF-8 codec of Python 3 is implemented in C
+        _Utf8IncrementalDecoder = codecs.getincrementaldecoder('utf-8')
+
         class Utf8Validator(object):
             """
             Incremental UTF-8 validator with constant memory consumption (minimal state).
 
             Implements the algorithm "Flexible and Economical UTF-8 Decoder" by
             Bjoern Hoehrmann (http://bjoern.hoehrmann.de/utf-8/decoder/dfa/).
+
+            Chunks are validated in bulk using the incremental UTF-8 decoder of
+            Python. The DFA is only run over the (at most 3) octets of an
+            incomplete code point at the end of a chunk, and to locate the
+            offending octet when a chunk is invalid.
             """
 
             def __init__(self):
@@ -112,6 +122,7 @@ except ImportError:
                 self.state = UTF8_ACCEPT  # the empty string is valid UTF8
                 self.codepoint = 0
                 self.i = 0
+                self._decoder = _Utf8IncrementalDecoder()
 
             def validate(self, ba):
                 """
@@ -126,6 +137,33 @@ except ImportError:
                 When ``valid? == True``, currentIndex will be ``len(ba)`` and ``totalIndex`` the
                 total amount of consumed bytes.
                 """
+                if self.state == UTF8_REJECT:
+                    return self._validate_dfa(ba)
+                try:
+                    self._decoder.decode(ba)
+                except UnicodeDecodeError:
+                    return self._validate_dfa(ba)
+
+                # the decoder buffers an incomplete code point at the end of
+                # the chunk without fully checking it (e.g. the start of an
+                # encoded surrogate), so run the DFA over those octets
+                pending = self._decoder.getstate()[0]
+                state = UTF8_ACCEPT
+                for b in pending:
+                    state = UTF8VALIDATOR_DFA_S[256 + (state << 4) + UTF8VALIDATOR_DFA_S[b]]
+                if state == UTF8_REJECT:
+                    return self._validate_dfa(ba)
+
+                l = len(ba)
+                self.state = state
+                self.i += l
+                return True, state == UTF8_ACCEPT, l, self.i
+
+            def _validate_dfa(self, ba):
+                """
+                Validate a chunk octet by octet, starting from the DFA state at the
+                end of the previous chunk. Returns the same quad as :meth:`validate`.
+                """
                 #
                 # The code here is written for optimal JITting in PyPy, not for best
                 # readability by your grandma or particular elegance. Do NOT touch!
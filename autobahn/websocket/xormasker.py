@@ -122,8 +122,43 @@ except ImportError:
             else:
                 return payload.tostring()
 
-    def createXorMasker(mask, length=None):
-        if length is None or length < 128:
-            return XorMaskerSimple(mask)
-        else:
-            return XorMaskerShifted1(mask)
+    class XorMaskerWord(object):
+        """
+        Masks/unmasks a whole chunk of payload at once: the payload and the
+        (repeated) mask are converted into (big) integers, which are then
+        XOR'ed in one go. This avoids a Python level loop over payload octets.
+        """
+
+        def __init__(self, mask):
+            assert len(mask) == 4
+            self.ptr = 0
+            mask = bytes(mask)
+            self.mskrot = [mask[j:] + mask[:j] for j in xrange(4)]
+
+        def pointer(self):
+            return self.ptr
+
+        def reset(self):
+            self.ptr = 0
+
+        def process(self, data):
+            dlen = len(data)
+            if dlen == 0:
+                return b''
+            msk = self.mskrot[self.ptr & 3] * ((dlen + 3) >> 2)
+            if dlen & 3:
+                msk = msk[:dlen]
+            self.ptr += dlen
+            payload = int.from_bytes(data, 'big') ^ int.from_bytes(msk, 'big')
+            return payload.to_bytes(dlen, 'big')
+
+    if six.PY3:
+        def createXorMasker(mask, length=None):
+            return XorMaskerWord(mask)
+    else:
+        # Python 2 lacks int.from_bytes / int.to_bytes
+        def createXorMasker(mask, length=None):
+            if length is None or length < 128:
+                return XorMaskerSimple(mask)
+            else:
+                return XorMaskerShifted1(mask)
@@ -0,0 +1,67 @@
+###############################################################################
+#
+# The MIT License (MIT)
+#
+# Copyright (c) Tavendo GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+###############################################################################
+
+"""
+Reconnect storm: server side cost of the connections of a storm, opening
+handshakes per second without admission control, and connections per
+second when all but the first are rejected by ``handshakeRateLimitPerPeer``
+(with HTTP 503 and ``Retry-After``, before the request is parsed).
+"""
+
+from __future__ import print_function
+
+from twisted.internet.error import ConnectionDone
+from twisted.python.failure import Failure
+
+from util import NullTransport, BenchmarkServerProtocol, HANDSHAKE_REQUEST, best_of
+
+from autobahn.twisted.websocket import WebSocketServerFactory
+
+
+def run(connections, **options):
+    factory = WebSocketServerFactory(u'ws://www.example.com', server=u'AutobahnPython')
+    factory.protocol = BenchmarkServerProtocol
+    factory.received = 0
+    factory.setProtocolOptions(openHandshakeTimeout=0, **options)
+    reason = Failure(ConnectionDone())
+
+    def storm():
+        for i in range(connections):
+            proto = factory.buildProtocol(None)
+            proto.transport = NullTransport()
+            proto.connectionMade()
+            proto.dataReceived(HANDSHAKE_REQUEST)
+            proto.connectionLost(reason)
+
+    result = connections / best_of(storm, repeat=5)
+    return result, factory.getAdmissionStats()
+
+
+if __name__ == '__main__':
+    print("{:>12} {:>18} {:>10} {:>10}".format("admission", "connections/s", "admitted", "rejected"))
+    for label, options in [("off", {}), ("per peer", {'handshakeRateLimitPerPeer': 0.001})]:
+        result, stats = run(5000, **options)
+        print("{:>12} {:>18.0f} {:>10} {:>10}".format(label, result, stats[u'admitted'], stats[u'rejected']))
@@ -0,0 +1,153 @@
+###############################################################################
+#
+# The MIT License (MIT)
+#
+# Copyright (c) Tavendo GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+###############################################################################
+
+"""
+asyncio receive path: latency from a chunk of data arriving at the protocol
+until the message is delivered to ``onMessage``.
+
+Compares the default (queued) asyncio adapter with ``directProcessing`` and
+with a protocol deriving from ``asyncio.BufferedProtocol``.
+
+Unlike the other benchmarks in this folder, this one uses the asyncio flavor
+of the protocol classes, and runs an event loop.
+"""
+
+from __future__ import print_function
+
+import timeit
+
+import txaio
+txaio.use_asyncio()
+
+import asyncio
+
+from autobahn.asyncio.websocket import WebSocketServerProtocol, \
+    WebSocketServerFactory, _BufferedProtocol
+
+
+HANDSHAKE_REQUEST = (
+    b'GET / HTTP/1.1\r\n'
+    b'Host: localhost:80\r\n'
+    b'Upgrade: WebSocket\r\n'
+    b'Connection: Upgrade\r\n'
+    b'Sec-WebSocket-Key: 6Jid6RgXpH0RVegaNSs/4g==\r\n'
+    b'Sec-WebSocket-Version: 13\r\n'
+    b'\r\n'
+)
+
+
+class NullTransport(asyncio.Transport):
+    """
+    A transport that discards outgoing octets.
+    """
+
+    def get_extra_info(self, name, default=None):
+        if name == 'peername':
+            return ('127.0.0.1', 65534)
+        return default
+
+    def write(self, data):
+        pass
+
+    def writelines(self, seq):
+        pass
+
+    def get_write_buffer_size(self):
+        return 0
+
+    def close(self):
+        pass
+
+
+class LatencyServerProtocol(WebSocketServerProtocol):
+
+    def onMessage(self, payload, isBinary):
+        self.factory.waiter.set_result(timeit.default_timer())
+
+    def feed(self, data):
+        self.data_received(data)
+
+
+if _BufferedProtocol is not None:
+    class BufferedLatencyServerProtocol(LatencyServerProtocol, _BufferedProtocol):
+
+        def feed(self, data):
+            # what the transport does for a buffered protocol
+            buf = self.get_buffer(len(data))
+            buf[:len(data)] = data
+            self.buffer_updated(len(data))
+
+
+def make_frame(payload):
+    # masked client-to-server binary frame, using an all-zero mask
+    assert len(payload) <= 125
+    return b'\x82' + bytes(bytearray([0x80 | len(payload)])) + b'\x00\x00\x00\x00' + payload
+
+
+def run(loop, protocol, messages=10000, payload_size=16, **kwargs):
+    """
+    Returns the median and 99th percentile latency in seconds.
+    """
+    factory = WebSocketServerFactory(loop=loop, **kwargs)
+    factory.protocol = protocol
+    factory.setProtocolOptions(openHandshakeTimeout=0)
+
+    proto = factory()
+    proto.connection_made(NullTransport())
+
+    frame = make_frame(b'*' * payload_size)
+    samples = []
+    for i in range(messages + 1):
+        factory.waiter = asyncio.Future(loop=loop)
+        # the first chunk carries the opening handshake
+        t0 = timeit.default_timer()
+        proto.feed(HANDSHAKE_REQUEST + frame if i == 0 else frame)
+        t1 = loop.run_until_complete(factory.waiter)
+        if i > 0:
+            samples.append(t1 - t0)
+
+    proto.connection_lost(None)
+    samples.sort()
+    return samples[len(samples) // 2], samples[int(len(samples) * 0.99)]
+
+
+if __name__ == '__main__':
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+
+    modes = [
+        ('queued', LatencyServerProtocol, {}),
+        ('direct', LatencyServerProtocol, {'directProcessing': True}),
+    ]
+    if _BufferedProtocol is not None:
+        modes.append(('buffered', BufferedLatencyServerProtocol, {}))
+
+    print("{:>10} {:>14} {:>14}".format("mode", "median [us]", "p99 [us]"))
+    for name, protocol, kwargs in modes:
+        median, p99 = run(loop, protocol, **kwargs)
+        print("{:>10} {:>14.2f} {:>14.2f}".format(name, median * 1000000., p99 * 1000000.))
+
+    loop.close()
@@ -0,0 +1,110 @@
+###############################################################################
+#
+# The MIT License (MIT)
+#
+# Copyright (c) Tavendo GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+###############################################################################
+
+"""
+Fairness: latency of a light client's messages while a heavy client floods
+the same process with small pipelined frames, with and without
+``receiveBudget``.
+
+The heavy client delivers large chunks of 16 octet frames, the light client
+sends one frame every millisecond. Latency is measured from the time the
+light client's frame was due until it is delivered to ``onMessage``, so it
+includes the time the frame waited behind the heavy client's processing.
+
+Unlike the other Twisted benchmarks in this folder, this one runs the
+reactor, since yielding to other connections needs an event loop.
+"""
+
+from __future__ import print_function
+
+import timeit
+from collections import deque
+
+from util import make_server_protocol, make_frame, BenchmarkServerProtocol
+
+from twisted.internet import defer, task
+
+
+class LightServerProtocol(BenchmarkServerProtocol):
+
+    def onMessage(self, payload, isBinary):
+        self.factory.received += 1
+        self.samples.append(timeit.default_timer() - self.due.popleft())
+
+
+def run(reactor, budget, chunks=4, chunk_size=1 << 20, interval=0.001):
+    """
+    Returns a deferred firing with the median and 99th percentile latency
+    (in seconds) of the light client.
+    """
+    heavy = make_server_protocol(receiveBudget=budget)
+    light = make_server_protocol(protocol=LightServerProtocol, receiveBudget=budget)
+    light.samples = []
+    light.due = deque()
+
+    frame = make_frame(b'*' * 16)
+    flood = frame * (chunk_size // len(frame))
+    total = chunks * (chunk_size // len(frame))
+
+    done = defer.Deferred()
+    state = {'due': timeit.default_timer(), 'chunks': 0}
+
+    def send_heavy():
+        heavy.dataReceived(flood)
+        state['chunks'] += 1
+        if state['chunks'] < chunks:
+            reactor.callLater(interval, send_heavy)
+
+    def send_light():
+        if heavy.factory.received == total:
+            light.samples.sort()
+            samples = light.samples
+            done.callback((samples[len(samples) // 2], samples[int(len(samples) * 0.99)]))
+            return
+        # send all frames due by now, as a socket would deliver them
+        frames = 0
+        while state['due'] <= timeit.default_timer():
+            light.due.append(state['due'])
+            state['due'] += interval
+            frames += 1
+        light.dataReceived(frame * frames)
+        reactor.callLater(max(0, state['due'] - timeit.default_timer()), send_light)
+
+    reactor.callLater(0, send_heavy)
+    reactor.callLater(0, send_light)
+    return done
+
+
+@defer.inlineCallbacks
+def main(reactor):
+    print("{:>10} {:>14} {:>14}".format("budget", "median [ms]", "p99 [ms]"))
+    for budget in [0, 65536, 8192]:
+        median, p99 = yield run(reactor, budget)
+        print("{:>10} {:>14.2f} {:>14.2f}".format(budget or "none", median * 1000., p99 * 1000.))
+
+
+if __name__ == '__main__':
+    task.react(main)
@@ -0,0 +1,85 @@
+###############################################################################
+#
+# The MIT License (MIT)
+#
+# Copyright (c) Tavendo GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+###############################################################################
+
+"""
+Footprint of the objects allocated per frame and per connection.
+
+Reports the size of the objects allocated for every frame received
+(``FrameHeader``) and once per connection (``TrafficStats``, the protocol
+instance), the processing time per frame, and the memory held per open
+connection (measured with ``tracemalloc``, Python 3.4+).
+"""
+
+from __future__ import print_function
+
+import gc
+import sys
+import tracemalloc
+
+from util import make_server_protocol, make_frame, best_of
+
+from autobahn.websocket.protocol import FrameHeader, TrafficStats
+
+
+def object_size(obj):
+    """
+    Size of an object including its instance dictionary (if any).
+    """
+    size = sys.getsizeof(obj)
+    if hasattr(obj, '__dict__'):
+        size += sys.getsizeof(obj.__dict__)
+    return size
+
+
+def time_per_frame(frames=10000):
+    chunk = make_frame(b'*' * 16) * frames
+    proto = make_server_protocol()
+
+    def receive():
+        proto.dataReceived(chunk)
+
+    return best_of(receive, repeat=5) / frames
+
+
+def bytes_per_connection(connections=2000):
+    gc.collect()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    protos = [make_server_protocol() for _ in range(connections)]
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    assert len(protos) == connections
+    return used / float(connections)
+
+
+if __name__ == '__main__':
+    proto = make_server_protocol()
+    print("{:<36} {:>10}".format("FrameHeader [B]", object_size(FrameHeader(2, True, 0, 16, b'abcd'))))
+    print("{:<36} {:>10}".format("TrafficStats [B]", object_size(TrafficStats())))
+    print("{:<36} {:>10}".format("protocol instance [B]", object_size(proto)))
+    print("{:<36} {:>10.2f}".format("receive per frame [us]", time_per_frame() * 1000000.))
+    print("{:<36} {:>10.0f}".format("memory per open connection [B]", bytes_per_connection()))
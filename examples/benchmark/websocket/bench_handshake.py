@@ -0,0 +1,85 @@
+###############################################################################
+#
+# The MIT License (MIT)
+#
+# Copyright (c) Tavendo GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+###############################################################################
+
+"""
+Opening handshake: server side handshakes per second, for a browser-like
+request (query string, Origin and a permessage-deflate offer).
+
+Runs with warm handshake caches (parsed extension offers and origin
+decisions, as during a reconnect storm, when clients send the same header
+values over and over), and with the caches cleared before every handshake.
+"""
+
+from __future__ import print_function
+
+from twisted.internet.error import ConnectionDone
+from twisted.python.failure import Failure
+
+from util import NullTransport, BenchmarkServerProtocol, best_of
+
+from autobahn.twisted.websocket import WebSocketServerFactory
+
+
+REQUEST = (
+    b'GET /ws?token=d2b1f0a6 HTTP/1.1\r\n'
+    b'Host: www.example.com\r\n'
+    b'Upgrade: websocket\r\n'
+    b'Connection: Upgrade\r\n'
+    b'Origin: https://app.example.com\r\n'
+    b'Sec-WebSocket-Key: 6Jid6RgXpH0RVegaNSs/4g==\r\n'
+    b'Sec-WebSocket-Version: 13\r\n'
+    b'Sec-WebSocket-Extensions: permessage-deflate; client_max_window_bits\r\n'
+    b'User-Agent: Mozilla/5.0 (X11; Linux x86_64; rv:120.0) Gecko/20100101 Firefox/120.0\r\n'
+    b'\r\n'
+)
+
+
+def run(handshakes, warm):
+    factory = WebSocketServerFactory(u'ws://www.example.com', server=u'AutobahnPython')
+    factory.protocol = BenchmarkServerProtocol
+    factory.received = 0
+    factory.setProtocolOptions(openHandshakeTimeout=0, allowedOrigins=[u'https://*.example.com:*'])
+    reason = Failure(ConnectionDone())
+
+    def handshake():
+        for i in range(handshakes):
+            if not warm:
+                factory._extensionsCache.clear()
+                factory._originCache.clear()
+            proto = factory.buildProtocol(None)
+            proto.transport = NullTransport()
+            proto.connectionMade()
+            proto.dataReceived(REQUEST)
+            assert proto.state == proto.STATE_OPEN
+            proto.connectionLost(reason)
+
+    return handshakes / best_of(handshake, repeat=5)
+
+
+if __name__ == '__main__':
+    print("{:>10} {:>18}".format("caches", "handshakes/s"))
+    for label, warm in [("cold", False), ("warm", True)]:
+        print("{:>10} {:>18.0f}".format(label, run(5000, warm)))
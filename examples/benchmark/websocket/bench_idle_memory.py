@@ -0,0 +1,113 @@
+###############################################################################
+#
+# The MIT License (MIT)
+#
+# Copyright (c) Tavendo GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+###############################################################################
+
+"""
+Idle connections: memory held per open, idle connection, before and after
+the connection hibernated (see ``idleHibernationTimeout``).
+
+Memory is measured with ``tracemalloc`` (Python 3.4+), and includes the
+protocol instance, its state and (optionally) negotiated permessage-deflate
+contexts. Each connection first receives and sends one message, so that
+buffers and contexts were actually used.
+"""
+
+from __future__ import print_function
+
+import gc
+import sys
+import tracemalloc
+
+from autobahn.websocket.compress import PerMessageDeflateOffer, \
+    PerMessageDeflateOfferAccept
+
+from util import HANDSHAKE_REQUEST, BenchmarkServerProtocol, NullTransport, \
+    make_frame
+
+from autobahn.twisted.websocket import WebSocketServerFactory
+
+
+def accept(offers):
+    for offer in offers:
+        if isinstance(offer, PerMessageDeflateOffer):
+            return PerMessageDeflateOfferAccept(offer)
+
+
+def make_factory(deflate):
+    factory = WebSocketServerFactory()
+    factory.protocol = BenchmarkServerProtocol
+    factory.received = 0
+    factory.setProtocolOptions(openHandshakeTimeout=0)
+    if deflate:
+        factory.setProtocolOptions(perMessageCompressionAccept=accept)
+    return factory
+
+
+def connect(factory, deflate):
+    request = HANDSHAKE_REQUEST
+    if deflate:
+        request = request.replace(b'\r\n\r\n', b'\r\nSec-WebSocket-Extensions: ' + deflate + b'\r\n\r\n')
+    proto = factory.buildProtocol(None)
+    proto.transport = NullTransport()
+    proto.connectionMade()
+    proto.dataReceived(request)
+    assert proto.state == proto.STATE_OPEN
+    proto.dataReceived(make_frame(b'hello, world', opcode=1))
+    proto.sendMessage(b'hello, world')
+    return proto
+
+
+def measure(connections, deflate=None):
+    factory = make_factory(deflate)
+
+    gc.collect()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+
+    protos = [connect(factory, deflate) for _ in range(connections)]
+    gc.collect()
+    active = tracemalloc.get_traced_memory()[0] - base
+
+    # what an idle connection hibernates to after idleHibernationTimeout (the
+    # timer does not fire without a running reactor)
+    for proto in protos:
+        proto._hibernate()
+    gc.collect()
+    idle = tracemalloc.get_traced_memory()[0] - base
+
+    tracemalloc.stop()
+    return active / float(connections), idle / float(connections)
+
+
+if __name__ == '__main__':
+    connections = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    print("{} idle connections\n".format(connections))
+    print("{:<48} {:>12} {:>12}".format("compression", "before [B]", "after [B]"))
+    for label, deflate in [("none", None),
+                           ("permessage-deflate", b'permessage-deflate'),
+                           ("permessage-deflate, no context takeover",
+                            b'permessage-deflate; server_no_context_takeover; client_no_context_takeover')]:
+        before, after = measure(connections, deflate)
+        print("{:<48} {:>12.0f} {:>12.0f}".format(label, before, after))
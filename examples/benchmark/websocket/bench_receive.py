@@ -0,0 +1,56 @@
+###############################################################################
+#
+# The MIT License (MIT)
+#
+# Copyright (c) Tavendo GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+###############################################################################
+
+"""
+Receive path: per-frame processing cost as the buffered backlog grows.
+
+A chunk of N small pipelined frames is fed into a server protocol in one
+go. With a linear receive buffer, the cost per frame stays flat as N grows.
+"""
+
+from __future__ import print_function
+
+from util import make_server_protocol, make_frame, best_of
+
+
+def run(frames, payload_size=16):
+    frame = make_frame(b'*' * payload_size)
+    chunk = frame * frames
+    proto = make_server_protocol()
+
+    def receive():
+        proto.dataReceived(chunk)
+
+    t = best_of(receive, repeat=5)
+    assert proto.factory.received == 5 * frames
+    return t
+
+
+if __name__ == '__main__':
+    print("{:>10} {:>14} {:>14}".format("frames", "total [ms]", "per frame [us]"))
+    for frames in [100, 1000, 10000, 50000]:
+        t = run(frames)
+        print("{:>10} {:>14.2f} {:>14.2f}".format(frames, t * 1000., t * 1000000. / frames))
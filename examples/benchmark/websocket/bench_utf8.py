@@ -0,0 +1,74 @@
+###############################################################################
+#
+# The MIT License (MIT)
+#
+# Copyright (c) Tavendo GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+###############################################################################
+
+"""
+UTF-8 validation: throughput of the pure Python validator.
+
+Compares bulk validation (Python 3, when wsaccel is not installed) with
+running the DFA octet by octet, for a large JSON text message received
+in one chunk and split into frames.
+"""
+
+from __future__ import print_function
+
+import json
+import timeit
+
+from autobahn.websocket.utf8validator import Utf8Validator
+
+
+def make_payload(size):
+    item = {u'id': 1, u'name': u'Grüße €', u'tags': [u'a', u'b', u'µ']}
+    items = []
+    while len(json.dumps(items, ensure_ascii=False).encode('utf8')) < size:
+        items.append(item)
+    return json.dumps(items, ensure_ascii=False).encode('utf8')
+
+
+def run(validate, payload, chunk_size):
+    chunks = [payload[i:i + chunk_size] for i in range(0, len(payload), chunk_size)]
+
+    def validate_all():
+        v = Utf8Validator()
+        for chunk in chunks:
+            res = getattr(v, validate)(chunk)
+        assert res[0] and res[1]
+
+    number = max(1, 2000000 // len(payload))
+    t = min(timeit.repeat(validate_all, repeat=5, number=number)) / number
+    return len(payload) / t / 1000000.
+
+
+if __name__ == '__main__':
+    methods = ['validate']
+    if hasattr(Utf8Validator, '_validate_dfa'):
+        methods.append('_validate_dfa')
+
+    print("{:>10} {:>10} ".format("size", "chunk") + " ".join("{:>20}".format(m + " [MB/s]") for m in methods))
+    for size in [1024, 65536, 1048576]:
+        payload = make_payload(size)
+        for chunk_size in sorted(set([size, min(size, 4096)])):
+            print("{:>10} {:>10} ".format(size, chunk_size) + " ".join("{:>20.2f}".format(run(m, payload, chunk_size)) for m in methods))
@@ -0,0 +1,65 @@
+###############################################################################
+#
+# The MIT License (MIT)
+#
+# Copyright (c) Tavendo GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+###############################################################################
+
+"""
+Payload masking: throughput of the pure Python XOR maskers.
+
+Compares the bulk masker (used on Python 3 when wsaccel is not installed)
+with the per-octet maskers it replaces.
+"""
+
+from __future__ import print_function
+
+import os
+import timeit
+
+from autobahn.websocket import xormasker
+
+
+MASKERS = [
+    ('Simple', getattr(xormasker, 'XorMaskerSimple', None)),
+    ('Shifted1', getattr(xormasker, 'XorMaskerShifted1', None)),
+    ('Word', getattr(xormasker, 'XorMaskerWord', None)),
+]
+
+
+def run(klass, size):
+    mask = os.urandom(4)
+    data = os.urandom(size)
+    masker = klass(mask)
+    number = max(1, 200000 // size)
+    t = min(timeit.repeat(lambda: masker.process(data), repeat=5, number=number)) / number
+    return size / t / 1000000.
+
+
+if __name__ == '__main__':
+    maskers = [(name, klass) for name, klass in MASKERS if klass is not None]
+    if not maskers:
+        raise SystemExit("wsaccel is installed: the pure Python maskers are not in use")
+
+    print("{:>10} ".format("size") + " ".join("{:>14}".format(name + " [MB/s]") for name, _ in maskers))
+    for size in [16, 128, 1024, 16384, 1048576]:
+        print("{:>10} ".format(size) + " ".join("{:>14.2f}".format(run(klass, size)) for _, klass in maskers))
@@ -0,0 +1,141 @@
+###############################################################################
+#
+# The MIT License (MIT)
+#
+# Copyright (c) Tavendo GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+###############################################################################
+
+"""
+Helpers shared by the WebSocket micro benchmarks in this folder.
+
+The benchmarks drive protocol instances directly (without any networking),
+so that the numbers measure Autobahn's own processing cost only.
+"""
+
+from __future__ import print_function
+
+import os
+import struct
+import timeit
+
+import txaio
+txaio.use_twisted()
+
+from twisted.internet.address import IPv4Address
+
+from autobahn.twisted.websocket import WebSocketServerProtocol, \
+    WebSocketServerFactory
+
+
+HANDSHAKE_REQUEST = (
+    b'GET / HTTP/1.1\r\n'
+    b'Host: localhost:80\r\n'
+    b'Upgrade: WebSocket\r\n'
+    b'Connection: Upgrade\r\n'
+    b'Sec-WebSocket-Key: 6Jid6RgXpH0RVegaNSs/4g==\r\n'
+    b'Sec-WebSocket-Version: 13\r\n'
+    b'\r\n'
+)
+
+
+class NullTransport(object):
+    """
+    A transport that counts, but otherwise discards, outgoing octets.
+    """
+
+    def __init__(self):
+        self.written = 0
+        self.writes = 0
+
+    def write(self, data):
+        self.written += len(data)
+        self.writes += 1
+
+    def writeSequence(self, seq):
+        for data in seq:
+            self.written += len(data)
+        self.writes += 1
+
+    def getPeer(self):
+        return IPv4Address('TCP', '127.0.0.1', 65534)
+
+    def setTcpNoDelay(self, enabled):
+        pass
+
+    def loseConnection(self):
+        pass
+
+    def abortConnection(self):
+        pass
+
+
+class BenchmarkServerProtocol(WebSocketServerProtocol):
+
+    def onMessage(self, payload, isBinary):
+        self.factory.received += 1
+
+
+def make_server_protocol(protocol=BenchmarkServerProtocol, **options):
+    """
+    Create a server protocol instance that already completed the opening
+    handshake. Any keyword arguments are set as protocol options on the
+    factory.
+    """
+    factory = WebSocketServerFactory()
+    factory.protocol = protocol
+    factory.received = 0
+    factory.setProtocolOptions(openHandshakeTimeout=0, **options)
+
+    proto = factory.buildProtocol(None)
+    proto.transport = NullTransport()
+    proto.connectionMade()
+    proto.dataReceived(HANDSHAKE_REQUEST)
+    assert proto.state == proto.STATE_OPEN
+    return proto
+
+
+def make_frame(payload, opcode=2, fin=True, mask=None):
+    """
+    Encode a single (masked, client-to-server) WebSocket frame.
+    """
+    if mask is None:
+        mask = os.urandom(4)
+    l = len(payload)
+    b0 = (0x80 if fin else 0) | opcode
+    if l <= 125:
+        header = struct.pack("!BB", b0, 0x80 | l)
+    elif l <= 0xFFFF:
+        header = struct.pack("!BBH", b0, 0x80 | 126, l)
+    else:
+        header = struct.pack("!BBQ", b0, 0x80 | 127, l)
+    m = bytearray(mask)
+    masked = bytearray(payload)
+    for i in range(l):
+        masked[i] ^= m[i & 3]
+    return header + mask + bytes(masked)
+
+
+def best_of(func, repeat=5, number=1):
+    """
+    Run ``func`` and return the best wall clock time (in seconds) per call.
+    """
+    return min(timeit.repeat(func, repeat=repeat, number=number)) / float(number)
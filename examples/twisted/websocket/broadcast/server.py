@@ -101,12 +101,34 @@ class BroadcastPreparedServerFactory(BroadcastServerFactory):
             print("prepared message sent to {}".format(c.peer))
 
 
+class BroadcastBuiltinServerFactory(BroadcastServerFactory):
+
+    """
+    Functionally same as above, but using the connection registry and
+    broadcast built into WebSocketServerFactory: the message is framed
+    only once, and clients which can't keep up are skipped.
+    """
+
+    def __init__(self, url):
+        BroadcastServerFactory.__init__(self, url)
+        self.setProtocolOptions(broadcastMaxBufferSize=256 * 1024)
+
+    def broadcast(self, msg):
+        print("broadcasting message '{}' ..".format(msg))
+        d = WebSocketServerFactory.broadcast(self, msg.encode('utf8'))
+
+        def sent(res):
+            print("message sent to {} clients ({} skipped) in {:.3f} ms".format(res[u'sent'], res[u'skipped'], 1000. * res[u'latency']))
+        d.addCallback(sent)
+
+
 if __name__ == '__main__':
 
     log.startLogging(sys.stdout)
 
     ServerFactory = BroadcastServerFactory
     # ServerFactory = BroadcastPreparedServerFactory
+    # ServerFactory = BroadcastBuiltinServerFactory
 
     factory = ServerFactory(u"ws://127.0.0.1:9000")
     factory.protocol = BroadcastServerProtocol